@@ -22,7 +22,8 @@ COLORS = {
     Status.RUNNING: "dark_cyan",        # Pulumi's signature blue
     Status.SUCCESS: "dark_cyan",        # Clean success green
     Status.FAILED: "red",               # Clear failure red
-    Status.SKIPPED: "bright_black"      # Muted grey for skipped
+    Status.SKIPPED: "bright_black",     # Muted grey for skipped
+    Status.CACHED: "dark_cyan"          # Reused result, as good as success
 }
 
 class AnimatedLabel:
@@ -0,0 +1,81 @@
+import argparse
+import re
+from pathlib import Path
+from rich.console import Console
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_SIZE_UNITS = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+
+
+def parse_duration(value: str) -> float:
+    """Parse durations like "90s", "30m", "12h" or "7d" into seconds."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid duration: {value}, expected e.g. 30m, 12h or 7d")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes like "500MB" or "20GB" into bytes."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmgt]?b?)", value.strip().lower())
+    if not match or match.group(2) not in _SIZE_UNITS:
+        raise argparse.ArgumentTypeError(f"Invalid size: {value}, expected e.g. 500MB or 20GB")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def add_gc_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "gc",
+        help="Remove sandbox snapshots no running river needs anymore, and old task logs",
+        description=(
+            "Remove sandbox snapshots left behind by crashed rivers or kept "
+            "for journaled runs that will not be resumed, and "
+            "unused snapshots beyond the given age or total size. With an "
+            "age, task logs kept by failed jobs are removed past it too."
+        ),
+    )
+    parser.add_argument("--host", default="localhost", help="Docker host, localhost or an ssh host")
+    parser.add_argument("--max-age", type=parse_duration, help="Remove unused snapshots and task logs older than this, e.g. 7d")
+    parser.add_argument("--max-size", type=parse_size, help="Keep unused snapshots below this total size, e.g. 20GB")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument(
+        "--journal", type=Path, help="The run journal whose kept snapshots may go, <river home>/journal.sqlite by default"
+    )
+
+
+def run_gc(args: argparse.Namespace) -> None:
+    from river_sdk.journal import RunJournal
+    from river_sdk.sandbox import DockerSandboxManager
+    from river_sdk.sandbox.snapshot_refs import river_home
+    from river_sdk.task_logs import collect_task_logs
+
+    console = Console()
+    manager = DockerSandboxManager(host=args.host)
+    journal_path = args.journal or river_home() / "journal.sqlite"
+    journal = RunJournal(journal_path) if journal_path.exists() else None
+    try:
+        report = manager.collect_garbage(
+            max_age=args.max_age, max_size=args.max_size, dry_run=args.dry_run, journal=journal
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+
+    verb = "Would remove" if args.dry_run else "Removed"
+    for tag in report["removed"]:
+        console.print(f"  {tag}")
+    console.print(
+        f"{verb} {len(report['removed'])} snapshot(s), "
+        f"{format_size(report['freed_bytes'])}, kept {report['kept']}"
+    )
+    if args.max_age is not None:
+        logs = collect_task_logs(args.max_age, dry_run=args.dry_run)
+        console.print(f"{verb} the task logs of {len(logs)} job(s)")
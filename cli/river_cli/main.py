@@ -1,17 +1,25 @@
+import argparse
+import os
 import subprocess
-import json
 import threading
 import queue
 from typing import Dict, Optional
 from rich.live import Live
 from rich.console import Console
 from .river_node import RiverNode
+from .gc import add_gc_parser, run_gc
+from .runs import add_runs_parser, run_runs
+from .makespans import add_makespans_parser, run_makespans
+from .report import format_timings, timing_report
+from river_common.channel import STATUS_CHANNEL_ENV
+from river_common.codec import CODECS, STATUS_FORMAT_ENV, read_events
 from river_common.status import StatusBase
 
 TARGET_FPS = 60  # Target frames per second for animations
 
 class StreamingTreeRenderer:
-    def __init__(self):
+    def __init__(self, status_format: str = "json"):
+        self.status_format = status_format
         self.console = Console()
         self.nodes: Dict[str, RiverNode] = {}
         self.data_queue = queue.Queue()
@@ -39,8 +47,8 @@ class StreamingTreeRenderer:
     def process_item(self, item_data):
         """Process a single item from the queue"""
         try:
-            # Convert JSON data to StatusBase object
-            item = StatusBase(**item_data)
+            # Events from the status channel are decoded already
+            item = item_data if isinstance(item_data, StatusBase) else StatusBase(**item_data)
             river_node = self.update_or_create_node(item)
             self.data_queue.task_done()
             return river_node
@@ -89,48 +97,69 @@ class StreamingTreeRenderer:
                     self.console.print(f"  [red]Type:[/red] {item.error_type}")
             else:
                 self.console.print(f"  [red]Error:[/red] Failed without details")
+            if item.timings:
+                self.console.print(f"  [red]Timings:[/red] {format_timings(item.timings)}")
             
             self.console.print()  # Empty line between errors
+
+    def render_timing_report(self):
+        """Render where the time of each job went"""
+        report = timing_report(node.item for node in self.nodes.values())
+        if report is not None:
+            self.console.print()
+            self.console.print(report)
     
-    def process_stream_data(self, proc):
-        """Process streaming data from subprocess"""
+    def process_stream_data(self, stream):
+        """Process status events from the status channel"""
         try:
-            for line in iter(proc.stdout.readline, ''):
-                if not line or not self.running:
+            for item in read_events(stream):
+                if not self.running:
                     break
-                    
-                line = line.strip()
-                if line:
-                    try:
-                        item = json.loads(line)
-                        self.data_queue.put(item)
-                    except json.JSONDecodeError:
-                        continue
+                self.data_queue.put(item)
         except Exception as e:
             self.data_queue.put({'error': str(e)})
         finally:
-            proc.stdout.close()
+            stream.close()
+
+    def drain_output(self, stream):
+        """Read user output off the subprocess stdout, so it never blocks on a full pipe"""
+        try:
+            for _ in iter(stream.readline, ''):
+                pass
+        finally:
+            stream.close()
     
     def start_data_process(self):
         """Start the data.py subprocess"""
+        # Status events come on a pipe of their own, stdout is left to user output.
+        read_fd, write_fd = os.pipe()
         try:
             proc = subprocess.Popen(
                 ["uv", "run", "__main__.py"],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
-                bufsize=1  # Line buffered
+                bufsize=1,  # Line buffered
+                pass_fds=(write_fd,),
+                # Rivers that do not know the format asked for send JSON.
+                env={**os.environ, STATUS_CHANNEL_ENV: f"fd:{write_fd}", STATUS_FORMAT_ENV: self.status_format},
             )
-            
-            # Start thread to read from subprocess
-            thread = threading.Thread(target=self.process_stream_data, args=(proc,))
-            thread.daemon = True
-            thread.start()
-            
-            return proc, thread
         except Exception as e:
+            os.close(read_fd)
             self.data_queue.put({'error': f'Failed to start data process: {str(e)}'})
             return None, None
+        finally:
+            # Only the child writes, the channel ends when it exits.
+            os.close(write_fd)
+
+        # read_events decodes both formats, whichever the river settled on.
+        # Start threads to read from subprocess
+        thread = threading.Thread(target=self.process_stream_data, args=(os.fdopen(read_fd, "rb"),))
+        thread.daemon = True
+        thread.start()
+        threading.Thread(target=self.drain_output, args=(proc.stdout,), daemon=True).start()
+
+        return proc, thread
     
     def _get_root_node(self, proc) -> Optional[RiverNode]:
         root_node = None
@@ -173,13 +202,37 @@ class StreamingTreeRenderer:
                 if proc:
                     proc.terminate()
         
-        # Show error summary after processing is complete
+        # Show error summary and timings after processing is complete
         self.render_error_summary()
+        self.render_timing_report()
         self.console.print("\n👋 Goodbye!")
 
-def main():
+def main(argv=None):
     """Main entry point"""
-    renderer = StreamingTreeRenderer()
+    parser = argparse.ArgumentParser(prog="river")
+    parser.add_argument(
+        "--status-format",
+        choices=sorted(CODECS),
+        default=os.environ.get(STATUS_FORMAT_ENV, "json"),
+        help="How the river sends status events: json lines, or binary frames about a third of the size",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    add_gc_parser(subparsers)
+    add_runs_parser(subparsers)
+    add_makespans_parser(subparsers)
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        run_gc(args)
+        return
+    if args.command == "runs":
+        run_runs(args)
+        return
+    if args.command == "makespans":
+        run_makespans(args)
+        return
+
+    renderer = StreamingTreeRenderer(args.status_format)
     renderer.run()
 
 if __name__ == "__main__":
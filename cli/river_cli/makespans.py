@@ -0,0 +1,55 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+from rich.console import Console
+from rich.table import Table
+from .report import format_seconds
+
+
+def add_makespans_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "makespans",
+        help="Compare predicted and actual run times",
+        description=(
+            "List the most recent runs of rivers with a duration store, with the "
+            "makespan predicted from past job durations next to the actual one."
+        ),
+    )
+    parser.add_argument("--river", help="Only list runs of this river")
+    parser.add_argument("--limit", type=int, default=20, help="How many runs to list")
+    parser.add_argument("--store", type=Path, help="The duration store, <river home>/durations.sqlite by default")
+
+
+def run_makespans(args: argparse.Namespace) -> None:
+    from river_sdk.durations import DurationStore
+
+    console = Console()
+    store = DurationStore(args.store)
+    try:
+        makespans = store.makespans(args.river, args.limit)
+    finally:
+        store.close()
+    if not makespans:
+        console.print("No recorded runs")
+        return
+
+    table = Table()
+    for column in ("river", "target", "finished"):
+        table.add_column(column)
+    for column in ("predicted", "actual", "error"):
+        table.add_column(column, justify="right")
+    for run in makespans:
+        if run.predicted is None:
+            predicted = error = "-"
+        else:
+            predicted = format_seconds(run.predicted)
+            error = f"{(run.actual - run.predicted) / run.predicted:+.0%}" if run.predicted else "-"
+        table.add_row(
+            run.river,
+            run.target,
+            datetime.fromtimestamp(run.finished_at).strftime("%Y-%m-%d %H:%M:%S"),
+            predicted,
+            format_seconds(run.actual),
+            error,
+        )
+    console.print(table)
@@ -0,0 +1,62 @@
+from typing import Iterable, Optional
+from rich.table import Table
+from river_common.shared import ModuleTypes, TIMING_PHASES
+from river_common.status import StatusBase, Timings
+
+PHASE_LABELS = {
+    "queue_wait": "queue wait",
+    "sandbox_create": "sandbox create",
+    "fork": "fork",
+    "execution": "execution",
+    "snapshot": "snapshot",
+    "teardown": "teardown",
+}
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes:.0f}m {seconds:.0f}s"
+
+
+def format_timings(timings: Optional[Timings]) -> str:
+    """The phases a job or task went through, e.g. "fork 120ms, execution 3.4s"."""
+    if timings is None:
+        return ""
+    return ", ".join(
+        f"{PHASE_LABELS[phase]} {format_seconds(seconds)}"
+        for phase in TIMING_PHASES
+        if (seconds := getattr(timings, phase)) is not None
+    )
+
+
+def timing_report(items: Iterable[StatusBase]) -> Optional[Table]:
+    """A table of where each finished job's time went, with totals per phase.
+
+    Returns None when no job reported timings.
+    """
+    jobs = [item for item in items if item.type == ModuleTypes.JOB and item.timings is not None]
+    if not jobs:
+        return None
+
+    table = Table(title="Timing Report", title_justify="left")
+    table.add_column("job")
+    table.add_column("status")
+    for phase in TIMING_PHASES:
+        table.add_column(PHASE_LABELS[phase], justify="right")
+
+    totals = dict.fromkeys(TIMING_PHASES, 0.0)
+    for job in jobs:
+        cells = []
+        for phase in TIMING_PHASES:
+            seconds = getattr(job.timings, phase)
+            cells.append("-" if seconds is None else format_seconds(seconds))
+            totals[phase] += seconds or 0.0
+        table.add_row(job.name, job.status.value, *cells)
+
+    table.add_section()
+    table.add_row("total", "", *(format_seconds(totals[phase]) for phase in TIMING_PHASES), style="bold")
+    return table
@@ -0,0 +1,52 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+from rich.console import Console
+from rich.table import Table
+from .report import format_seconds
+
+
+def add_runs_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "runs",
+        help="List journaled river runs",
+        description=(
+            "List the most recent runs recorded in the run journal, with the "
+            "ids to pass to River.flow(resume=...)."
+        ),
+    )
+    parser.add_argument("--river", help="Only list runs of this river")
+    parser.add_argument("--limit", type=int, default=20, help="How many runs to list")
+    parser.add_argument("--journal", type=Path, help="The journal database, <river home>/journal.sqlite by default")
+
+
+def run_runs(args: argparse.Namespace) -> None:
+    from river_sdk.journal import RunJournal
+
+    console = Console()
+    journal = RunJournal(args.journal)
+    try:
+        runs = journal.runs(args.river, args.limit)
+    finally:
+        journal.close()
+    if not runs:
+        console.print("No journaled runs")
+        return
+
+    table = Table()
+    # Ids are copied into flow(resume=...), never shorten them.
+    table.add_column("run id", no_wrap=True, min_width=36)
+    for column in ("river", "outlet", "status", "started", "duration", "resumed from"):
+        table.add_column(column)
+    for run in runs:
+        duration = "-" if run.finished_at is None else format_seconds(run.finished_at - run.started_at)
+        table.add_row(
+            run.run_id,
+            run.river,
+            run.outlet,
+            run.status.value,
+            datetime.fromtimestamp(run.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+            duration,
+            run.resumed_from or "",
+        )
+    console.print(table)
@@ -1,2 +1,2 @@
 from .shared import Status, ModuleTypes
-from .status import RiverStatus, JobStatus, TaskStatus
+from .status import RiverStatus, JobStatus, TaskStatus, Timings
@@ -0,0 +1,132 @@
+import os
+import socket
+import sys
+import threading
+from typing import Optional
+
+# Set by the CLI to tell a river where to send its status events:
+#   fd:<n>          an inherited file descriptor, e.g. the write end of a pipe
+#   unix:<path>     a unix domain socket the CLI listens on
+#   fifo:<path>     a named pipe the CLI reads from
+#   file:<path>     a regular file events are appended to
+# Without it, events are printed to stdout.
+STATUS_CHANNEL_ENV = "RIVER_STATUS_CHANNEL"
+
+
+class StatusChannel:
+    """Where serialized status events go, one event per line."""
+
+    # Whether the channel carries binary frames, see river_common.codec.
+    binary = True
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class StdoutChannel(StatusChannel):
+    """The fallback: events share stdout with user output.
+
+    stdout is text, events are always written to it as JSON lines.
+    """
+
+    binary = False
+
+    def write(self, data: bytes) -> None:
+        sys.stdout.write(data.decode())
+        sys.stdout.flush()
+
+
+class FileChannel(StatusChannel):
+    """A file descriptor, either inherited or a named pipe opened for writing."""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    @classmethod
+    def append(cls, path: str) -> 'FileChannel':
+        """A channel appending to a regular file, e.g. to keep a run's events."""
+        return cls(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644))
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SocketChannel(StatusChannel):
+    """A connected unix domain socket."""
+
+    def __init__(self, path: str):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+
+    def write(self, data: bytes) -> None:
+        self.socket.sendall(data)
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+class MemoryChannel(StatusChannel):
+    """Keeps what was written, for tests and in-process consumers."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            self.data += data
+            self.writes += 1
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            return self.data.decode().splitlines()
+
+
+def open_channel(spec: Optional[str]) -> StatusChannel:
+    """Open the channel described by a RIVER_STATUS_CHANNEL value, stdout when empty."""
+    if not spec:
+        return StdoutChannel()
+    kind, _, target = spec.partition(":")
+    if kind == "fd" and target.isdigit():
+        return FileChannel(int(target))
+    if kind == "unix" and target:
+        return SocketChannel(target)
+    if kind == "fifo" and target:
+        # Blocks until the reader opened its end.
+        return FileChannel(os.open(target, os.O_WRONLY))
+    if kind == "file" and target:
+        return FileChannel.append(target)
+    raise ValueError(f"Invalid {STATUS_CHANNEL_ENV}: {spec!r}, expected fd:<n>, unix:<path>, fifo:<path> or file:<path>")
+
+
+_channel: Optional[StatusChannel] = None
+_channel_lock = threading.Lock()
+
+
+def status_channel() -> StatusChannel:
+    """The channel of this process, opened from the environment on first use."""
+    global _channel
+    with _channel_lock:
+        if _channel is None:
+            _channel = open_channel(os.environ.get(STATUS_CHANNEL_ENV))
+        return _channel
+
+
+def set_status_channel(channel: Optional[StatusChannel]) -> Optional[StatusChannel]:
+    """Replace the channel of this process, None reopens it from the environment.
+
+    Returns the previous channel, which is not closed.
+    """
+    global _channel
+    with _channel_lock:
+        previous, _channel = _channel, channel
+        return previous
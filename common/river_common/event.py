@@ -0,0 +1,156 @@
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from json.encoder import encode_basestring
+from typing import TYPE_CHECKING, Optional
+
+from river_common.shared import ModuleTypes, Status, TIMING_PHASES
+
+if TYPE_CHECKING:
+    from river_common.status import StatusBase
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class StatusEvent:
+    """One status transition, as it is exported.
+
+    A plain record for the emission path: creating one neither validates
+    nor builds a datetime, the timestamp is kept as ns since the epoch. It
+    serializes to the same JSON as the matching StatusBase model, to_status()
+    and from_status() convert at the edges where validation matters. Treat
+    it as immutable once exported.
+    """
+
+    __slots__ = (
+        "id", "name", "parent_id", "status", "type", "error", "error_type", "updated_at_ns", "timings", "cache_hit"
+    )
+
+    def __init__(
+        self,
+        type: ModuleTypes,
+        id: str,
+        name: str,
+        parent_id: Optional[str],
+        status: Status,
+        exception: Optional[BaseException] = None,
+        updated_at_ns: Optional[int] = None,
+        timings: Optional[dict[str, float]] = None,
+        cache_hit: Optional[bool] = None,
+    ):
+        self.type = type
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.status = status
+        # Like StatusBase.set_failed, errors are only kept for failures.
+        if status is Status.FAILED and exception is not None:
+            self.error: Optional[str] = str(exception)
+            self.error_type: Optional[str] = exception.__class__.__name__
+        else:
+            self.error = None
+            self.error_type = None
+        self.updated_at_ns = time.time_ns() if updated_at_ns is None else updated_at_ns
+        # Seconds per phase of TIMING_PHASES, to the microsecond like the timestamp.
+        self.timings = {phase: round(seconds, 6) for phase, seconds in timings.items()} if timings else None
+        self.cache_hit = cache_hit
+
+    @classmethod
+    def from_status(cls, status: 'StatusBase') -> 'StatusEvent':
+        timings = status.timings.model_dump(exclude_none=True) if status.timings else None
+        event = cls(status.type, status.id, status.name, status.parent_id, status.status,
+                    updated_at_ns=to_ns(status.updated_at), timings=timings, cache_hit=status.cache_hit)
+        event.error = status.error
+        event.error_type = status.error_type
+        return event
+
+    @property
+    def updated_at(self) -> datetime:
+        return from_ns(self.updated_at_ns)
+
+    def to_status(self) -> 'StatusBase':
+        """The validated pydantic model of this event."""
+        from river_common.status import StatusBase
+
+        return StatusBase.model_validate({
+            "id": self.id,
+            "name": self.name,
+            "parent_id": self.parent_id,
+            "status": self.status,
+            "type": self.type,
+            "error": self.error,
+            "error_type": self.error_type,
+            "updated_at": self.updated_at,
+            "timings": self.timings,
+            "cache_hit": self.cache_hit,
+        })
+
+    def to_json(self) -> bytes:
+        """The event as StatusBase.model_dump_json() would write it."""
+        return (
+            f'{{"id":{_string(self.id)},"name":{_string(self.name)},"parent_id":{_string(self.parent_id)},'
+            f'"status":"{self.status.value}","type":"{self.type.value}",'
+            f'"error":{_string(self.error)},"error_type":{_string(self.error_type)},'
+            f'"updated_at":"{_format_timestamp(self.updated_at_ns)}","timings":{_timings(self.timings)},'
+            f'"cache_hit":{_BOOLEANS[self.cache_hit]}}}'
+        ).encode()
+
+    def __repr__(self) -> str:
+        return f"StatusEvent({self.type.value} {self.name!r} {self.status.value})"
+
+
+def to_ns(value: datetime) -> int:
+    """ns since the epoch of a datetime, naive ones are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def from_ns(value: int) -> datetime:
+    """The UTC datetime of ns since the epoch, to the microsecond."""
+    return _EPOCH + timedelta(0, 0, value // 1000)
+
+
+_BOOLEANS = {None: "null", True: "true", False: "false"}
+
+
+def _string(value: Optional[str]) -> str:
+    return "null" if value is None else encode_basestring(value)
+
+
+def _timings(timings: Optional[dict[str, float]]) -> str:
+    if timings is None:
+        return "null"
+    values = (timings.get(phase) for phase in TIMING_PHASES)
+    return "{" + ",".join(
+        f'"{phase}":{"null" if value is None else _float(value)}' for phase, value in zip(TIMING_PHASES, values)
+    ) + "}"
+
+
+def _float(value: float) -> str:
+    # pydantic writes floats like repr() does, except for the exponents: 1e-6 and
+    # 1e+16, and no exponent down to 1e-5.
+    text = repr(value)
+    mantissa, _, exponent = text.partition("e")
+    if not exponent:
+        return text
+    power = int(exponent)
+    if -5 <= power < 0:
+        return format(Decimal(mantissa).scaleb(power), "f")
+    return f"{mantissa}e{power:+d}" if power > 0 else f"{mantissa}e{power}"
+
+
+# Events come in bursts, most share the second of the one before.
+_last_second: tuple[int, str] = (-1, "")
+
+
+def _format_timestamp(ns: int) -> str:
+    # pydantic's format: UTC with a Z, microseconds only when there are any.
+    global _last_second
+    seconds, ns = divmod(ns, 1_000_000_000)
+    second, base = _last_second
+    if second != seconds:
+        base = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _last_second = (seconds, base)
+    microseconds = ns // 1000
+    return f"{base}.{microseconds:06d}Z" if microseconds else f"{base}Z"
@@ -0,0 +1,210 @@
+import atexit
+import queue
+import threading
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Optional, Union
+
+from river_common.channel import StatusChannel, status_channel
+from river_common.codec import CODECS, StatusCodec, codec_from_env
+from river_common.event import StatusEvent
+
+if TYPE_CHECKING:
+    from river_common.status import StatusBase
+
+
+class Backpressure(Enum):
+    """What export() does while the queue is full."""
+    # Wait for the writer, a slow reader slows the river down but sees every event.
+    BLOCK = "block"
+    # Drop the event and count it, the river never waits on its reader.
+    DROP = "drop"
+
+
+# How often flush() checks that the writer is still there.
+_WRITER_CHECK_INTERVAL = 0.1
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class StatusExporter:
+    """Send status events to a channel from a background writer thread.
+
+    export() only queues the event, serializing and writing happen on the
+    writer thread. The writer sends events in batches, one write per batch:
+    a batch is written once it holds `max_batch_bytes`, or `flush_interval`
+    seconds after its first event, whichever comes first. flush() waits until
+    everything exported so far is written.
+
+    Args:
+        channel: Where events go, the process status channel by default.
+        max_pending: Most events waiting for the writer.
+        max_batch_bytes: Bytes written at once.
+        flush_interval: Seconds an event waits for others to batch with.
+        backpressure: What export() does while `max_pending` events wait.
+        codec: How events are encoded, the one the CLI asked for by default.
+            Channels that are not binary, such as the stdout fallback, get
+            JSON whatever the codec.
+    """
+
+    def __init__(
+        self,
+        channel: Optional[StatusChannel] = None,
+        max_pending: int = 10000,
+        max_batch_bytes: int = 64 * 1024,
+        flush_interval: float = 0.05,
+        backpressure: Backpressure = Backpressure.BLOCK,
+        codec: Optional[StatusCodec] = None,
+    ):
+        if max_pending < 1 or max_batch_bytes < 1:
+            raise ValueError(f"Invalid exporter size: max_pending={max_pending}, max_batch_bytes={max_batch_bytes}")
+        self._channel = channel
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.codec = codec or codec_from_env()
+        self._pending: queue.Queue[Union[StatusEvent, _Flush, None]] = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        # Held while queueing, so nothing is queued after the writer saw the end.
+        self._state_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self.dropped = 0
+        self.errors = 0
+        self._writer = threading.Thread(target=self._write_batches, name="river-status-exporter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @property
+    def channel(self) -> StatusChannel:
+        return self._channel or status_channel()
+
+    def export(self, event: Union[StatusEvent, 'StatusBase']) -> None:
+        """Queue the event, a StatusBase is copied as it is now."""
+        if not isinstance(event, StatusEvent):
+            event = StatusEvent.from_status(event)
+        with self._state_lock:
+            if not self._closed:
+                if self.backpressure is Backpressure.BLOCK:
+                    self._pending.put(event)
+                    return
+                try:
+                    self._pending.put_nowait(event)
+                except queue.Full:
+                    with self._counters_lock:
+                        self.dropped += 1
+                return
+        # Closed, nobody writes for us any more.
+        self._write([self._channel_codec().encode(event)])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every event exported so far is written.
+
+        False on timeout, or when the writer is gone and nothing will be written.
+        """
+        flush = _Flush()
+        with self._state_lock:
+            if self._closed:
+                return True
+            if not self._writer.is_alive():
+                return False
+            # A flush is never dropped, whatever the backpressure.
+            self._pending.put(flush)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Woken now and then to notice a writer that died before it got to the flush.
+        while self._writer.is_alive():
+            wait = _WRITER_CHECK_INTERVAL
+            if deadline is not None:
+                wait = max(min(deadline - time.monotonic(), wait), 0)
+            if flush.done.wait(wait):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return flush.done.is_set()
+
+    def close(self) -> None:
+        """Write what is left and stop the writer."""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.put(None)
+        self._writer.join()
+        atexit.unregister(self.close)
+
+    def _write_batches(self) -> None:
+        while True:
+            item = self._pending.get()
+            # Resolved per batch, a channel that failed to open is tried again with the next one.
+            codec = self._channel_codec()
+            batch: list[bytes] = []
+            size = 0
+            deadline = time.monotonic() + self.flush_interval
+            # Collect until the batch is full, the interval is up, or a flush or close asks for it.
+            while item is not None and not isinstance(item, _Flush):
+                try:
+                    line = codec.encode(item)
+                except Exception:
+                    self._count_error()
+                else:
+                    batch.append(line)
+                    size += len(line)
+                if size >= self.max_batch_bytes:
+                    item = _Flush()
+                    break
+                try:
+                    item = self._pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = _Flush()
+            if batch:
+                self._write(batch)
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item is None:
+                return
+
+    def _channel_codec(self) -> StatusCodec:
+        try:
+            binary = self.channel.binary
+        except Exception:
+            # The channel cannot be opened, _write() counts that when it tries again.
+            return CODECS["json"]
+        return self.codec if binary else CODECS["json"]
+
+    def _write(self, batch: list[bytes]) -> None:
+        # A channel that cannot be opened or a failed write, e.g. after the reader
+        # went away, must not stop the writer, it is only counted.
+        try:
+            self.channel.write(b"".join(batch))
+        except Exception:
+            self._count_error()
+
+    def _count_error(self) -> None:
+        with self._counters_lock:
+            self.errors += 1
+
+
+_exporter: Optional[StatusExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def status_exporter() -> StatusExporter:
+    """The exporter of this process, started on first use."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = StatusExporter()
+        return _exporter
+
+
+def set_status_exporter(exporter: Optional[StatusExporter]) -> Optional[StatusExporter]:
+    """Replace the exporter of this process, None starts a default one on next use.
+
+    Returns the previous exporter, which is neither flushed nor closed.
+    """
+    global _exporter
+    with _exporter_lock:
+        previous, _exporter = _exporter, exporter
+        return previous
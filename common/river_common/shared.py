@@ -6,9 +6,13 @@ class ModuleTypes(Enum):
     JOB = "job"
     TASK = "task"
 
+# Phases of a job or task whose duration is reported with its final status.
+TIMING_PHASES = ("queue_wait", "sandbox_create", "fork", "execution", "snapshot", "teardown")
+
 class Status(Enum):
     PENDING = "pending"
     RUNNING = "running"
     SUCCESS = "success"
     FAILED = "failed"
     SKIPPED = "skipped"
+    CACHED = "cached"
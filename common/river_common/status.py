@@ -2,8 +2,22 @@ from pydantic import BaseModel, Field
 from typing import Literal, Optional
 from datetime import datetime, timezone
 
+from river_common.exporter import status_exporter
 from river_common.shared import ModuleTypes, Status
 
+class Timings(BaseModel):
+    """Where the time of a job or task went, in seconds, measured with monotonic clocks.
+
+    Phases a job or task did not go through are None. Teardown only covers
+    what the job waits for, containers removed by a background reaper are
+    not included.
+    """
+    queue_wait: Optional[float] = None
+    sandbox_create: Optional[float] = None
+    fork: Optional[float] = None
+    execution: Optional[float] = None
+    snapshot: Optional[float] = None
+    teardown: Optional[float] = None
 
 class StatusBase(BaseModel):
     id: str
@@ -14,6 +28,10 @@ class StatusBase(BaseModel):
     error: Optional[str] = None
     error_type: Optional[str] = None
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Set with the final status of jobs and tasks
+    timings: Optional[Timings] = None
+    # Set with the final status of tasks run with a cache policy, whether it was replayed
+    cache_hit: Optional[bool] = None
 
     def set_status(self, status: Status):
         self.status = status
@@ -31,7 +49,8 @@ class StatusBase(BaseModel):
             self.error_type = exception.__class__.__name__
 
     def export(self):
-        print(self.model_dump_json(), flush=True)
+        """Queue the event for the status exporter, see river_common.exporter."""
+        status_exporter().export(self)
 
 class RiverStatus(StatusBase):
     type: Literal[ModuleTypes.RIVER] = ModuleTypes.RIVER
@@ -0,0 +1,87 @@
+"""Compare create/exec/destroy latency of the docker CLI and the Engine API backends.
+
+Needs a docker daemon, or pass --fake to run both backends against the fake
+docker CLI and fake Engine API server of the tests. Run from the sdk directory:
+
+    python -m benchmark.bench_docker_api [--image ubuntu] [--rounds 50] [--fake]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+from river_sdk.sandbox.docker_api import DockerApiSandboxManager, DEFAULT_DOCKER_SOCKET
+from river_sdk.sandbox.docker_sandbox import DockerSandboxManager
+from river_sdk.sandbox.snapshot_refs import RunRegistry
+
+
+def measure(manager: BaseSandboxManager, image: str, rounds: int) -> dict[str, list[float]]:
+    latencies = {"create": [], "exec": [], "destroy": []}
+    for i in range(rounds):
+        start = time.perf_counter()
+        sandbox = manager.create(image)
+        created = time.perf_counter()
+        result = sandbox.execute(f"echo {i}", cwd="/tmp", env={"RIVER_BENCH": "1"})
+        executed = time.perf_counter()
+        manager.destory(sandbox)
+        destroyed = time.perf_counter()
+        assert result.ok and result.stdout == f"{i}\n", result
+        latencies["create"].append(created - start)
+        latencies["exec"].append(executed - created)
+        latencies["destroy"].append(destroyed - executed)
+    return latencies
+
+
+def report(name: str, latencies: dict[str, list[float]]) -> None:
+    for operation, values in latencies.items():
+        p99 = statistics.quantiles(values, n=100)[98] if len(values) > 1 else values[0]
+        print(
+            f"{name:<12}{operation:<10}{statistics.mean(values) * 1000:>12.2f}"
+            f"{statistics.median(values) * 1000:>12.2f}{p99 * 1000:>12.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default="ubuntu")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--socket", default=DEFAULT_DOCKER_SOCKET)
+    parser.add_argument("--fake", action="store_true", help="Use the fake docker CLI and Engine API of the tests")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry_root = Path(tmp)
+        socket = args.socket
+        if args.fake:
+            import pytest
+            from test.sandbox.fake_docker import install_fake_docker
+            from test.sandbox.fake_docker_engine import FakeDockerEngine
+            monkeypatch = pytest.MonkeyPatch()
+            install_fake_docker(registry_root, monkeypatch)
+            engine = FakeDockerEngine(str(registry_root / "docker.sock"), images=(f"{args.image}:latest",))
+            socket = engine.server_address
+
+        backends = (
+            # Tear down in the foreground, so destroy measures the removal itself.
+            ("cli", DockerSandboxManager(registry=RunRegistry(registry_root), background_teardown=False)),
+            ("engine api", DockerApiSandboxManager(
+                socket, registry=RunRegistry(registry_root), background_teardown=False,
+            )),
+        )
+        print(f"{'backend':<12}{'op':<10}{'mean (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+        means = {}
+        for name, manager in backends:
+            latencies = measure(manager, args.image, args.rounds)
+            manager.close()
+            report(name, latencies)
+            means[name] = sum(statistics.mean(values) for values in latencies.values())
+        print(f"speedup per create/exec/destroy round: {means['cli'] / means['engine api']:.1f}x")
+
+        if args.fake:
+            engine.stop()
+            monkeypatch.undo()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare per-command latency of `docker exec` and persistent shell sessions.
+
+Needs a docker daemon. Run from the sdk directory:
+
+    python -m benchmark.bench_docker_exec [--image ubuntu] [--commands 200]
+"""
+import argparse
+import statistics
+import time
+from river_sdk.sandbox.docker_sandbox import DockerSandboxManager
+
+
+def measure(manager: DockerSandboxManager, image: str, commands: int) -> list[float]:
+    sandbox = manager.create(image)
+    try:
+        sandbox.execute("true")  # Warm up, the first session is started here.
+        latencies = []
+        for i in range(commands):
+            start = time.perf_counter()
+            result = sandbox.execute(f"echo {i}", cwd="/tmp", env={"RIVER_BENCH": "1"})
+            latencies.append(time.perf_counter() - start)
+            assert result.ok and result.stdout == f"{i}\n", result
+        return latencies
+    finally:
+        manager.destory(sandbox)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default="ubuntu")
+    parser.add_argument("--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'mode':<18}{'mean (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    baseline = None
+    for name, persistent_shell in (("docker exec", False), ("persistent shell", True)):
+        latencies = measure(DockerSandboxManager(persistent_shell=persistent_shell), args.image, args.commands)
+        mean = statistics.mean(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"{name:<18}{mean * 1000:>12.2f}{statistics.median(latencies) * 1000:>12.2f}{p99 * 1000:>12.2f}")
+        baseline = baseline or mean
+    print(f"speedup: {baseline / mean:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
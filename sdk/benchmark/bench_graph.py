@@ -0,0 +1,75 @@
+"""Time building large rivers, including cycle detection in Job._join.
+
+Run from the sdk directory:
+
+    python -m benchmark.bench_graph [--sizes 10000 100000]
+"""
+import argparse
+import math
+import time
+from river_sdk.job import Job
+from river_sdk.plan import ExecutionPlan
+
+
+class NoopJob(Job):
+    def main(self):
+        return None
+
+
+def chain(size: int) -> Job:
+    job = NoopJob("job-0")
+    for i in range(1, size):
+        job = NoopJob(f"job-{i}", upstreams=[job])
+    return job
+
+
+def lattice(size: int) -> Job:
+    """A square grid where every job depends on its left and upper neighbour."""
+    side = max(1, math.isqrt(size))
+    rows: list[list[Job]] = []
+    for row in range(side):
+        jobs: list[Job] = []
+        for col in range(side):
+            upstreams = []
+            if col:
+                upstreams.append(jobs[col - 1])
+            if row:
+                upstreams.append(rows[row - 1][col])
+            jobs.append(NoopJob(f"job-{row}-{col}", upstreams=upstreams))
+        rows.append(jobs)
+    return rows[-1][-1]
+
+
+def wide_diamond(size: int) -> Job:
+    """One source fanning out to `size - 2` jobs that fan back into one sink."""
+    source = NoopJob("source")
+    middle = [NoopJob(f"job-{i}", upstreams=[source]) for i in range(size - 2)]
+    return NoopJob("sink", upstreams=middle)
+
+
+SHAPES = {
+    "chain": chain,
+    "lattice": lattice,
+    "wide-diamond": wide_diamond,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'shape':<16}{'jobs':>10}{'build (s)':>12}{'plan (s)':>12}{'levels':>10}{'width':>10}")
+    for size in args.sizes:
+        for name, build in SHAPES.items():
+            start = time.perf_counter()
+            outlet = build(size)
+            built = time.perf_counter()
+            plan = ExecutionPlan(outlet)
+            planned = time.perf_counter()
+            print(f"{name:<16}{len(plan):>10}{built - start:>12.3f}{planned - built:>12.3f}"
+                  f"{len(plan.levels):>10}{plan.width:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare per-command overhead of fabric's Connection("localhost") and LocalCommandExecutor.
+
+Run from the sdk directory:
+
+    python -m benchmark.bench_local_executor [--commands 200]
+"""
+import argparse
+import statistics
+import time
+from fabric import Connection
+from invoke.runners import Result
+from river_sdk.sandbox.command_executor import LocalCommandExecutor
+
+
+def fabric_local(command: str, cwd: str, env: dict[str, str]) -> Result:
+    """How LocalCommandExecutor ran commands before, through fabric."""
+    with Connection("localhost") as connection, connection.cd(cwd):
+        return connection.local(command, env=env, hide=True, warn=True, in_stream=False)
+
+
+def measure(run, commands: int) -> list[float]:
+    latencies = []
+    for i in range(commands):
+        start = time.perf_counter()
+        result = run(f"echo {i}", "/tmp", {"RIVER_BENCH": "1"})
+        latencies.append(time.perf_counter() - start)
+        assert result.ok and result.stdout == f"{i}\n", result
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'runner':<14}{'mean (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    baseline = None
+    for name, run in (("fabric", fabric_local), ("subprocess", LocalCommandExecutor().run)):
+        latencies = measure(run, args.commands)
+        mean = statistics.mean(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"{name:<14}{mean * 1000:>12.2f}{statistics.median(latencies) * 1000:>12.2f}{p99 * 1000:>12.2f}")
+        baseline = baseline or mean
+    print(f"speedup: {baseline / mean:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare per-command latency of remote commands with and without SSH connection pooling.
+
+Runs against the paramiko test server by default, or a real host with
+--host/--user (keys from the ssh agent or config). Run from the sdk directory:
+
+    python -m benchmark.bench_ssh_pool [--commands 100] [--host example.com --user me]
+"""
+import argparse
+import logging
+import statistics
+import time
+from river_sdk.sandbox.command_executor import RemoteCommandExecutor
+from river_sdk.sandbox.ssh_pool import SSHConnectionPool
+
+
+def measure(executor: RemoteCommandExecutor, commands: int) -> list[float]:
+    latencies = []
+    for i in range(commands):
+        start = time.perf_counter()
+        result = executor.run(f"echo {i}")
+        latencies.append(time.perf_counter() - start)
+        assert result.ok and result.stdout == f"{i}\n", result
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--port", type=int, default=22)
+    args = parser.parse_args()
+
+    server = None
+    if args.host:
+        params = {"host": args.host, "user": args.user, "port": args.port}
+    else:
+        from test.sandbox.fake_ssh_server import FakeSSHServer, USER, PASSWORD
+        # The test server logs every connection the unpooled run closes.
+        logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+        server = FakeSSHServer()
+        params = {"host": "127.0.0.1", "user": USER, "password": PASSWORD, "port": server.port}
+
+    print(f"{'mode':<14}{'mean (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    baseline = None
+    # An idle timeout of zero replaces the connection for every command, like no pooling.
+    for name, pool in (("no pooling", SSHConnectionPool(idle_timeout=0)), ("pooled", SSHConnectionPool())):
+        latencies = measure(RemoteCommandExecutor(**params, pool=pool), args.commands)
+        pool.close()
+        mean = statistics.mean(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"{name:<14}{mean * 1000:>12.2f}{statistics.median(latencies) * 1000:>12.2f}{p99 * 1000:>12.2f}")
+        baseline = baseline or mean
+    print(f"speedup: {baseline / mean:.1f}x")
+
+    if server:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
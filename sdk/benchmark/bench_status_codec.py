@@ -0,0 +1,75 @@
+"""Compare events per second of the JSON and binary status codecs.
+
+Encoding is what a river does per event, decoding what the CLI does.
+"decode" reads one stream of all events, "decode 1" reads every event from
+a stream of its own, the CLI's cost when events trickle in one at a time.
+"json (loads)" is how the CLI decoded events before read_events: json.loads
+and a StatusBase built from the dict.
+
+Run from the sdk directory:
+
+    python -m benchmark.bench_status_codec [--events 50000]
+"""
+import argparse
+import io
+import json
+import time
+from river_common.codec import BinaryCodec, JsonCodec, read_events
+from river_common.event import StatusEvent
+from river_common.shared import ModuleTypes, Status
+from river_common.status import StatusBase
+
+
+def make_events(count: int) -> list[StatusEvent]:
+    statuses = (Status.PENDING, Status.RUNNING, Status.SUCCESS)
+    return [
+        StatusEvent(ModuleTypes.TASK, f"{i:08d}-task", f"task {i}", "job-1", statuses[i % 3])
+        for i in range(count)
+    ]
+
+
+def decode_loads(data: bytes) -> int:
+    return sum(1 for line in data.splitlines() if StatusBase(**json.loads(line)))
+
+
+def decode_stream(data: bytes) -> int:
+    return sum(1 for _ in read_events(io.BufferedReader(io.BytesIO(data))))
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:,.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args()
+    events = make_events(args.events)
+
+    print(f"{'codec':<14}{'encode (ev/s)':>16}{'decode (ev/s)':>16}{'decode 1 (ev/s)':>18}{'bytes/event':>14}")
+    for name, codec, decode in (
+        ("json (loads)", JsonCodec(), decode_loads),
+        ("json", JsonCodec(), decode_stream),
+        ("binary", BinaryCodec(), decode_stream),
+    ):
+        start = time.perf_counter()
+        frames = [codec.encode(event) for event in events]
+        encoding = time.perf_counter() - start
+        data = b"".join(frames)
+
+        start = time.perf_counter()
+        assert decode(data) == len(events)
+        decoding = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert sum(decode(frame) for frame in frames) == len(events)
+        decoding_one = time.perf_counter() - start
+
+        print(
+            f"{name:<14}{rate(len(events), encoding):>16}{rate(len(events), decoding):>16}"
+            f"{rate(len(events), decoding_one):>18}{len(data) / len(events):>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the cost of emitting task status events as pydantic models and as StatusEvent records.
+
+Simulates a job with many tiny tasks, each going RUNNING then SUCCESS:
+"emit" is what the job thread does per event, "serialize" what the
+exporter thread adds, and "bytes/event" what an event keeps allocated
+while it waits in the exporter queue.
+
+Run from the sdk directory:
+
+    python -m benchmark.bench_status_events [--tasks 10000]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from river_common.event import StatusEvent
+from river_common.shared import ModuleTypes, Status
+from river_common.status import TaskStatus
+
+
+def emit_model(task_id: str, name: str, status: Status) -> TaskStatus:
+    """How task transitions were emitted before, a validated model per event."""
+    return TaskStatus(id=task_id, name=name, parent_id="job-1", status=status)
+
+
+def emit_record(task_id: str, name: str, status: Status) -> StatusEvent:
+    return StatusEvent(ModuleTypes.TASK, task_id, name, "job-1", status)
+
+
+def run_job(emit, tasks: list[tuple[str, str]]) -> list:
+    events = []
+    for task_id, name in tasks:
+        events.append(emit(task_id, name, Status.RUNNING))
+        events.append(emit(task_id, name, Status.SUCCESS))
+    return events
+
+
+def measure(emit, serialize, tasks: list[tuple[str, str]]) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    events = run_job(emit, tasks)
+    emitting = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for event in events:
+        serialize(event)
+    serializing = time.perf_counter() - start
+    del events
+
+    tracemalloc.start()
+    events = run_job(emit, tasks)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return emitting / len(events), serializing / len(events), allocated / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    args = parser.parse_args()
+    tasks = [(str(uuid.uuid4()), f"bash: echo {i}") for i in range(args.tasks)]
+
+    print(f"{args.tasks} tasks, {2 * args.tasks} events")
+    print(f"{'event':<10}{'emit (us)':>12}{'serialize (us)':>16}{'bytes/event':>14}")
+    baseline = None
+    for name, emit, serialize in (
+        ("pydantic", emit_model, lambda status: status.model_dump_json()),
+        ("record", emit_record, StatusEvent.to_json),
+    ):
+        emitting, serializing, allocated = measure(emit, serialize, tasks)
+        print(f"{name:<10}{emitting * 1e6:>12.2f}{serializing * 1e6:>16.2f}{allocated:>14.0f}")
+        baseline = baseline or (emitting, allocated)
+    print(f"emit speedup: {baseline[0] / emitting:.1f}x, allocation: {baseline[1] / allocated:.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
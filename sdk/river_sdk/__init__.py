@@ -1,14 +1,29 @@
-from .job import Job, JobContext
+from .job import Job, AsyncJob, JobContext
 from .river import River, RiverContext, default_sandbox_creator, sandbox_forker
-from .task import bash
+from .plan import ExecutionPlan
+from .task import bash, abash, parallel, aparallel
+from .job_cache import JobCache
+from .task_cache import CachePolicy, TaskCache
+from .journal import RunJournal
+from .durations import DurationStore
 from .sandbox import DockerSandbox, DockerSandboxManager, BaseSandbox, BaseSandboxManager
 
 __all__ = [
     "Job", 
+    "AsyncJob",
     "JobContext", 
     "River", 
     "RiverContext", 
+    "ExecutionPlan",
     "bash",
+    "abash",
+    "parallel",
+    "aparallel",
+    "JobCache",
+    "CachePolicy",
+    "TaskCache",
+    "RunJournal",
+    "DurationStore",
     "DockerSandbox",
     "DockerSandboxManager", 
     "BaseSandbox",
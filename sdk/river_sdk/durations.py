@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping, Optional
+from river_sdk.sandbox.snapshot_refs import river_home
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+    from river_sdk.plan import ExecutionPlan
+
+# Estimated seconds of every job when none of the plan's jobs ran before.
+UNIFORM_COST = 1.0
+# Past runs averaged into a job's estimate.
+DEFAULT_WINDOW = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS durations (
+    river TEXT NOT NULL,
+    job TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS durations_by_job ON durations (river, job, recorded_at);
+CREATE TABLE IF NOT EXISTS makespans (
+    river TEXT NOT NULL,
+    target TEXT NOT NULL,
+    run_id TEXT,
+    predicted REAL,
+    actual REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class Makespan:
+    river: str
+    # Name of the job the run led to.
+    target: str
+    run_id: Optional[str]
+    # None when the run had no estimates to predict from.
+    predicted: Optional[float]
+    actual: float
+    finished_at: float
+
+
+class DurationStore:
+    """SQLite record of how long the jobs of each river took in past runs.
+
+    A river with a duration store records the duration of every job that
+    succeeds, and schedules ready jobs by their longest remaining path to the
+    outlet, estimating each job by the mean of its last `window` durations.
+    It also records the predicted and actual makespan of every run.
+
+    Jobs are keyed by river name, job class and job name, so estimates carry
+    over between processes as long as those stay the same.
+
+    Args:
+        path: The database file, `<river home>/durations.sqlite` by default.
+        window: How many past durations of a job to keep and average.
+    """
+
+    def __init__(self, path: Optional[Path] = None, window: int = DEFAULT_WINDOW):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        self.path = path or river_home() / "durations.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.window = window
+        self._lock = threading.Lock()
+        # Jobs finish on worker threads, one connection serves them all under the lock.
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def record(self, river: str, job: 'Job', seconds: float) -> None:
+        """Record one duration of the job, forgetting those beyond the window."""
+        key = job_key(job)
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO durations VALUES (?, ?, ?, ?)", (river, key, seconds, time.time())
+            )
+            self._connection.execute(
+                "DELETE FROM durations WHERE river = ? AND job = ? AND rowid NOT IN ("
+                "SELECT rowid FROM durations WHERE river = ? AND job = ? ORDER BY recorded_at DESC LIMIT ?)",
+                (river, key, river, key, self.window),
+            )
+
+    def estimates(self, river: str) -> dict[str, float]:
+        """Mean recorded seconds of every job of the river that ran before, by job_key()."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job, AVG(seconds) FROM durations WHERE river = ? GROUP BY job", (river,)
+            ).fetchall()
+        return dict(rows)
+
+    def record_makespan(
+        self, river: str, target: str, run_id: Optional[str], predicted: Optional[float], actual: float
+    ) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO makespans VALUES (?, ?, ?, ?, ?, ?)",
+                (river, target, run_id, predicted, actual, time.time()),
+            )
+
+    def makespans(self, river: Optional[str] = None, limit: int = 20) -> list[Makespan]:
+        """The most recent runs first, of the given river or of all."""
+        query, params = "SELECT * FROM makespans", ()
+        if river is not None:
+            query, params = query + " WHERE river = ?", (river,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY finished_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [Makespan(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def job_key(job: 'Job') -> str:
+    """What a job's durations are recorded under, its class and name."""
+    cls = type(job)
+    return f"{cls.__module__}.{cls.__qualname__}/{job.name}"
+
+
+def job_costs(plan: 'ExecutionPlan', estimates: Mapping[str, float]) -> dict['Job', float]:
+    """Estimated seconds of every job of the plan that still has to run.
+
+    Jobs that finished already cost nothing. Jobs that never ran before all
+    get the same cost, the mean estimate of the plan's other jobs, or
+    UNIFORM_COST when none of them ran before either.
+    """
+    known = {job: estimates[key] for job in plan if (key := job_key(job)) in estimates}
+    uniform = sum(known.values()) / len(known) if known else UNIFORM_COST
+    return {
+        job: 0.0 if job._run_already_finished() else known.get(job, uniform)
+        for job in plan
+    }
+
+
+def busy_seconds(timings: Mapping[str, float]) -> float:
+    """How long a job's run took, all of its phases but the wait for a worker."""
+    return sum(seconds for phase, seconds in timings.items() if phase != "queue_wait")
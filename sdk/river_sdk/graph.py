@@ -0,0 +1,108 @@
+import itertools
+import threading
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+
+
+class TopologicalOrder:
+    """Keep all jobs in a topological order while edges are being added.
+
+    This is the dynamic topological sort of Pearce and Kelly: every job gets an
+    index, and an edge `upstream -> downstream` only costs work when it goes
+    against the current order. In that case only the jobs whose index lies
+    between the two endpoints are searched and renumbered, which also tells
+    whether the new edge closes a cycle. Building a river the usual way, where
+    a job joins upstreams created before it, never has to search at all.
+
+    The edges live on the jobs themselves (`_upstreams` and `_downstreams`),
+    the index in `_topo_index`.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, job: 'Job') -> None:
+        """Give a new job an index after every existing job."""
+        with self._lock:
+            job._topo_index = next(self._counter)
+
+    def add_edge(self, upstream: 'Job', downstream: 'Job') -> Optional[list['Job']]:
+        """Record that `downstream` depends on `upstream`.
+
+        Returns:
+            None when the edge was added, otherwise the jobs of the cycle it
+            would create, starting from `upstream` and following upstreams
+            down to `downstream`. The edge is not added in that case.
+        """
+        with self._lock:
+            if upstream is downstream:
+                return [upstream]
+            if upstream._topo_index < downstream._topo_index:
+                self._link(upstream, downstream)
+                return None
+
+            # Only jobs indexed between the two endpoints can be affected.
+            lower, upper = downstream._topo_index, upstream._topo_index
+            forward = self._search_downstreams(downstream, upstream, upper)
+            if isinstance(forward, list):
+                return forward
+            backward = self._search_upstreams(upstream, lower)
+            self._reorder(backward, forward)
+            self._link(upstream, downstream)
+            return None
+
+    @staticmethod
+    def _link(upstream: 'Job', downstream: 'Job') -> None:
+        downstream._upstreams.append(upstream)
+        upstream._downstreams.append(downstream)
+
+    @staticmethod
+    def _search_downstreams(start: 'Job', target: 'Job', upper: int) -> 'list[Job] | set[Job]':
+        """Collect the downstreams of `start` indexed below `upper`.
+
+        Returns the path `target -> ... -> start` (following upstreams) if
+        `target` is reached, otherwise the set of visited jobs.
+        """
+        parents: dict['Job', Optional['Job']] = {start: None}
+        stack = [start]
+        while stack:
+            job = stack.pop()
+            for downstream in job._downstreams:
+                if downstream is target:
+                    path = [target, job]
+                    while parents[path[-1]] is not None:
+                        path.append(parents[path[-1]])
+                    return path
+                if downstream not in parents and downstream._topo_index < upper:
+                    parents[downstream] = job
+                    stack.append(downstream)
+        return set(parents)
+
+    @staticmethod
+    def _search_upstreams(start: 'Job', lower: int) -> set['Job']:
+        """Collect the upstreams of `start` indexed above `lower`."""
+        visited = {start}
+        stack = [start]
+        while stack:
+            job = stack.pop()
+            for upstream in job._upstreams:
+                if upstream not in visited and upstream._topo_index > lower:
+                    visited.add(upstream)
+                    stack.append(upstream)
+        return visited
+
+    @staticmethod
+    def _reorder(backward: set['Job'], forward: set['Job']) -> None:
+        """Reuse the indices of both regions, placing `backward` before `forward`."""
+        backward_jobs = sorted(backward, key=lambda job: job._topo_index)
+        forward_jobs = sorted(forward, key=lambda job: job._topo_index)
+        indices = sorted(job._topo_index for job in itertools.chain(backward_jobs, forward_jobs))
+        for job, index in zip(itertools.chain(backward_jobs, forward_jobs), indices):
+            job._topo_index = index
+
+
+# Shared by all jobs, rivers may join jobs created anywhere.
+job_order = TopologicalOrder()
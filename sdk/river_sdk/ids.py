@@ -0,0 +1,54 @@
+import uuid
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+    from river_sdk.plan import ExecutionPlan
+
+# Namespace of the name-based UUIDs of deterministic ids.
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "river-sdk/ids")
+
+
+def random_id() -> str:
+    return str(uuid.uuid4())
+
+
+def river_id(name: str) -> str:
+    """The deterministic id of a river, from its name."""
+    return str(uuid.uuid5(ID_NAMESPACE, f"river/{name}"))
+
+
+def job_id(river_id: str, job: 'Job', level: int) -> str:
+    """The deterministic id of a job, from its river, class, name and level in the graph."""
+    cls = type(job)
+    return str(uuid.uuid5(ID_NAMESPACE, f"{river_id}/{cls.__module__}.{cls.__qualname__}/{job.name}/{level}"))
+
+
+def task_id(job_id: str, ordinal: int) -> str:
+    """The deterministic id of the job's task started as `ordinal`-th, counting from 0."""
+    return f"{job_id}.{ordinal}"
+
+
+def check_unique_names(plan: 'ExecutionPlan', river_name: str, reason: str) -> None:
+    """Raise ValueError naming the first job name used by two jobs of the plan."""
+    seen: dict[str, 'Job'] = {}
+    for job in plan:
+        other = seen.setdefault(job.name, job)
+        if other is not job:
+            raise ValueError(
+                f"Job name '{job.name}' is used by more than one job of river '{river_name}' "
+                f"({type(other).__name__} and {type(job).__name__}), {reason}"
+            )
+
+
+def assign_job_ids(plan: 'ExecutionPlan', river_id: str, river_name: str) -> None:
+    """Give every job of the plan its deterministic id, and restart its task ordinals.
+
+    Levels only depend on a job's upstreams, which are all in the plan, so
+    a job gets the same id whichever outlet the plan leads to.
+    """
+    check_unique_names(plan, river_name, "deterministic ids need unique names")
+    for level, jobs in enumerate(plan.levels):
+        for job in jobs:
+            job.id = job_id(river_id, job, level)
+            job._task_ordinal = 0
@@ -1,10 +1,23 @@
+import asyncio
+import pickle
+import time
+import weakref
 from abc import ABC, abstractmethod
 from contextvars import ContextVar
-from typing import Callable, Any, Optional
-import uuid
-from river_sdk.sandbox.base_sandbox import BaseSandbox
-from river_common.status import JobStatus
-from river_common.shared import Status
+from pathlib import Path
+from typing import AsyncContextManager, Callable, Any, Optional
+from river_sdk.sandbox.base_sandbox import BaseSandbox, SandboxCreator, SandboxForker
+from river_sdk.sandbox.output import DEFAULT_RETAIN_LIMIT, CommandOutput, retain_outputs
+from river_sdk.durations import busy_seconds
+from river_sdk.graph import job_order
+from river_sdk.ids import random_id
+from river_sdk.job_cache import cache_key
+from river_sdk.task_logs import remove_task_logs, task_logs_dir
+from river_sdk.task_slots import TaskSlots
+from river_sdk.timing import timed
+from river_common.event import StatusEvent
+from river_common.exporter import status_exporter
+from river_common.shared import ModuleTypes, Status
 
 
 class JobContext():
@@ -26,6 +39,24 @@ class JobContext():
 
 
 class Job(ABC):
+    # How many tasks of this job may run at once through parallel()/abash().
+    max_parallel_tasks: int = 4
+    # Whether the river's job cache may restore this job instead of running it.
+    # Turn it off for jobs with effects outside their result and sandbox.
+    cacheable: bool = True
+    # Whether the log files its tasks spilled output to are kept once this job
+    # succeeds. Otherwise the streams of the results still in use are read back
+    # into memory first, up to `max_retained_output` bytes for the whole job,
+    # and the streams past that keep their log file. Failed jobs keep them for
+    # their errors, `river gc --max-age` removes those.
+    keep_task_logs: bool = False
+    max_retained_output: int = DEFAULT_RETAIN_LIMIT
+
+    def __new__(cls, *args, **kwargs):
+        job = super().__new__(cls)
+        # The constructor arguments are part of the job's cache key.
+        job._init_args = (args, kwargs)
+        return job
 
     def __init__(
         self,
@@ -33,38 +64,72 @@ class Job(ABC):
         sandbox_creator: Optional[Callable[[], BaseSandbox]] = None,
         upstreams: Optional[list['Job']] = None,
     ):
-        self.id = str(uuid.uuid4())
+        # Random, unless the river assigns deterministic ids when it flows.
+        self.id = random_id()
         self.name = name
         self.result = None
         self._upstreams: list[Job] = []
+        self._downstreams: list[Job] = []
         self.status = Status.PENDING
         self.sandbox: Any = None  # Use Any to avoid forcing users to specify generic types
+        self.snapshot: Optional[str] = None
+        self._handed_over = False
         self._sandbox_creator = sandbox_creator
         self.error: Optional[Exception] = None
+        # Content address of the last run, set when the river has a job cache.
+        self.cache_key: Optional[str] = None
+        # Seconds per phase of the last run, see river_common.status.Timings.
+        self.timings: dict[str, float] = {}
+        # When the job last became ready to run, set by the scheduler.
+        self._ready_at: Optional[float] = None
+        self._task_slots: Optional[tuple[asyncio.AbstractEventLoop, TaskSlots]] = None
+        # The ordinal of the next task with deterministic ids, None for random task ids.
+        self._task_ordinal: Optional[int] = None
+        # Output buffers of the tasks of the current run, whose log files may be removed.
+        # Weak, an output whose result is gone is never read again.
+        self._task_outputs: list[weakref.ref[CommandOutput]] = []
         # TODO, here we are not in River context
         # self.set_status(Status.PENDING) 
+        job_order.add(self)
             
         if upstreams:
             self._join(upstreams)
 
-    def set_status(self, status: Status, exception: Optional[Exception] = None):
+    @property
+    def fork_source(self) -> Optional['Job']:
+        """The job whose sandbox this job forks, if it was given a SandboxForker."""
+        if isinstance(self._sandbox_creator, SandboxForker):
+            return self._sandbox_creator.job
+        return None
+
+    @property
+    def fork_sources(self) -> list['Job']:
+        """The jobs whose sandbox this job may fork, their sandboxes are snapshotted for it.
+
+        That is the job a SandboxForker forks. Creators the river cannot see
+        into, neither a SandboxForker nor a SandboxCreator, may fork any
+        upstream, e.g. `lambda: manager.fork(upstream)`.
+        """
+        creator = self._sandbox_creator
+        if isinstance(creator, SandboxForker):
+            return [creator.job]
+        if creator is None or isinstance(creator, SandboxCreator):
+            return []
+        return list(self._upstreams)
+
+    def set_status(
+        self, status: Status, exception: Optional[Exception] = None, timings: Optional[dict[str, float]] = None
+    ):
         """Set the job status and export"""
         self.status = status
         
         # Import here to avoid circular dependency
         from river_sdk.river import get_current_river
         
-        job_status = JobStatus(
-            id=self.id,
-            name=self.name,
-            parent_id=get_current_river().id,
-            status=status
+        status_exporter().export(
+            StatusEvent(ModuleTypes.JOB, self.id, self.name, get_current_river().id, status, exception,
+                        timings=timings)
         )
-        
-        if status == Status.FAILED and exception:
-            job_status.set_failed(exception)
-        
-        job_status.export()
 
     @abstractmethod
     def main(self) -> Any:
@@ -72,72 +137,281 @@ class Job(ABC):
         pass
 
     def run(self):
-        from river_sdk.river import get_current_sandbox_manager
+        """Run this job after its upstreams, one job at a time."""
+        from river_sdk.plan import ExecutionPlan
+        from river_sdk.scheduler import Scheduler
         # TODO: this could be a problem for async jobs
         if self.status == Status.RUNNING:
             raise RuntimeError(f"Job '{self.name}' is already running.")
-        
-        if not self._run_already_finished() and not self._should_skip_due_to_upstream():
-            try:
-                if self._sandbox_creator:
-                    self.sandbox = self._sandbox_creator()
-                with JobContext(self):
-                    self._execute_main()
-                if self.sandbox:
-                    get_current_sandbox_manager().take_snapshot(self.sandbox)
-            except Exception as e:
-                self.result = None
-                self.error = e
-                self.set_status(Status.FAILED, e)
-            finally:
-                if self.sandbox:
-                    get_current_sandbox_manager().destory(self.sandbox)
 
+        Scheduler().run(ExecutionPlan(self))
+        return self.status, self.result, self.error
+
+    def _run_self(self, forks: int = 0, hand_over: bool = False):
+        """Run this job only, assuming all upstreams have already finished.
+
+        Args:
+            forks: How many jobs will fork this job's sandbox. The sandbox is
+                only snapshotted when some job will.
+            hand_over: The only job forking this sandbox runs in the same
+                flow, so the sandbox may be handed to it instead of copied.
+
+        The final status is exported once the sandbox is closed, with the
+        time spent in each phase.
+        """
+        self._start_timings()
+        if self._restore_from_cache(forks):
+            return
+        error = None
+        try:
+            self._open_sandbox()
+            with JobContext(self):
+                self._execute_main()
+            self._save_sandbox(forks, hand_over)
+            self._store_in_cache()
+        except Exception as e:
+            error = e
+        try:
+            self._close_sandbox(error)
+        finally:
+            self._finish(error)
+
+    async def _arun_self(self, forks: int = 0, hand_over: bool = False):
+        """Run this job from an event loop, on a worker thread."""
+        await asyncio.to_thread(self._run_self, forks, hand_over)
+
+    def _task_slot(self, exclusive: bool = False) -> AsyncContextManager[None]:
+        """A slot of this job's concurrent tasks on the running loop, see TaskSlots."""
+        loop = asyncio.get_running_loop()
+        if self._task_slots is None or self._task_slots[0] is not loop:
+            self._task_slots = (loop, TaskSlots(self.max_parallel_tasks))
+        return self._task_slots[1].slot(exclusive)
+
+    def _start_timings(self):
+        self.timings = {}
+        if self._ready_at is not None:
+            self.timings["queue_wait"] = time.monotonic() - self._ready_at
+
+    def _open_sandbox(self):
+        if self._sandbox_creator:
+            phase = "fork" if isinstance(self._sandbox_creator, SandboxForker) else "sandbox_create"
+            with timed(self.timings, phase):
+                self.sandbox = self._sandbox_creator()
+
+    def _save_sandbox(self, forks: int, hand_over: bool = False):
+        from river_sdk.river import get_current_river
+        if not self.sandbox or not forks:
+            return
+        river = get_current_river()
+        # Cached and journaled snapshots outlive the flow, such sandboxes are not handed over.
+        hand_over = hand_over and self.cache_key is None and river.journal is None
+        if hand_over and river.sandbox_manager.hand_over(self.sandbox, river.run_id):
+            self._handed_over = True
+            return
+        with timed(self.timings, "snapshot"):
+            self.snapshot = river.sandbox_manager.take_snapshot(self.sandbox)
+            river.sandbox_manager.retain_snapshot(self.snapshot, forks, river.run_id)
+
+    def _close_sandbox(self, error: Optional[Exception] = None):
+        from river_sdk.river import get_current_sandbox_manager
+        if self.sandbox and not self._handed_over:
+            with timed(self.timings, "teardown"):
+                get_current_sandbox_manager().destory(self.sandbox)
+        self._release_fork_source(succeeded=error is None)
+
+    def _restore_from_cache(self, forks: int) -> bool:
+        """Take the result of an earlier run with the same cache key, if there is one.
+
+        Entries are only used when the snapshot that forks need still exists.
+        Restored jobs report Status.CACHED and never get a sandbox.
+        """
+        from river_sdk.river import get_current_river
+        river = get_current_river()
+        cache = river.job_cache
+        if cache is None:
+            return False
+        self.cache_key = cache_key(self, river.default_sandbox_config)
+        if self.cache_key is None:
+            return False
+        entry = cache.get(self.cache_key)
+        if entry is None:
+            return False
+        if forks and self._sandbox_creator and (
+            entry.snapshot is None or not river.sandbox_manager.has_snapshot(entry.snapshot)
+        ):
+            cache.invalidate(self.cache_key)
+            return False
+        self.result = entry.result
+        self.snapshot = entry.snapshot
+        self.error = None
+        self.set_status(Status.CACHED, timings=self.timings)
+        self._release_fork_source()
+        self._journal()
+        return True
+
+    def _store_in_cache(self):
+        """Record the finished run under its cache key, keeping its snapshot."""
+        from river_sdk.river import get_current_river
+        river = get_current_river()
+        if river.job_cache is None or self.cache_key is None:
+            return
+        try:
+            evicted = river.job_cache.put(self.cache_key, self.result, self.snapshot)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Results that cannot be pickled are just not cached.
+            return
+        if self.snapshot is not None:
+            river.sandbox_manager.keep_snapshot(self.snapshot)
+        for entry in evicted:
+            if entry.snapshot is not None:
+                river.sandbox_manager.remove_snapshot(entry.snapshot)
+
+    def _release_fork_source(self, succeeded: bool = True):
+        """Give up this job's references on the sandboxes it may fork from.
+
+        With a run journal, the snapshot of jobs that did not succeed is
+        kept and recorded in the journal, a resumed run forks from it again.
+        """
+        from river_sdk.river import get_current_river, get_current_sandbox_manager
+        river = get_current_river()
+        for source in self.fork_sources:
+            if source.snapshot is not None:
+                if not succeeded and river.journal is not None:
+                    get_current_sandbox_manager().keep_snapshot(source.snapshot)
+                    river.journal.keep_snapshot(river.run_id, source.snapshot)
+                else:
+                    get_current_sandbox_manager().release_snapshot(source.snapshot)
+            elif source._handed_over:
+                get_current_sandbox_manager().reclaim(source.sandbox)
+
+    def _journal(self):
+        """Record the final state of this job in the river's run journal, if it has one."""
+        from river_sdk.river import get_current_river
+        river = get_current_river()
+        if river.journal is not None:
+            river.journal.record(river.run_id, self)
+
+    def _record_duration(self):
+        """Add how long this run took to the river's duration store, if it has one."""
+        from river_sdk.river import get_current_river
+        river = get_current_river()
+        if river.durations is not None:
+            river.durations.record(river.name, self, busy_seconds(self.timings))
+
+    def _fail(self, exception: Exception):
+        self.result = None
+        self.error = exception
+        self.set_status(Status.FAILED, exception, self.timings)
+
+    def _finish(self, error: Optional[Exception]):
+        if error is None:
+            self.set_status(Status.SUCCESS, timings=self.timings)
+            self._record_duration()
+            if not self.keep_task_logs:
+                self._remove_task_logs()
+        else:
+            self._fail(error)
+        self._task_outputs = []
+        self._journal()
+
+    def _remove_task_logs(self):
+        """Move the output of this run's tasks back into memory and remove their log files.
+
+        Only the outputs that results still refer to are read back. The logs
+        directory stays while some of them do not fit `max_retained_output`.
+        """
+        outputs = [output for output in (ref() for ref in self._task_outputs) if output is not None]
+        if retain_outputs(outputs, self.max_retained_output):
+            remove_task_logs(self._run_id(), self.id)
+
+    def _task_logs_dir(self) -> Path:
+        """Where the tasks of this run spill output, see task_logs_dir."""
+        return task_logs_dir(self._run_id(), self.id)
+
+    def _run_id(self) -> Optional[str]:
+        from river_sdk.river import RiverContextError, get_current_river
+        try:
+            return get_current_river().run_id
+        except RiverContextError:
+            # Tasks run in a bare JobContext.
+            return None
+
+    def _outcome(self):
         print(self.name, self.status, self.result, self.error)
         return self.status, self.result, self.error
 
     def _join(self, upstreams: list['Job']):
+        joined = set(self._upstreams)
         for job in upstreams:
-            cycle_path = self._find_cycle_path(job, self)
+            if job in joined:
+                continue
+            cycle_path = job_order.add_edge(job, self)
             if cycle_path:
                 if cycle_path[0] is not cycle_path[-1]:
                     cycle_path.append(cycle_path[0])
                 cycle_str = ' -> '.join(j.name for j in cycle_path)
                 msg = f"Joining {job.name} would create a cycle with {self.name}: {cycle_str}"
                 raise ValueError(msg)
-            if job not in self._upstreams:
-                self._upstreams.append(job)
-
-    def _find_cycle_path(self, start: 'Job', target: 'Job', path=None) -> Optional[list['Job']]:
-        if path is None:
-            path = []
-        path.append(start)
-        if start is target:
-            return path.copy()
-        for upstream in start._upstreams:
-            result = self._find_cycle_path(upstream, target, path)
-            if result:
-                return result
-        path.pop()
-        return None
+            joined.add(job)
 
     def _run_already_finished(self):
-        return self.status in (Status.SUCCESS, Status.FAILED, Status.SKIPPED)
+        return self.status in (Status.SUCCESS, Status.CACHED, Status.FAILED, Status.SKIPPED)
+
+    def _upstream_blocked(self) -> bool:
+        """Whether any (already finished) upstream failed or was skipped."""
+        return any(job.status in (Status.FAILED, Status.SKIPPED) for job in self._upstreams)
 
-    def _should_skip_due_to_upstream(self):
-        for job in self._upstreams:
-            job.run()
-            if job.status in (Status.FAILED, Status.SKIPPED):
-                self.result = None
-                self.set_status(Status.SKIPPED)
-                return True
-        return False
+    def _skip(self):
+        self.result = None
+        self.set_status(Status.SKIPPED)
+        self._release_fork_source(succeeded=False)
+        self._journal()
 
     def _execute_main(self):
         self.set_status(Status.RUNNING)
-        result = self.main()
-        self.result = result
-        self.set_status(Status.SUCCESS)
+        with timed(self.timings, "execution"):
+            self.result = self.main()
+
+
+class AsyncJob(Job):
+    """A job whose main() is a coroutine.
+
+    Inside main(), tasks are awaited (e.g. `await abash(...)`) so many jobs can
+    share one event loop under `River.aflow()`. Sandbox creation, snapshots
+    and teardown still use the blocking sandbox manager, on worker threads.
+    Under the blocking `River.flow()` each AsyncJob gets its own event loop.
+    """
+
+    @abstractmethod
+    async def main(self) -> Any:
+        """Abstract coroutine that must be implemented by subclasses."""
+        pass
+
+    def _run_self(self, forks: int = 0, hand_over: bool = False):
+        asyncio.run(self._arun_self(forks, hand_over))
+
+    async def _arun_self(self, forks: int = 0, hand_over: bool = False):
+        self._start_timings()
+        if await asyncio.to_thread(self._restore_from_cache, forks):
+            return
+        error = None
+        try:
+            await asyncio.to_thread(self._open_sandbox)
+            with JobContext(self):
+                await self._aexecute_main()
+            await asyncio.to_thread(self._save_sandbox, forks, hand_over)
+            await asyncio.to_thread(self._store_in_cache)
+        except Exception as e:
+            error = e
+        try:
+            await asyncio.to_thread(self._close_sandbox, error)
+        finally:
+            self._finish(error)
+
+    async def _aexecute_main(self):
+        self.set_status(Status.RUNNING)
+        with timed(self.timings, "execution"):
+            self.result = await self.main()
 
 
 class JobContextError(Exception):
@@ -0,0 +1,264 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import types
+from abc import ABC
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+from river_sdk.sandbox.base_sandbox import SandboxCreator, SandboxForker
+from river_sdk.sandbox.snapshot_refs import river_home
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+
+# Stored results of at most this many bytes in total by default.
+DEFAULT_CACHE_SIZE = 1 << 30
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    result: Any
+    # The job's snapshot, None when nothing forked the job when it ran.
+    snapshot: Optional[str]
+    size: int
+    # When the entry was put, seconds since the epoch.
+    created: float = 0.0
+    # A file stored with the entry, e.g. the files a cached task changed.
+    attachment: Optional[Path] = None
+
+
+class JobCache:
+    """Results of finished jobs on local disk, by cache key.
+
+    Each entry is a pickle of the job's result and snapshot tag under
+    `<root>/<key[:2]>/<key>.pickle`, with its attachment, if any, next to it
+    as `<key>.data`. Reading an entry marks it as used, and once the entries
+    take more than `max_size` bytes the least recently used ones are evicted.
+    Snapshot images are not counted, the caller removes the snapshots of
+    evicted entries.
+
+    Args:
+        root: Where entries are stored, `<river home>/cache/jobs` by default.
+        max_size: Bytes the entries may take.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_size: int = DEFAULT_CACHE_SIZE):
+        self.root = root or river_home() / "cache" / "jobs"
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        with self._lock:
+            try:
+                data = path.read_bytes()
+                entry = pickle.loads(data)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                # Missing, or written by code that no longer loads.
+                self.misses += 1
+                return None
+            os.utime(path)
+            self.hits += 1
+        attachment = path.with_suffix(".data")
+        return CacheEntry(
+            key, entry["result"], entry["snapshot"], len(data), entry.get("created", 0.0),
+            attachment if attachment.exists() else None,
+        )
+
+    def put(
+        self, key: str, result: Any, snapshot: Optional[str] = None, attachment: Optional[Path] = None
+    ) -> list[CacheEntry]:
+        """Store the entry and return the ones evicted to make room for it.
+
+        The attachment file is moved into the cache. Raises
+        pickle.PicklingError (or TypeError) for results that cannot be
+        pickled, nothing is stored then.
+        """
+        data = pickle.dumps({"result": result, "snapshot": snapshot, "created": time.time()})
+        path = self._path(key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if attachment is not None:
+                shutil.move(attachment, path.with_suffix(".data"))
+            else:
+                path.with_suffix(".data").unlink(missing_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            return self._evict(keep=path)
+
+    def invalidate(self, key: str) -> None:
+        """Drop an entry get() returned that turned out unusable, counting it as a miss."""
+        with self._lock:
+            self._remove(self._path(key))
+            self.hits -= 1
+            self.misses += 1
+
+    def stats(self) -> dict:
+        """Hits, misses and evictions of this cache object, entries and bytes on disk."""
+        with self._lock:
+            entries = self._entries()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size": sum(size for _, _, size in entries),
+            }
+
+    def _evict(self, keep: Path) -> list[CacheEntry]:
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for path, _, size in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                entry = pickle.loads(path.read_bytes())
+                snapshot = entry["snapshot"]
+            except Exception:
+                snapshot = None
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+            evicted.append(CacheEntry(path.stem, None, snapshot, size))
+        return evicted
+
+    def _entries(self) -> list[tuple[Path, float, int]]:
+        """Path, last use and size, with the attachment, of every entry."""
+        entries = []
+        for path in self.root.glob("*/*.pickle") if self.root.is_dir() else []:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            try:
+                attached = path.with_suffix(".data").stat().st_size
+            except OSError:
+                attached = 0
+            entries.append((path, stat.st_mtime, stat.st_size + attached))
+        return entries
+
+    def _remove(self, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".data").unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pickle"
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def cache_key(job: 'Job', sandbox_config: Any) -> Optional[str]:
+    """The content address of a job's run, None when it cannot have one.
+
+    It covers the source of the job's classes, its constructor arguments,
+    the cache keys of its upstreams and where its sandbox comes from: the
+    key of the job it forks, or the river's default sandbox config. Jobs
+    with an upstream without a key, whose source is not available, or with
+    arguments that only have an identity (a repr with an address) get none.
+    Functions, such as sandbox creators, count by their code, defaults and
+    the values they close over.
+    """
+    if not job.cacheable:
+        return None
+    upstream_keys = [upstream.cache_key for upstream in job._upstreams]
+    if None in upstream_keys:
+        return None
+    try:
+        parts = {
+            "source": _class_sources(type(job)),
+            "args": _fingerprint(job._init_args),
+            "upstreams": upstream_keys,
+            "sandbox": _fingerprint(job._sandbox_creator) if job._sandbox_creator else None,
+            "sandbox_config": _fingerprint(sandbox_config),
+        }
+    except _Uncacheable:
+        return None
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _class_sources(cls: type) -> list[str]:
+    from river_sdk.job import Job, AsyncJob
+
+    sources = []
+    for klass in cls.__mro__:
+        if klass in (Job, AsyncJob, ABC, object):
+            continue
+        try:
+            sources.append(inspect.getsource(klass))
+        except (OSError, TypeError):
+            if issubclass(klass, Job):
+                raise _Uncacheable()
+            # Builtin mixins have no source, they do not change between runs.
+            sources.append(f"{klass.__module__}.{klass.__qualname__}")
+    return sources
+
+
+def _fingerprint(value: Any) -> Any:
+    """A JSON value standing for `value` across processes."""
+    from river_sdk.job import Job
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return {"bytes": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(item) for item in value]
+    if isinstance(value, dict):
+        return sorted(([_fingerprint(key), _fingerprint(item)] for key, item in value.items()), key=json.dumps)
+    if isinstance(value, (set, frozenset)):
+        # Their repr() follows the string hashes, which differ per process.
+        return {"set": sorted((_fingerprint(item) for item in value), key=json.dumps)}
+    if isinstance(value, Job):
+        # Its run is covered by its own key, if it is an upstream.
+        return {"job": value.name, "key": value.cache_key}
+    if isinstance(value, SandboxForker):
+        return {"fork": _fingerprint(value.job)}
+    if isinstance(value, SandboxCreator):
+        return _fingerprint(value._create)
+    if isinstance(value, partial):
+        return {"partial": [_fingerprint(value.func), _fingerprint(value.args), _fingerprint(value.keywords)]}
+    if inspect.ismethod(value):
+        return {"method": _fingerprint(value.__func__), "self": _fingerprint(value.__self__)}
+    if inspect.isfunction(value):
+        # Lambdas and closures share a qualname, what they do and capture tells them apart.
+        try:
+            cells = [cell.cell_contents for cell in value.__closure__ or ()]
+        except ValueError:
+            # A cell not filled in yet.
+            raise _Uncacheable()
+        return {
+            "callable": f"{value.__module__}.{value.__qualname__}",
+            "code": _code_fingerprint(value.__code__),
+            "closure": _fingerprint(cells),
+            "defaults": _fingerprint([value.__defaults__, value.__kwdefaults__]),
+        }
+    if inspect.isclass(value):
+        return {"callable": f"{value.__module__}.{value.__qualname__}"}
+    text = repr(value)
+    if " at 0x" in text:
+        raise _Uncacheable()
+    return {"repr": text}
+
+
+def _code_fingerprint(code: types.CodeType) -> str:
+    """A hash of what the code does, its bytecode, names and constants."""
+    consts = [_code_fingerprint(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts]
+    parts = [code.co_code.hex(), code.co_names, consts]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
@@ -0,0 +1,194 @@
+import pickle
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+from river_sdk.sandbox.snapshot_refs import river_home
+from river_common.shared import Status
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+
+# Job statuses a resumed run keeps, the other jobs run again.
+FINISHED = (Status.SUCCESS, Status.CACHED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    river TEXT NOT NULL,
+    outlet TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    resumed_from TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result BLOB,
+    restorable INTEGER NOT NULL,
+    snapshot TEXT,
+    error TEXT,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS kept_snapshots (
+    run_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (run_id, tag)
+);
+"""
+
+
+@dataclass
+class JournaledRun:
+    run_id: str
+    river: str
+    outlet: str
+    status: Status
+    started_at: float
+    finished_at: Optional[float]
+    resumed_from: Optional[str]
+
+
+@dataclass
+class JournaledJob:
+    name: str
+    status: Status
+    # Whether the result could be pickled, jobs without one cannot be restored.
+    restorable: bool
+    result: Any
+    snapshot: Optional[str]
+    error: Optional[str]
+
+
+class RunJournal:
+    """SQLite record of river runs and the final state of their jobs.
+
+    Each flow of a river with a journal is a run, under the river's run_id.
+    Every job that finishes records its status, pickled result and snapshot
+    tag, keyed by job name, so a later `River.flow(resume=run_id)` can
+    restore the jobs that succeeded. Writes are committed one by one, a
+    crashed run keeps what finished before the crash.
+
+    Snapshots kept for the forks that failed are recorded too, a resumed
+    run takes them over, and `river gc` removes the ones no run can resume
+    from anymore.
+
+    Args:
+        path: The database file, `<river home>/journal.sqlite` by default.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or river_home() / "journal.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Jobs finish on worker threads, one connection serves them all under the lock.
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def begin(self, run_id: str, river: str, outlet: str, resumed_from: Optional[str] = None) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (run_id, river, outlet, Status.RUNNING.value, time.time(), resumed_from),
+            )
+
+    def end(self, run_id: str, status: Status) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?", (status.value, time.time(), run_id)
+            )
+
+    def record(self, run_id: str, job: 'Job') -> None:
+        """Record the job's final status, result and snapshot."""
+        try:
+            result, restorable = pickle.dumps(job.result), True
+        except (pickle.PicklingError, TypeError, AttributeError):
+            result, restorable = None, False
+        error = str(job.error) if job.error is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, job.name, job.status.value, result, restorable, job.snapshot, error, time.time()),
+            )
+
+    def run(self, run_id: str) -> Optional[JournaledRun]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return _run(row) if row else None
+
+    def runs(self, river: Optional[str] = None, limit: int = 20) -> list[JournaledRun]:
+        """The most recent runs first, of the given river or of all."""
+        query, params = "SELECT * FROM runs", ()
+        if river is not None:
+            query, params = query + " WHERE river = ?", (river,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY started_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_run(row) for row in rows]
+
+    def jobs(self, run_id: str) -> dict[str, JournaledJob]:
+        """The recorded jobs of the run, by name."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, status, result, restorable, snapshot, error FROM jobs WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        jobs = {}
+        for name, status, result, restorable, snapshot, error in rows:
+            try:
+                value = pickle.loads(result) if restorable else None
+            except Exception:
+                # Written by code that no longer loads, the job runs again.
+                value, restorable = None, False
+            jobs[name] = JournaledJob(name, Status(status), bool(restorable), value, snapshot, error)
+        return jobs
+
+    def keep_snapshot(self, run_id: str, tag: str) -> None:
+        """Record that the run keeps the snapshot for a resumed run to fork from."""
+        with self._lock:
+            self._connection.execute("INSERT OR IGNORE INTO kept_snapshots VALUES (?, ?)", (run_id, tag))
+
+    def kept_snapshots(self, run_id: str) -> set[str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT tag FROM kept_snapshots WHERE run_id = ?", (run_id,)).fetchall()
+        return {tag for tag, in rows}
+
+    def release_snapshots(self, tags: Iterable[str]) -> None:
+        """Forget the snapshots, for every run that kept them."""
+        with self._lock:
+            self._connection.executemany("DELETE FROM kept_snapshots WHERE tag = ?", [(tag,) for tag in tags])
+
+    def abandoned_snapshots(self) -> set[str]:
+        """Kept snapshots no run will be resumed from.
+
+        That is when every run keeping them succeeded, or its river succeeded
+        in a later run.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT kept_snapshots.tag, runs.status, runs.river, runs.started_at FROM kept_snapshots"
+                " LEFT JOIN runs ON runs.run_id = kept_snapshots.run_id"
+            ).fetchall()
+            succeeded = dict(self._connection.execute(
+                "SELECT river, MAX(started_at) FROM runs WHERE status = ? GROUP BY river", (Status.SUCCESS.value,)
+            ).fetchall())
+        needed, kept = set(), set()
+        for tag, status, river, started_at in rows:
+            kept.add(tag)
+            if status is not None and status != Status.SUCCESS.value and started_at >= succeeded.get(river, 0):
+                needed.add(tag)
+        return kept - needed
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _run(row: tuple) -> JournaledRun:
+    run_id, river, outlet, status, started_at, finished_at, resumed_from = row
+    return JournaledRun(run_id, river, outlet, Status(status), started_at, finished_at, resumed_from)
@@ -0,0 +1,125 @@
+from typing import TYPE_CHECKING, Mapping
+
+if TYPE_CHECKING:
+    from river_sdk.job import Job
+
+
+class ExecutionPlan:
+    """The jobs an outlet depends on, in the order they can run.
+
+    The plan is built with an iterative depth-first walk over `Job._upstreams`
+    that visits every job once, so it costs O(V + E) and does not depend on
+    the recursion limit however deep the river is.
+
+    Attributes:
+        target: The outlet job the plan leads to.
+        order: All jobs in the plan, every job after its upstreams.
+        levels: Jobs grouped by their longest distance from a job without
+            upstreams. Jobs of the same level never depend on each other.
+    """
+
+    def __init__(self, target: 'Job'):
+        self.target = target
+        self.order: list['Job'] = _topological_order(target)
+        self._index: dict['Job', int] = {job: i for i, job in enumerate(self.order)}
+        self._downstreams: dict['Job', list['Job']] = {job: [] for job in self.order}
+        for job in self.order:
+            for upstream in job._upstreams:
+                self._downstreams[upstream].append(job)
+        self.levels: list[list['Job']] = self._build_levels()
+        self._fork_consumers: dict['Job', list['Job']] = self._find_fork_consumers()
+
+    @property
+    def width(self) -> int:
+        """Size of the widest level, an upper bound for useful parallelism."""
+        return max(len(level) for level in self.levels)
+
+    def index(self, job: 'Job') -> int:
+        """Position of the job in `order`."""
+        return self._index[job]
+
+    def downstreams(self, job: 'Job') -> list['Job']:
+        """Jobs in this plan that directly depend on the given job."""
+        return self._downstreams[job]
+
+    def fork_consumers(self, job: 'Job') -> list['Job']:
+        """Jobs that will fork the sandbox of the given job.
+
+        These are the jobs of this plan forking from it, plus its direct
+        downstreams outside the plan that do, since they may still run in a
+        later flow.
+        """
+        return self._fork_consumers.get(job, [])
+
+    def hands_over(self, job: 'Job') -> bool:
+        """Whether the job's live sandbox can be handed to the one job forking it.
+
+        That is the case when exactly one job forks from it and that job is in
+        this plan, so it is known to run (or be skipped) in this flow.
+        """
+        consumers = self.fork_consumers(job)
+        return len(consumers) == 1 and consumers[0] in self
+
+    def remaining_paths(self, costs: Mapping['Job', float]) -> dict['Job', float]:
+        """Cost of the costliest path from each job to the target, the job's own included.
+
+        This is the upward rank of HEFT list scheduling: starting jobs with
+        the longest remaining path first keeps the critical path moving.
+        """
+        remaining: dict['Job', float] = {}
+        for job in reversed(self.order):
+            after = max((remaining[downstream] for downstream in self._downstreams[job]), default=0.0)
+            remaining[job] = costs[job] + after
+        return remaining
+
+    def _find_fork_consumers(self) -> dict['Job', list['Job']]:
+        consumers: dict['Job', list['Job']] = {}
+        for job in self.order:
+            for source in job.fork_sources:
+                consumers.setdefault(source, []).append(job)
+        for job in self.order:
+            for downstream in job._downstreams:
+                if downstream not in self._index and job in downstream.fork_sources:
+                    consumers.setdefault(job, []).append(downstream)
+        return consumers
+
+    def _build_levels(self) -> list[list['Job']]:
+        depth: dict['Job', int] = {}
+        levels: list[list['Job']] = []
+        for job in self.order:
+            level = max((depth[upstream] + 1 for upstream in job._upstreams), default=0)
+            depth[job] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(job)
+        return levels
+
+    def __contains__(self, job: object) -> bool:
+        return job in self._index
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __repr__(self) -> str:
+        return f"ExecutionPlan(target={self.target.name!r}, jobs={len(self)}, levels={len(self.levels)}, width={self.width})"
+
+
+def _topological_order(target: 'Job') -> list['Job']:
+    """Return the jobs `target` depends on (and itself), upstreams first."""
+    order: list['Job'] = []
+    visited = {target}
+    stack = [(target, iter(target._upstreams))]
+    while stack:
+        job, upstreams = stack[-1]
+        for upstream in upstreams:
+            if upstream not in visited:
+                visited.add(upstream)
+                stack.append((upstream, iter(upstream._upstreams)))
+                break
+        else:
+            stack.pop()
+            order.append(job)
+    return order
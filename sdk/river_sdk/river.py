@@ -1,10 +1,21 @@
+import asyncio
+import time
 from contextvars import ContextVar
 from typing import Optional, Any, Callable, Mapping
-import uuid
-from river_sdk.sandbox.base_sandbox import BaseSandbox, BaseSandboxManager
+from river_sdk.sandbox.base_sandbox import BaseSandbox, BaseSandboxManager, SandboxCreator, SandboxForker
+from river_sdk.durations import DurationStore, job_costs
+from river_sdk.ids import assign_job_ids, check_unique_names, random_id, river_id
 from river_sdk.job import Job
-from river_common.status import RiverStatus
-from river_common.shared import Status
+from river_sdk.job_cache import JobCache
+from river_sdk.journal import FINISHED, JournaledJob, RunJournal
+from river_sdk.plan import ExecutionPlan
+from river_sdk.scheduler import Scheduler, AsyncScheduler, predict_makespan
+from river_common.exporter import status_exporter
+from river_common.event import StatusEvent
+from river_common.shared import ModuleTypes, Status
+
+# Seconds a finished run waits for its status events to be written, a stuck reader does not hold it.
+STATUS_FLUSH_TIMEOUT = 30.0
 
 
 class RiverContext():
@@ -33,50 +44,203 @@ class River:
         outlets: Mapping[str, Job],
         default_sandbox_config: Any = None,
         max_parallel_jobs: int = 1,
+        job_cache: Optional[JobCache] = None,
+        journal: Optional[RunJournal] = None,
+        deterministic_ids: bool = False,
+        durations: Optional[DurationStore] = None,
     ):
-        self.id = str(uuid.uuid4())
+        # With deterministic ids the river, job and task ids derive from the river
+        # name, each job's class, name and level, and the order its tasks start in.
+        self.deterministic_ids = deterministic_ids
+        self.id = river_id(name) if deterministic_ids else random_id()
+        # Unique per flow, the journal and the sandbox manager track runs by it.
+        self.run_id: Optional[str] = None
         self.name = name
         self.sandbox_manager = sandbox_manager
         self.outlets = outlets
         self.default_sandbox_config = default_sandbox_config
         self.max_parallel_jobs = max_parallel_jobs
+        # Opt-in: jobs whose cache key is found here are restored instead of run.
+        self.job_cache = job_cache
+        # Opt-in: every flow is recorded as a run, see flow(resume=...).
+        self.journal = journal
+        # Opt-in: ready jobs start by longest remaining path, estimated from past runs.
+        self.durations = durations
+        # Seconds the last run was estimated to take (with a duration store) and took.
+        self.predicted_makespan: Optional[float] = None
+        self.makespan: Optional[float] = None
         self._default_sandbox_creator = None
         self.set_status(Status.PENDING)
 
 
     def set_status(self, status: Status, exception: Optional[Exception] = None):
         """Set the river status and export"""
-        river_status = RiverStatus(
-            id=self.id,
-            name=self.name,
-            status=status
-        )
-        
-        if status == Status.FAILED and exception:
-            river_status.set_failed(exception)
-        
-        river_status.export()
+        status_exporter().export(StatusEvent(ModuleTypes.RIVER, self.id, self.name, None, status, exception))
     
-    def flow(self, outlet: str = "default") -> None:
-        """Flow the river to the specified outlet (default: 'default')"""
+    def plan(self, outlet: str = "default") -> ExecutionPlan:
+        """Build the execution plan of the specified outlet (default: 'default')"""
         if outlet not in self.outlets:
             available = list(self.outlets.keys())
             raise ValueError(f"Outlet '{outlet}' not found. Available outlets: {available}")
-        
-        target_job = self.outlets[outlet]
+
+        return ExecutionPlan(self.outlets[outlet])
+
+    def flow(self, outlet: str = "default", resume: Optional[str] = None) -> None:
+        """Flow the river to the specified outlet (default: 'default')
+
+        Args:
+            resume: The id of a journaled run of this river. Jobs that
+                succeeded in it are restored with their result and snapshot,
+                only the others run.
+        """
+        plan = self.plan(outlet)
+        recorded = self._prepare_run(plan, resume)
         
         try:
             self.set_status(Status.RUNNING)
+            self.sandbox_manager.begin_river(self.run_id)
             with RiverContext(self):
-                self.run_job(target_job)
+                self._begin_run(plan, outlet, resume, recorded)
+                self.run_plan(plan)
             self.set_status(Status.SUCCESS)
         except Exception as e:
             self.set_status(Status.FAILED, e)
             raise
+        finally:
+            self._end_run(plan)
+            self.sandbox_manager.end_river(self.run_id)
+            self.sandbox_manager.drain()
+            status_exporter().flush(STATUS_FLUSH_TIMEOUT)
         
+    async def aflow(self, outlet: str = "default", resume: Optional[str] = None) -> None:
+        """Flow the river to the specified outlet on the running event loop, see flow()."""
+        plan = self.plan(outlet)
+        recorded = self._prepare_run(plan, resume)
+
+        try:
+            self.set_status(Status.RUNNING)
+            self.sandbox_manager.begin_river(self.run_id)
+            with RiverContext(self):
+                await asyncio.to_thread(self._begin_run, plan, outlet, resume, recorded)
+                priorities = await asyncio.to_thread(self._predict, plan)
+                started = time.monotonic()
+                await AsyncScheduler(self.max_parallel_jobs).run(plan, priorities)
+                await asyncio.to_thread(self._record_makespan, plan, time.monotonic() - started)
+            self.set_status(Status.SUCCESS)
+        except Exception as e:
+            self.set_status(Status.FAILED, e)
+            raise
+        finally:
+            self._end_run(plan)
+            self.sandbox_manager.end_river(self.run_id)
+            await asyncio.to_thread(self.sandbox_manager.drain)
+            await asyncio.to_thread(status_exporter().flush, STATUS_FLUSH_TIMEOUT)
+
+    def _prepare_run(self, plan: ExecutionPlan, resume: Optional[str]) -> dict[str, JournaledJob]:
+        """Start a new run of the plan, and load the jobs of the run to resume.
+
+        Raises ValueError before anything runs when job names collide, or
+        the run cannot be resumed.
+        """
+        self.run_id = random_id()
+        if self.deterministic_ids:
+            assign_job_ids(plan, self.id, self.name)
+        if self.journal is None:
+            if resume is not None:
+                raise ValueError(f"Cannot resume run {resume}, river '{self.name}' has no journal")
+            return {}
+        check_unique_names(plan, self.name, "journaled rivers need unique names")
+        if resume is None:
+            return {}
+        run = self.journal.run(resume)
+        if run is None or run.river != self.name:
+            raise ValueError(f"No journaled run {resume} of river '{self.name}'")
+        return self.journal.jobs(resume)
+
+    def _begin_run(
+        self, plan: ExecutionPlan, outlet: str, resume: Optional[str], recorded: dict[str, JournaledJob]
+    ) -> None:
+        """Record the run and restore the jobs the resumed run finished.
+
+        A job is restored when it succeeded, its result could be pickled,
+        all its upstreams are restored, and the snapshot its forks need still
+        exists. Restored jobs are recorded again, so this run can be resumed
+        in turn.
+
+        Snapshots the resumed run kept for its failed forks are taken over:
+        they are released like this run's own once the jobs forking them
+        here are done.
+        """
+        if self.journal is None:
+            return
+        self.journal.begin(self.run_id, self.name, outlet, resume)
+        restored: set[Job] = set()
+        for job in plan:
+            entry = recorded.get(job.name)
+            if entry is None or entry.status not in FINISHED or not entry.restorable:
+                continue
+            if not all(upstream in restored for upstream in job._upstreams):
+                continue
+            if plan.fork_consumers(job) and job._sandbox_creator and (
+                entry.snapshot is None or not self.sandbox_manager.has_snapshot(entry.snapshot)
+            ):
+                continue
+            job.result = entry.result
+            job.snapshot = entry.snapshot
+            job.error = None
+            job.set_status(entry.status)
+            self.journal.record(self.run_id, job)
+            restored.add(job)
+        if resume is not None:
+            self._adopt_kept_snapshots(plan, resume, restored)
+
+    def _adopt_kept_snapshots(self, plan: ExecutionPlan, resume: str, restored: set[Job]) -> None:
+        kept = self.journal.kept_snapshots(resume)
+        for job in plan:
+            if job not in restored or job.snapshot not in kept:
+                continue
+            forks = sum(1 for consumer in plan.fork_consumers(job) if consumer not in restored)
+            if forks:
+                self.sandbox_manager.retain_snapshot(job.snapshot, forks, self.run_id)
+            else:
+                self.sandbox_manager.remove_snapshot(job.snapshot)
+            self.journal.release_snapshots([job.snapshot])
+
+    def _end_run(self, plan: ExecutionPlan) -> None:
+        if self.journal is None:
+            return
+        failed = any(job.status in (Status.FAILED, Status.SKIPPED, Status.PENDING) for job in plan)
+        self.journal.end(self.run_id, Status.FAILED if failed else Status.SUCCESS)
+
     def run_job(self, job: Job):
-        """Call the run() of target job."""
-        job.run()
+        """Run target job and its upstreams, up to max_parallel_jobs at a time."""
+        self.run_plan(ExecutionPlan(job))
+
+    def run_plan(self, plan: ExecutionPlan):
+        """Walk the execution plan, up to max_parallel_jobs at a time."""
+        priorities = self._predict(plan)
+        started = time.monotonic()
+        Scheduler(self.max_parallel_jobs).run(plan, priorities)
+        self._record_makespan(plan, time.monotonic() - started)
+
+    def _predict(self, plan: ExecutionPlan) -> Optional[dict[Job, float]]:
+        """Estimate the jobs left to run from the duration store, and predict the makespan.
+
+        Returns the scheduling priorities, each job's longest remaining path
+        to the target, or None without a duration store.
+        """
+        self.predicted_makespan = None
+        if self.durations is None:
+            return None
+        costs = job_costs(plan, self.durations.estimates(self.name))
+        priorities = plan.remaining_paths(costs)
+        self.predicted_makespan = predict_makespan(plan, costs, priorities, self.max_parallel_jobs)
+        return priorities
+
+    def _record_makespan(self, plan: ExecutionPlan, seconds: float) -> None:
+        self.makespan = seconds
+        if self.durations is not None:
+            self.durations.record_makespan(self.name, plan.target.name, self.run_id, self.predicted_makespan, seconds)
 
 
 class RiverContextError(Exception):
@@ -101,12 +265,12 @@ def default_sandbox_creator() -> Callable[[], BaseSandbox]:
         config = get_current_river().default_sandbox_config
         return manager.create(config)
     
-    return create_sandbox
+    return SandboxCreator(create_sandbox)
 
 def sandbox_forker(job: Job) -> Callable[[], BaseSandbox]:
     """Create a no-argument callable that forks the sandbox from given job."""
-    def fork_sandbox() -> BaseSandbox:
+    def fork_sandbox(job: Job) -> BaseSandbox:
         manager = get_current_sandbox_manager()
         return manager.fork(job)
     
-    return fork_sandbox
+    return SandboxForker(fork_sandbox, job)
@@ -1,13 +1,44 @@
-from .base_sandbox import BaseSandbox, BaseSandboxManager
-from .docker_sandbox import DockerSandbox, DockerSandboxManager
-from .command_executor import CommandExecutor, LocalCommandExecutor, RemoteCommandExecutor
+from .base_sandbox import BaseSandbox, BaseSandboxManager, SandboxCreator, SandboxForker
+from .docker_sandbox import BaseDockerSandboxManager, DockerSandbox, DockerSandboxManager
+from .docker_pool import ContainerPool, PoolConfig
+from .docker_api import DockerApiSandbox, DockerApiSandboxManager, DockerEngineClient, DockerEngineError
+from .output import CommandOutput, OutputBuffer, OutputTruncatedError, StreamingResult
+from .reaper import TeardownReaper
+from .ssh_pool import SSHConnectionPool
+from .snapshot_refs import RunRegistry, SnapshotReferences
+from .command_executor import (
+    CommandExecutor,
+    LocalCommandExecutor,
+    RemoteCommandExecutor,
+    AsyncCommandExecutor,
+    AsyncLocalCommandExecutor,
+)
 
 __all__ = [
     "BaseSandbox", 
     "BaseSandboxManager",
+    "SandboxCreator",
+    "SandboxForker",
     "DockerSandbox", 
+    "BaseDockerSandboxManager",
     "DockerSandboxManager",
+    "DockerApiSandbox",
+    "DockerApiSandboxManager",
+    "DockerEngineClient",
+    "DockerEngineError",
+    "ContainerPool",
+    "PoolConfig",
+    "CommandOutput",
+    "OutputBuffer",
+    "OutputTruncatedError",
+    "StreamingResult",
+    "RunRegistry",
+    "SSHConnectionPool",
+    "TeardownReaper",
+    "SnapshotReferences",
     "CommandExecutor",
     "LocalCommandExecutor", 
-    "RemoteCommandExecutor"
+    "RemoteCommandExecutor",
+    "AsyncCommandExecutor",
+    "AsyncLocalCommandExecutor",
 ]
\ No newline at end of file
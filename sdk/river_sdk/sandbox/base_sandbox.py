@@ -1,7 +1,9 @@
+import asyncio
 from abc import ABC, abstractmethod
+from pathlib import Path
 from typing import Any, Callable, Optional, TypeVar, TYPE_CHECKING
-from functools import partial
 from invoke.runners import Result
+from river_sdk.sandbox.output import CommandOutput
 
 if TYPE_CHECKING:
     from river_sdk.job import Job
@@ -9,9 +11,61 @@ if TYPE_CHECKING:
 T = TypeVar('T', bound='BaseSandbox')
 
 class BaseSandbox(ABC):
+    # Whether execute() and aexecute() take an `output` to stream into.
+    streams_output: bool = False
+    # Whether mark(), changes() and apply_changes() are supported.
+    records_changes: bool = False
+    _lineage: Optional[str] = None
+    # What the lineage is computed from on first read: the manager's resolver
+    # and the commands folded in since.
+    _resolve_lineage: Optional[Callable[[], Optional[str]]] = None
+    _pending_folds: tuple[Callable[[str], str], ...] = ()
+
     def __init__(self, id: str):
         self.id: str = id
 
+    @property
+    def lineage(self) -> Optional[str]:
+        """Identity of the sandbox's filesystem: what it started from and the
+        bash() commands run in it since, set by the manager. Sandboxes without
+        one never replay cached tasks.
+        """
+        if self._resolve_lineage is not None:
+            lineage = self._resolve_lineage()
+            for fold in self._pending_folds:
+                lineage = None if lineage is None else fold(lineage)
+            self.lineage = lineage
+        return self._lineage
+
+    @lineage.setter
+    def lineage(self, lineage: Optional[str]) -> None:
+        self._resolve_lineage, self._pending_folds = None, ()
+        self._lineage = lineage
+
+    def defer_lineage(self, resolve: Callable[[], Optional[str]]) -> None:
+        """Have the lineage computed by `resolve` when it is first read, most sandboxes never cache a task."""
+        self._resolve_lineage, self._pending_folds = resolve, ()
+
+    def fold_lineage(self, fold: Callable[[str], str]) -> Optional[str]:
+        """Replace the lineage by `fold(lineage)` and return it.
+
+        A lineage not read yet stays unresolved, the fold is applied once it
+        is and None returned.
+        """
+        if self._resolve_lineage is not None:
+            self._pending_folds += (fold,)
+            return None
+        if self._lineage is not None:
+            self._lineage = fold(self._lineage)
+        return self._lineage
+
+    def inherit_lineage(self, parent: 'BaseSandbox') -> None:
+        """Take the lineage of the sandbox this one was forked from, without resolving it."""
+        if parent._resolve_lineage is not None:
+            self._resolve_lineage, self._pending_folds = parent._resolve_lineage, parent._pending_folds
+        else:
+            self.lineage = parent._lineage
+
     @abstractmethod
     def execute(
         self,
@@ -28,18 +82,83 @@ class BaseSandbox(ABC):
 
         Returns:
             Result: Invoke Result class.
+
+        Sandboxes that set `streams_output` also take an `output` argument,
+        a CommandOutput to stream stdout and stderr into.
         """
         pass
 
+    async def aexecute(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        **kwargs,
+    ) -> Result:
+        """Execute the command in sandbox from an event loop.
+
+        Sandboxes without a native asyncio path run execute() on a worker thread.
+        """
+        return await asyncio.to_thread(self.execute, command, cwd, env, **kwargs)
+
+    def mark(self) -> str:
+        """Start tracking the files commands change, returns a marker for changes()."""
+        raise NotImplementedError(f"{type(self).__name__} does not record changes")
+
+    def changes(self, marker: str, archive: Path) -> None:
+        """Write the files created or modified since mark() to `archive`, as a tar file.
+
+        Deleted files are not recorded.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not record changes")
+
+    def apply_changes(self, archive: Path) -> None:
+        """Unpack an archive written by changes() over the root of the sandbox."""
+        raise NotImplementedError(f"{type(self).__name__} does not record changes")
+
     # @abstractmethod
     # def connect(self):
     #     """Connect to sandbox."""
     #     pass
 
+class SandboxCreator:
+    """A no-argument callable that creates a new sandbox, forking none.
+
+    Jobs with any other creator that is not a SandboxForker, such as
+    `lambda: manager.fork(job)`, may fork the sandbox of any of their
+    upstreams, which are then all snapshotted for them.
+    """
+
+    def __init__(self, create: Callable[[], BaseSandbox]):
+        self._create = create
+
+    def __call__(self) -> BaseSandbox:
+        return self._create()
+
+
+class SandboxForker:
+    """A no-argument callable that forks the sandbox of a job.
+
+    Unlike a plain closure it keeps the job it forks from, so the river can
+    tell from the graph which sandboxes will be forked.
+    """
+
+    def __init__(self, fork: Callable[['Job'], BaseSandbox], job: 'Job'):
+        self.job = job
+        self._fork = fork
+
+    def __call__(self) -> BaseSandbox:
+        return self._fork(self.job)
+
+
 class BaseSandboxManager(ABC):
 
     @abstractmethod
     def creator(self, config: Any) -> Callable[[], BaseSandbox]:
+        """Create a no-argument callable that creates a sandbox from the config.
+
+        Return a SandboxCreator, so the river knows the job forks nothing.
+        """
         pass
     
     @abstractmethod
@@ -60,7 +179,7 @@ class BaseSandboxManager(ABC):
         Returns:
             A callable that when invoked will fork the sandbox
         """
-        return partial(self.fork, job)
+        return SandboxForker(self.fork, job)
 
     @abstractmethod
     def fork(self, job: 'Job') -> BaseSandbox:
@@ -76,4 +195,62 @@ class BaseSandboxManager(ABC):
     def take_snapshot(self, sandbox: BaseSandbox) -> str:
         """Task snapshot of current sandbox and return the id of snapshot."""
         pass
-    
\ No newline at end of file
+    
+    def hand_over(self, sandbox: BaseSandbox, run_id: str) -> bool:
+        """Offer the live sandbox to the only job of the river that forks it.
+
+        Returns True if the manager takes it, fork() then returns the sandbox
+        itself instead of a copy, and the job it belonged to must not destroy
+        it. Managers that cannot hand sandboxes over return False, and the
+        sandbox is snapshotted as usual.
+        """
+        return False
+
+    def reclaim(self, sandbox: BaseSandbox) -> None:
+        """Destroy a handed over sandbox that its consumer never forked."""
+        pass
+
+    def drain(self) -> None:
+        """Wait for sandboxes destroyed in the background to be gone.
+
+        Rivers call this before their flow returns.
+        """
+        pass
+
+    def begin_river(self, run_id: str) -> None:
+        """Called when a river starts flowing with this manager."""
+        pass
+
+    def end_river(self, run_id: str) -> None:
+        """Called when a river stops flowing, whether it succeeded or not."""
+        pass
+
+    def retain_snapshot(self, tag: str, references: int, run_id: str) -> None:
+        """Record that `references` jobs of the river will fork from the snapshot."""
+        pass
+
+    def release_snapshot(self, tag: str) -> None:
+        """Record that one job no longer needs the snapshot.
+
+        Managers that keep snapshots around should delete it once the last
+        reference is released.
+        """
+        pass
+
+    def keep_snapshot(self, tag: str) -> None:
+        """Keep the snapshot after its references are released, for a job cache entry.
+
+        It is then left out of reference counting, remove_snapshot() deletes it.
+        """
+        pass
+
+    def has_snapshot(self, tag: str) -> bool:
+        """Whether the snapshot still exists and can be forked from.
+
+        Managers that keep no snapshots never have one.
+        """
+        return False
+
+    def remove_snapshot(self, tag: str) -> None:
+        """Delete the snapshot, it is fine if it is already gone."""
+        pass
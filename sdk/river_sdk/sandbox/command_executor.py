@@ -1,7 +1,16 @@
+import asyncio
+import os
+import shlex
+import subprocess
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Callable, Optional
 from invoke.runners import Result
-from fabric import Connection
+from paramiko.ssh_exception import SSHException
+from river_sdk.sandbox.output import CommandOutput, OutputBuffer
+from river_sdk.sandbox.ssh_pool import SSHConnectionPool, default_ssh_pool
+
+_CHUNK_SIZE = 64 * 1024
 
 
 class CommandExecutor(ABC):
@@ -14,25 +23,89 @@ class CommandExecutor(ABC):
 
     @abstractmethod
     def run(
-        self, command: str, cwd: Optional[str] = None, env: Optional[dict[str, str]] = None
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
     ) -> Result:
-        """Execute command and return result"""
+        """Execute command and return result
+
+        Args:
+            output: Stream stdout and stderr into it while the command runs,
+                the result then reads them from there. Without it the whole
+                output is captured in memory.
+        """
         pass
 
 
 class LocalCommandExecutor(CommandExecutor):
-    """Local command executor"""
+    """Local command executor, one bash subprocess per command.
+
+    cwd and env are handed to the subprocess, env on top of the current
+    environment, nothing is spliced into the command string.
+    """
+
+    shell = "/bin/bash"
 
     def run(
-        self, command: str, cwd: Optional[str] = None, env: Optional[dict[str, str]] = None
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        if output is not None:
+            return self._run_streaming(command, cwd, env, output)
+        try:
+            process = subprocess.run(
+                [self.shell, "-c", command],
+                cwd=cwd,
+                env={**os.environ, **env} if env else None,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+            )
+        except OSError as e:
+            # e.g. a missing cwd, report it like a failed command.
+            return Result(stderr=str(e), command=command, shell=self.shell, env=env or {}, exited=1)
+        return Result(
+            stdout=process.stdout.decode(errors="replace"),
+            stderr=process.stderr.decode(errors="replace"),
+            command=command,
+            shell=self.shell,
+            env=env or {},
+            exited=process.returncode,
+        )
+
+    def _run_streaming(
+        self, command: str, cwd: Optional[str], env: Optional[dict[str, str]], output: CommandOutput
     ) -> Result:
-        with Connection("localhost") as connection, connection.cd(cwd if cwd else '.'):
-            result = connection.local(command, env=env or {}, hide=True, warn=True)
-        return result if result else Result(exited=1, stderr=f"Local run returns None, command: {command}")
+        try:
+            process = subprocess.Popen(
+                [self.shell, "-c", command],
+                cwd=cwd,
+                env={**os.environ, **env} if env else None,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            output.stderr.write(str(e).encode())
+            return output.result(command, self.shell, env, 1)
+        with process:
+            _pump_both(process.stdout.read1, process.stderr.read1, output.stdout.write, output.stderr.write)
+        return output.result(command, self.shell, env, process.returncode)
 
 
 class RemoteCommandExecutor(CommandExecutor):
-    """Remote command executor"""
+    """Remote command executor, on pooled SSH connections.
+
+    Commands run on a channel of an already authenticated connection from
+    `pool` when there is one. When a pooled connection died in the
+    meantime, and its channel cannot be opened, the command is run on a new
+    connection instead. Once a command started it is never run again, even
+    when its connection drops, it may have had effects already.
+    """
 
     def __init__(
         self,
@@ -41,6 +114,7 @@ class RemoteCommandExecutor(CommandExecutor):
         key_filename: Optional[str] = None,
         password: Optional[str] = None,
         port: int = 22,
+        pool: Optional[SSHConnectionPool] = None,
     ):
         self.host = host
         self.user = user
@@ -50,9 +124,14 @@ class RemoteCommandExecutor(CommandExecutor):
             self.connect_kwargs["key_filename"] = key_filename
         if password:
             self.connect_kwargs["password"] = password
+        self.pool = pool or default_ssh_pool
 
     def run(
-        self, command: str, cwd: Optional[str] = None, env: Optional[dict[str, str]] = None
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
     ) -> Result:
         connection_params = {
             "host": self.host,
@@ -60,7 +139,133 @@ class RemoteCommandExecutor(CommandExecutor):
             "port": self.port,
             "connect_kwargs": self.connect_kwargs,
         }
+        # Pooled connections are shared between threads, so no connection.cd().
+        if cwd:
+            command = f"cd {shlex.quote(cwd)} && {command}"
+
+        for attempt in range(2):
+            with self.pool.connection(connection_params) as connection:
+                try:
+                    channel = connection.create_session()
+                except (EOFError, OSError, SSHException):
+                    transport = connection.transport
+                    if attempt or (transport is not None and transport.is_active()):
+                        raise
+                    self.pool.discard(connection)
+                    continue
+                return self._run_channel(channel, command, env, output)
+
+    def _run_channel(
+        self, channel, command: str, env: Optional[dict[str, str]], output: Optional[CommandOutput]
+    ) -> Result:
+        """Run the command on the open channel.
+
+        A connection dropping while the command runs ends its output, the
+        exit code is then -1.
+        """
+        # The channel is read directly, so opening it can be told apart from running the command.
+        remote_command = command
+        if env:
+            exports = " ".join(shlex.quote(f"{key}={value}") for key, value in env.items())
+            remote_command = f"export {exports} && {command}"
+        stdout, stderr = bytearray(), bytearray()
+        try:
+            channel.exec_command(remote_command)
+            channel.shutdown_write()
+            if output is not None:
+                _pump_both(channel.recv, channel.recv_stderr, output.stdout.write, output.stderr.write)
+            else:
+                _pump_both(channel.recv, channel.recv_stderr, stdout.extend, stderr.extend)
+            exited = channel.recv_exit_status()
+        finally:
+            channel.close()
+        if output is not None:
+            return output.result(command, "bash", env, exited)
+        return Result(
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            command=command,
+            shell="bash",
+            env=env or {},
+            exited=exited,
+        )
+
+
+def _pump(read: Callable[[int], bytes], write: Callable[[bytes], None]) -> None:
+    while chunk := read(_CHUNK_SIZE):
+        write(chunk)
+
+
+def _pump_both(
+    read_stdout: Callable[[int], bytes],
+    read_stderr: Callable[[int], bytes],
+    write_stdout: Callable[[bytes], None],
+    write_stderr: Callable[[bytes], None],
+) -> None:
+    """Copy both streams until they end, stderr on a helper thread."""
+    stderr_pump = threading.Thread(target=_pump, args=(read_stderr, write_stderr), daemon=True)
+    stderr_pump.start()
+    _pump(read_stdout, write_stdout)
+    stderr_pump.join()
+
+
+class AsyncCommandExecutor(ABC):
+    """Abstract asyncio command executor interface"""
+
+    @abstractmethod
+    async def run(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        """Execute command and return result, streaming into `output` if given"""
+        pass
+
+
+class AsyncLocalCommandExecutor(AsyncCommandExecutor):
+    """Local asyncio command executor, one subprocess per command and no thread."""
+
+    shell = "/bin/bash"
+
+    async def run(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        process = await asyncio.create_subprocess_exec(
+            self.shell, "-c", command,
+            cwd=cwd,
+            env={**os.environ, **env} if env else None,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            if output is not None:
+                await asyncio.gather(
+                    _apump(process.stdout, output.stdout), _apump(process.stderr, output.stderr), process.wait()
+                )
+                return output.result(command, self.shell, env, process.returncode)
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        return Result(
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            command=command,
+            shell=self.shell,
+            env=env or {},
+            exited=process.returncode,
+        )
+
 
-        with Connection(**connection_params) as connection, connection.cd(cwd if cwd else '.'):
-            result = connection.run(command, env=env or {}, hide=True, warn=True)
-        return result
+async def _apump(stream: asyncio.StreamReader, buffer: OutputBuffer) -> None:
+    while chunk := await stream.read(_CHUNK_SIZE):
+        buffer.write(chunk)
@@ -0,0 +1,392 @@
+import http.client
+import json
+import queue
+import socket
+import struct
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import quote, urlencode
+from invoke.runners import Result
+from river_sdk.sandbox.base_sandbox import BaseSandbox
+from river_sdk.sandbox.docker_pool import PoolConfig
+from river_sdk.sandbox.docker_sandbox import BaseDockerSandboxManager, SNAPSHOT_REPOSITORY, changes_command, mark_command
+from river_sdk.sandbox.output import CommandOutput
+from river_sdk.sandbox.snapshot_refs import RunRegistry
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+class DockerEngineError(RuntimeError):
+    """Raised when the Docker Engine API answers with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker Engine API error {status}: {message}")
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngineClient:
+    """A small Docker Engine API client over a unix socket.
+
+    Up to `max_idle` keep-alive connections are kept for reuse, so most calls
+    skip connecting. Exec output comes back on a connection the daemon closes,
+    that one is never reused.
+
+    Args:
+        socket_path: The daemon socket, or a socket forwarded from a remote
+            host (e.g. with `ssh -L`).
+        max_idle: How many idle connections to keep.
+        timeout: Socket timeout in seconds, None waits forever.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_DOCKER_SOCKET, max_idle: int = 8, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[UnixHTTPConnection] = queue.LifoQueue(maxsize=max_idle)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        query: Optional[dict[str, Any]] = None,
+        body: Any = None,
+        expected: tuple[int, ...] = (200, 201, 204),
+    ) -> Any:
+        """Send a request and return the decoded JSON response, None when empty.
+
+        Bodies are sent as JSON, except bytes, which are sent as a tar archive.
+        """
+        status, data = self._send(method, path, query, body, lambda response: response.read())
+        if status not in expected:
+            raise DockerEngineError(status, _error_message(data))
+        return json.loads(data) if data.strip() else None
+
+    def create_container(self, image: str, cmd: list[str]) -> str:
+        config = {"Image": image, "Cmd": cmd}
+        try:
+            created = self.request("POST", "/containers/create", body=config)
+        except DockerEngineError as e:
+            if e.status != 404:
+                raise
+            # Like `docker run`, pull the image when it is not there yet.
+            self.pull_image(image)
+            created = self.request("POST", "/containers/create", body=config)
+        return created["Id"]
+
+    def inspect_container(self, container_id: str) -> dict:
+        return self.request("GET", f"/containers/{container_id}/json")
+
+    def start_container(self, container_id: str) -> None:
+        self.request("POST", f"/containers/{container_id}/start", expected=(204, 304))
+
+    def remove_containers(self, container_ids: list[str]) -> None:
+        """Force remove the containers, the ones already gone are ignored."""
+        for container_id in container_ids:
+            self.request("DELETE", f"/containers/{container_id}", {"force": "true"}, expected=(204, 404))
+
+    def pull_image(self, image: str) -> None:
+        # The progress stream ends when the pull is done, errors are reported inside it.
+        status, data = self._send(
+            "POST", "/images/create", _pull_query(image), None, lambda response: response.read(),
+        )
+        if status != 200:
+            raise DockerEngineError(status, _error_message(data))
+        for line in data.splitlines():
+            if line.strip() and "error" in (progress := json.loads(line)):
+                raise DockerEngineError(status, progress["error"])
+
+    def commit(self, container_id: str, tag: str) -> str:
+        repo, _, tag = tag.rpartition(":")
+        return self.request("POST", "/commit", {"container": container_id, "repo": repo, "tag": tag})["Id"]
+
+    def list_images(self, reference: str) -> list[dict]:
+        return self.request("GET", "/images/json", {"filters": json.dumps({"reference": [reference]})})
+
+    def remove_images(self, tags: list[str]) -> None:
+        """Remove the images, the ones already gone are ignored.
+
+        Like `docker rmi`, images a container still uses are left alone (409).
+        """
+        for tag in tags:
+            self.request("DELETE", f"/images/{quote(tag, safe='')}", expected=(200, 404, 409))
+
+    def put_archive(self, container_id: str, path: str, archive: bytes) -> None:
+        """Unpack a tar archive into the container at `path`."""
+        self.request("PUT", f"/containers/{container_id}/archive", {"path": path}, archive, expected=(200,))
+
+    def exec(
+        self,
+        container_id: str,
+        cmd: list[str],
+        stdout: Callable[[bytes], None],
+        stderr: Callable[[bytes], None],
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+    ) -> int:
+        """Run the command in the container and return its exit code.
+
+        Output is handed to `stdout` and `stderr` frame by frame, as it arrives.
+        """
+        config: dict[str, Any] = {"Cmd": cmd, "AttachStdout": True, "AttachStderr": True}
+        if cwd:
+            config["WorkingDir"] = cwd
+        if env:
+            config["Env"] = [f"{key}={value}" for key, value in env.items()]
+        exec_id = self.request("POST", f"/containers/{container_id}/exec", body=config)["Id"]
+
+        status, error = self._send(
+            "POST", f"/exec/{exec_id}/start", None, {"Detach": False, "Tty": False},
+            lambda response: _demultiplex(response, stdout, stderr),
+        )
+        if status != 200:
+            raise DockerEngineError(status, _error_message(error))
+        # The stream can end a moment before the daemon records the exit code.
+        while (inspect := self.request("GET", f"/exec/{exec_id}/json"))["Running"]:
+            time.sleep(0.005)
+        return inspect["ExitCode"]
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _send(self, method, path, query, body, read):
+        """Send the request on a pooled connection and read the response with `read`.
+
+        Returns the status and whatever `read` returned. A reused connection
+        the daemon already closed is retried on another connection.
+        """
+        url = path + (f"?{urlencode(query)}" if query else "")
+        if isinstance(body, bytes):
+            payload, headers = body, {"Content-Type": "application/x-tar"}
+        elif body is not None:
+            payload, headers = json.dumps(body).encode(), {"Content-Type": "application/json"}
+        else:
+            payload, headers = None, {}
+        while True:
+            connection, reused = self._connection()
+            try:
+                connection.request(method, url, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = read(response)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            self._release(connection, response)
+            return response.status, data
+
+    def _connection(self) -> tuple[UnixHTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, self.timeout), False
+
+    def _release(self, connection: UnixHTTPConnection, response: http.client.HTTPResponse) -> None:
+        if response.will_close:
+            connection.close()
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+
+def _demultiplex(
+    response: http.client.HTTPResponse, stdout: Callable[[bytes], None], stderr: Callable[[bytes], None]
+) -> bytes:
+    """Split a multiplexed exec stream into stdout and stderr.
+
+    Every frame starts with an 8 byte header: the stream (1 stdout, 2 stderr),
+    three zero bytes and the big-endian payload size. Returns the body of an
+    error response, empty otherwise.
+    """
+    if response.status != 200:
+        return response.read()
+    streams = {1: stdout, 2: stderr}
+    while header := response.read(8):
+        if len(header) < 8:
+            raise DockerEngineError(response.status, "exec output ended in the middle of a frame header")
+        stream, size = struct.unpack(">BxxxL", header)
+        payload = response.read(size)
+        if len(payload) < size:
+            raise DockerEngineError(response.status, "exec output ended in the middle of a frame")
+        streams.get(stream, stdout)(payload)
+    return b""
+
+
+def _pull_query(image: str) -> dict[str, str]:
+    """The query pulling the image, `latest` when the reference names no tag.
+
+    Digests are passed whole, and a colon before the last slash belongs to a
+    registry port, e.g. localhost:5000/app.
+    """
+    if "@" in image:
+        return {"fromImage": image}
+    name, colon, tag = image.rpartition(":")
+    if not colon or "/" in tag:
+        return {"fromImage": image, "tag": "latest"}
+    return {"fromImage": name, "tag": tag}
+
+
+def _error_message(data: bytes) -> str:
+    try:
+        return json.loads(data)["message"]
+    except (ValueError, KeyError, TypeError):
+        return data.decode(errors="replace")
+
+
+class DockerApiSandbox(BaseSandbox):
+    """A docker container driven through the Docker Engine API."""
+
+    shell = "bash"
+    streams_output = True
+    records_changes = True
+
+    def __init__(self, id: str, client: DockerEngineClient):
+        super().__init__(id)
+        self._client = client
+        self.snapshot: Optional[str] = None
+
+    def execute(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        cmd = [self.shell, "-c", command]
+        if output is not None:
+            exited = self._client.exec(self.id, cmd, output.stdout.write, output.stderr.write, cwd, env)
+            return output.result(command, self.shell, env, exited)
+        stdout, stderr = bytearray(), bytearray()
+        exited = self._client.exec(self.id, cmd, stdout.extend, stderr.extend, cwd, env)
+        return Result(
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            command=command,
+            shell=self.shell,
+            env=env or {},
+            exited=exited,
+        )
+
+    def close_sessions(self) -> None:
+        """Nothing to close, every exec is a request of its own."""
+        pass
+
+    def mark(self) -> str:
+        marker = uuid.uuid4().hex
+        result = self.execute(mark_command(marker))
+        if not result.ok:
+            raise RuntimeError(f"Marking docker sandbox {self.id} failed, {result.stderr}")
+        return marker
+
+    def changes(self, marker: str, archive: Path) -> None:
+        stderr = bytearray()
+        with open(archive, "wb") as file:
+            exited = self._client.exec(self.id, changes_command(marker), file.write, stderr.extend)
+        if exited > 1:
+            raise RuntimeError(f"Recording the changes in docker sandbox {self.id} failed, {stderr.decode()}")
+
+    def apply_changes(self, archive: Path) -> None:
+        self._client.put_archive(self.id, "/", archive.read_bytes())
+
+
+class DockerApiSandboxManager(BaseDockerSandboxManager):
+    """A docker sandbox manager talking to the Docker Engine API instead of the docker CLI.
+
+    Container lifecycle, exec, commit and image removal are HTTP requests on
+    keep-alive connections, no process is spawned per operation. Pooling,
+    snapshot reference counting and garbage collection work as for the CLI
+    manager.
+
+    Args:
+        socket_path: The daemon socket, or a socket forwarded from a remote host.
+        pool: Keep warm containers per image for create(), see PoolConfig.
+        registry: Where running rivers record their snapshots.
+        max_idle_connections: Keep-alive connections kept by the client.
+        background_teardown: Remove destroyed containers on a background
+            reaper, see BaseDockerSandboxManager.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_DOCKER_SOCKET,
+        pool: Optional[PoolConfig] = None,
+        registry: Optional[RunRegistry] = None,
+        max_idle_connections: int = 8,
+        background_teardown: bool = True,
+    ):
+        self._client = DockerEngineClient(socket_path, max_idle=max_idle_connections)
+        # Runs are recorded per daemon, the socket identifies it.
+        super().__init__(
+            host=f"unix://{socket_path}",
+            pool=pool,
+            registry=registry,
+            background_teardown=background_teardown,
+        )
+
+    def close(self) -> None:
+        super().close()
+        self._client.close()
+
+    def _run_container(self, image: str) -> str:
+        container_id = self._client.create_container(image, ["tail", "-f", "/dev/null"])
+        try:
+            self._client.start_container(container_id)
+        except DockerEngineError:
+            self._client.remove_containers([container_id])
+            raise
+        return container_id
+
+    def _image_id(self, container_id: str) -> Optional[str]:
+        return self._client.inspect_container(container_id)["Image"]
+
+    def _remove_containers(self, container_ids: list[str]) -> None:
+        self._client.remove_containers(container_ids)
+
+    def _commit(self, container_id: str, tag: str) -> None:
+        self._client.commit(container_id, tag)
+
+    def _remove_images(self, tags: list[str]) -> None:
+        self._client.remove_images(tags)
+
+    def _sandbox(self, container_id: str) -> DockerApiSandbox:
+        return DockerApiSandbox(container_id, self._client)
+
+    def _destroy_now(self, sandbox: DockerApiSandbox) -> None:
+        # A single forced removal stops the container as well.
+        self._client.remove_containers([sandbox.id])
+
+    def _image_exists(self, tag: str) -> bool:
+        return any(snapshot == tag for snapshot, _, _ in self._list_snapshots())
+
+    def _list_snapshots(self) -> list[tuple[str, datetime, int]]:
+        return [
+            (tag, datetime.fromtimestamp(image["Created"], timezone.utc), int(image["Size"]))
+            for image in self._client.list_images(SNAPSHOT_REPOSITORY)
+            for tag in image.get("RepoTags") or []
+            if tag.startswith(f"{SNAPSHOT_REPOSITORY}:")
+        ]
@@ -0,0 +1,182 @@
+import atexit
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class PoolConfig:
+    """How many warm containers to keep per image.
+
+    Args:
+        min_size: Idle containers to keep ready for an image once it has been
+            requested (or prewarmed).
+        max_size: Upper bound of idle plus starting containers per image.
+        idle_ttl: Seconds an idle container may wait before it is removed.
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 4, idle_ttl: float = 300.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        if idle_ttl <= 0:
+            raise ValueError(f"idle_ttl must be positive, got {idle_ttl}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+
+
+class PoolStats:
+    """Counters of a container pool, updated under the pool lock."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.started = 0
+        self.evicted = 0
+        self.errors = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "started": self.started,
+            "evicted": self.evicted,
+            "errors": self.errors,
+            "avg_hit_latency": self.hit_seconds / self.hits if self.hits else 0.0,
+            "avg_miss_latency": self.miss_seconds / self.misses if self.misses else 0.0,
+        }
+
+
+class ContainerPool:
+    """Pre-started containers per image, refilled in the background.
+
+    The pool only knows how to start a container of an image and how to remove
+    containers, both given by the sandbox manager that owns it.
+    """
+
+    def __init__(
+        self,
+        config: PoolConfig,
+        start: Callable[[str], str],
+        remove: Callable[[list[str]], None],
+    ):
+        self.config = config
+        self._start = start
+        self._remove = remove
+        self._idle: dict[str, deque[tuple[str, float]]] = {}
+        self._starting: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = PoolStats()
+        self._refiller = ThreadPoolExecutor(max_workers=config.max_size, thread_name_prefix="river-pool")
+        self._stop_janitor = threading.Event()
+        self._janitor = threading.Thread(target=self._evict_periodically, name="river-pool-janitor", daemon=True)
+        self._janitor.start()
+        atexit.register(self.close)
+
+    def take(self, image: str) -> str:
+        """Return the id of a running container of the image, warm if possible."""
+        started_at = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(image)
+            container_id = idle.pop()[0] if idle else None
+            self._refill_locked(image)
+
+        hit = container_id is not None
+        if not hit:
+            container_id = self._start(image)
+
+        elapsed = time.monotonic() - started_at
+        with self._lock:
+            if hit:
+                self._stats.hits += 1
+                self._stats.hit_seconds += elapsed
+            else:
+                self._stats.misses += 1
+                self._stats.miss_seconds += elapsed
+        return container_id
+
+    def prewarm(self, image: str) -> None:
+        """Start filling the pool of the image without taking a container."""
+        with self._lock:
+            self._refill_locked(image)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = self._stats.as_dict()
+            stats["idle"] = sum(len(idle) for idle in self._idle.values())
+            stats["starting"] = sum(self._starting.values())
+        return stats
+
+    def evict_expired(self) -> None:
+        """Remove idle containers that waited longer than the idle TTL."""
+        deadline = time.monotonic() - self.config.idle_ttl
+        expired = []
+        with self._lock:
+            for idle in self._idle.values():
+                while idle and idle[0][1] < deadline:
+                    expired.append(idle.popleft()[0])
+            self._stats.evicted += len(expired)
+        if expired:
+            self._remove_quietly(expired)
+
+    def close(self) -> None:
+        """Stop refilling and remove every idle container."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop_janitor.set()
+        self._refiller.shutdown(wait=True)
+        with self._lock:
+            leftovers = [container_id for idle in self._idle.values() for container_id, _ in idle]
+            self._idle.clear()
+        if leftovers:
+            self._remove_quietly(leftovers)
+        atexit.unregister(self.close)
+
+    def _refill_locked(self, image: str) -> None:
+        if self._closed:
+            return
+        idle = len(self._idle.get(image, ()))
+        starting = self._starting.get(image, 0)
+        missing = min(self.config.min_size - idle - starting, self.config.max_size - idle - starting)
+        for _ in range(max(0, missing)):
+            self._starting[image] = self._starting.get(image, 0) + 1
+            self._refiller.submit(self._start_idle, image)
+
+    def _start_idle(self, image: str) -> None:
+        container_id = None
+        try:
+            container_id = self._start(image)
+        except Exception:
+            with self._lock:
+                self._stats.errors += 1
+        finally:
+            with self._lock:
+                self._starting[image] -= 1
+                if container_id is not None:
+                    self._stats.started += 1
+                    if not self._closed:
+                        self._idle.setdefault(image, deque()).append((container_id, time.monotonic()))
+                        container_id = None
+        if container_id is not None:
+            # The pool was closed while the container was starting.
+            self._remove_quietly([container_id])
+
+    def _remove_quietly(self, container_ids: list[str]) -> None:
+        try:
+            self._remove(container_ids)
+        except Exception:
+            with self._lock:
+                self._stats.errors += 1
+
+    def _evict_periodically(self) -> None:
+        interval = self.config.idle_ttl / 2
+        while not self._stop_janitor.wait(interval):
+            self.evict_expired()
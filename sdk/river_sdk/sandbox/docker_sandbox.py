@@ -1,21 +1,86 @@
+import json
+import re
 import uuid
 import shlex
+import subprocess
+import threading
+from abc import abstractmethod
+from datetime import datetime, timezone
 
 from fabric import Connection
 from functools import partial
+from pathlib import Path
 from typing import Callable, Optional, TYPE_CHECKING
-from river_sdk.sandbox.command_executor import CommandExecutor, LocalCommandExecutor, RemoteCommandExecutor
+from river_sdk.sandbox.command_executor import (
+    AsyncCommandExecutor,
+    AsyncLocalCommandExecutor,
+    CommandExecutor,
+    LocalCommandExecutor,
+    RemoteCommandExecutor,
+)
 from invoke.runners import Result
-from river_sdk.sandbox.base_sandbox import BaseSandbox, BaseSandboxManager
+from river_sdk.sandbox.base_sandbox import BaseSandbox, BaseSandboxManager, SandboxCreator
+from river_sdk.sandbox.docker_pool import ContainerPool, PoolConfig
+from river_sdk.sandbox.docker_session import ShellSession, ShellSessionError, ShellSessionUnavailable
+from river_sdk.sandbox.output import CommandOutput
+from river_sdk.sandbox.reaper import TeardownReaper
+from river_sdk.sandbox.snapshot_refs import RunRegistry, SnapshotReferences
+
+SNAPSHOT_REPOSITORY = "river-sandbox"
+
+# Where mark() leaves the files whose ctime changes() compares against.
+MARKS_DIR = "/tmp/.river-marks"
+
+
+def mark_command(marker: str) -> str:
+    return f"mkdir -p {MARKS_DIR} && touch {MARKS_DIR}/{marker}"
+
+
+def changes_command(marker: str) -> list[str]:
+    """A command writing the files changed since the marker as a tar to stdout.
+
+    ctime is compared since tar and cp may keep old modification times. tar
+    exits with 1 when files change while it reads them, that still is an archive.
+    """
+    script = (
+        f"find / -xdev \\( -path /proc -o -path /sys -o -path /dev -o -path {MARKS_DIR} \\) -prune"
+        f" -o ! -type d -cnewer {MARKS_DIR}/{marker} -print0"
+        f" | tar -cf - --null --no-recursion -T - 2>/dev/null; status=$?; rm -f {MARKS_DIR}/{marker}; exit $status"
+    )
+    return ["sh", "-c", script]
 
 if TYPE_CHECKING:
     from river_sdk.job import Job
+    from river_sdk.journal import RunJournal
 
 
 class DockerSandbox(BaseSandbox):
-    def __init__(self, id: str, executor: CommandExecutor):
+    streams_output = True
+
+    def __init__(
+        self,
+        id: str,
+        executor: CommandExecutor,
+        async_executor: Optional[AsyncCommandExecutor] = None,
+        persistent_shell: bool = False,
+    ):
+        """
+        Args:
+            id: The container id.
+            executor: Runs the docker CLI.
+            async_executor: Runs the docker CLI for aexecute(), on a worker
+                thread through `executor` when not given.
+            persistent_shell: Run commands through long-lived `docker exec -i`
+                shell sessions instead of one `docker exec` per command. The
+                docker CLI must be local. Output then arrives once a command
+                exited, a task's `on_line` is not called while it runs.
+        """
         super().__init__(id)
         self._executor: CommandExecutor = executor
+        self._async_executor: Optional[AsyncCommandExecutor] = async_executor
+        self._persistent_shell = persistent_shell
+        self._idle_sessions: list[ShellSession] = []
+        self._sessions_lock = threading.Lock()
         self._connection: Optional[Connection] = None
         self._snapshot: Optional[str] = None
 
@@ -23,8 +88,100 @@ class DockerSandbox(BaseSandbox):
         self,
         command: str,
         cwd: Optional[str] = None,
-        env: Optional[dict[str, str]] = None
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        if self._persistent_shell:
+            return self._execute_in_session(command, cwd, env, output)
+        return self._run(self._exec_command(command, cwd, env), output)
+
+    def _run(self, docker_command: str, output: Optional[CommandOutput]) -> Result:
+        # Only pass output along when streaming, custom executors may predate it.
+        if output is None:
+            return self._executor.run(docker_command)
+        return self._executor.run(docker_command, output=output)
+
+    def close_sessions(self) -> None:
+        """Close the idle shell sessions, before the container goes away."""
+        with self._sessions_lock:
+            sessions, self._idle_sessions = self._idle_sessions, []
+        for session in sessions:
+            session.close()
+
+    @property
+    def records_changes(self) -> bool:
+        # Archives are streamed through a local docker CLI.
+        return isinstance(self._executor, LocalCommandExecutor)
+
+    def mark(self) -> str:
+        marker = uuid.uuid4().hex
+        result = self.execute(mark_command(marker))
+        if not result.ok:
+            raise RuntimeError(f"Marking docker sandbox {self.id} failed, {result.stderr}")
+        return marker
+
+    def changes(self, marker: str, archive: Path) -> None:
+        with open(archive, "wb") as file:
+            process = subprocess.run(
+                ["docker", "exec", self.id, *changes_command(marker)], stdout=file, stderr=subprocess.PIPE
+            )
+        if process.returncode > 1:
+            raise RuntimeError(f"Recording the changes in docker sandbox {self.id} failed, {process.stderr.decode()}")
+
+    def apply_changes(self, archive: Path) -> None:
+        with open(archive, "rb") as file:
+            process = subprocess.run(
+                ["docker", "exec", "-i", self.id, "tar", "-xf", "-", "-C", "/"], stdin=file, stderr=subprocess.PIPE
+            )
+        if process.returncode != 0:
+            raise RuntimeError(f"Applying changes to docker sandbox {self.id} failed, {process.stderr.decode()}")
+
+    def _execute_in_session(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
     ) -> Result:
+        # Concurrent tasks each get a session of their own, sessions are reused afterwards.
+        with self._sessions_lock:
+            session = self._idle_sessions.pop() if self._idle_sessions else None
+        try:
+            if session is None:
+                session = ShellSession(self.id)
+            result = session.run(command, cwd, env, output)
+        except ShellSessionUnavailable:
+            # The command never started, run it the plain way instead.
+            if session is not None:
+                session.close()
+            return self._run(self._exec_command(command, cwd, env), output)
+        except ShellSessionError:
+            # The command may have run, and written output, running it again could repeat its effects.
+            session.close()
+            raise
+        with self._sessions_lock:
+            self._idle_sessions.append(session)
+        return result
+
+    async def aexecute(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        if self._async_executor is None or self._persistent_shell:
+            return await super().aexecute(command, cwd, env, output=output)
+        if output is None:
+            return await self._async_executor.run(self._exec_command(command, cwd, env))
+        return await self._async_executor.run(self._exec_command(command, cwd, env), output=output)
+
+    def _exec_command(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None
+    ) -> str:
         """Generate docker exec command"""
         docker_cmd = f"docker exec"
         
@@ -44,7 +201,7 @@ class DockerSandbox(BaseSandbox):
         safe_command = shlex.quote(command)
         docker_cmd += f" {safe_container_id} bash -c {safe_command}"
         
-        return self._executor.run(docker_cmd)
+        return docker_cmd
     
     @property
     def snapshot(self) -> Optional[str]:
@@ -55,20 +212,51 @@ class DockerSandbox(BaseSandbox):
         self._snapshot = tag
     
 
-class DockerSandboxManager(BaseSandboxManager):
-    def __init__(self, host: str = "localhost"):
+class BaseDockerSandboxManager(BaseSandboxManager):
+    """What the docker sandbox managers share, whichever way they talk to the daemon.
+
+    Warm pools, hand overs, background teardown, snapshot reference counting
+    and garbage collection are built on a few primitives, such as
+    _run_container() and _commit(), that subclasses implement.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        pool: Optional[PoolConfig] = None,
+        registry: Optional[RunRegistry] = None,
+        background_teardown: bool = True,
+    ):
+        """
+        Args:
+            host: Identifies the docker daemon in the run registry.
+            pool: Keep warm containers per image for create(), see PoolConfig.
+            registry: Where running rivers record their snapshots for
+                collect_garbage(), defaults to the river home directory.
+            background_teardown: Remove destroyed containers in batches on a
+                background reaper instead of before destory() returns. Call
+                drain() to wait for them.
+        """
         super().__init__()
         self._host: str = host
-        self._executor: CommandExecutor = self._create_executor(host)
-    
-    def _create_executor(self,host: str) -> CommandExecutor:
-        return LocalCommandExecutor() if host == "localhost" else RemoteCommandExecutor(host)
-    
+        self._registry = registry or RunRegistry()
+        self._snapshot_references = SnapshotReferences()
+        self._snapshot_owners: dict[str, str] = {}
+        # Handed over containers not yet forked, by container id, with their run id.
+        self._handovers: dict[str, tuple[DockerSandbox, str]] = {}
+        self._handovers_lock = threading.Lock()
+        self._pool: Optional[ContainerPool] = None
+        if pool is not None:
+            self._pool = ContainerPool(pool, start=self._run_container, remove=self._remove_containers)
+        self._reaper: Optional[TeardownReaper] = None
+        if background_teardown:
+            self._reaper = TeardownReaper(self._remove_containers, self._remove_snapshots)
+
     def creator(self, image: str) -> Callable[[], BaseSandbox]:
-        return partial(self.create, image)
+        return SandboxCreator(partial(self.create, image))
 
     def create(self, image: str) -> DockerSandbox:
-        """Start a Docker container.
+        """Start a Docker container, or take a warm one from the pool.
         
         Args:
             image: docker image.
@@ -76,36 +264,344 @@ class DockerSandboxManager(BaseSandboxManager):
         Returns:
             DockerSandBox: The representation of the started container.
         """
-        result = self._executor.run(f"docker run -d {image} tail -f /dev/null")
-        container_id = result.stdout.strip()
-        return DockerSandbox(
-            id=container_id,
-            # Create new executor instance to isolate manager and sandbox
-            executor=self._create_executor(self._host)
-        )
-    
+        container_id = self._pool.take(image) if self._pool else self._run_container(image)
+        sandbox = self._sandbox(container_id)
+        # Tags move to new builds, cached results are only valid for the image the container runs.
+        # Inspected only once a task cache asks, most creates never need it.
+        sandbox.defer_lineage(partial(self._image_lineage, container_id))
+        return sandbox
+
+    def prewarm(self, image: str) -> None:
+        """Start warm containers of the image in the background, if pooling is enabled."""
+        if self._pool:
+            self._pool.prewarm(image)
+
+    def pool_stats(self) -> Optional[dict]:
+        """Hit/miss and latency counters of the warm pool, None without a pool."""
+        return self._pool.stats() if self._pool else None
+
+    def close(self) -> None:
+        """Remove the warm containers that were never handed out, finish teardowns and release their exit hooks."""
+        if self._pool:
+            self._pool.close()
+        if self._reaper:
+            self._reaper.close()
+
+    def drain(self) -> None:
+        if self._reaper:
+            self._reaper.drain()
+
     def fork(self, job: 'Job') -> DockerSandbox:
+        """Start a container from the job's snapshot, or take over its handed over container."""
         sandbox = job.sandbox
+        if sandbox is None and job.snapshot is not None:
+            # The job was restored from the job cache, only its snapshot is left.
+            forked = self._sandbox(self._run_container(job.snapshot))
+            forked.lineage = f"snapshot:{job.snapshot}"
+            return forked
         if sandbox is None:
             msg = f"There is not sandbox for job {job.name}"
             raise(RuntimeError(msg))
+        with self._handovers_lock:
+            if self._handovers.pop(sandbox.id, None) is not None:
+                return sandbox
         snapshot = sandbox.snapshot
         if sandbox.snapshot is None:
-            msg = f"There is not snapshot for sandbox {sandbox.id}."
+            msg = (
+                f"There is not snapshot for sandbox {sandbox.id} of job {job.name}, only the sandboxes"
+                " of upstreams are snapshotted, fork those or use sandbox_forker(job)."
+            )
             raise RuntimeError(msg)
-        return self.create(snapshot)
+        # Snapshots are forked once per consumer, pooling them would only waste containers.
+        forked = self._sandbox(self._run_container(snapshot))
+        forked.inherit_lineage(sandbox)
+        return forked
 
     def destory(self, sandbox: DockerSandbox) -> None:
-        """Stop and remove the Docker container."""
-        self._executor.run(f"docker stop -t 0 {sandbox.id}")
-        self._executor.run(f"docker rm {sandbox.id}")
+        """Stop and remove the Docker container, in the background if enabled."""
+        sandbox.close_sessions()
+        if self._reaper:
+            self._reaper.submit(sandbox.id)
+        else:
+            self._destroy_now(sandbox)
 
     def take_snapshot(self, sandbox: DockerSandbox) -> str:
         """Commit the Docker container and return image tag."""
-        tag = f"river-sandbox:{str(uuid.uuid4()).replace('-', '')}"
-        result = self._executor.run(f"docker commit {sandbox.id} {tag}")
+        tag = f"{SNAPSHOT_REPOSITORY}:{str(uuid.uuid4()).replace('-', '')}"
+        self._commit(sandbox.id, tag)
+        sandbox.snapshot = tag
+        return tag
+
+    def hand_over(self, sandbox: DockerSandbox, run_id: str) -> bool:
+        """Keep the container running for its single consumer, skipping commit, run and teardown."""
+        with self._handovers_lock:
+            self._handovers[sandbox.id] = (sandbox, run_id)
+        return True
+
+    def reclaim(self, sandbox: DockerSandbox) -> None:
+        with self._handovers_lock:
+            handover = self._handovers.pop(sandbox.id, None)
+        if handover is not None:
+            self.destory(sandbox)
+
+    def begin_river(self, run_id: str) -> None:
+        self._registry.begin(run_id, self._host)
+
+    def end_river(self, run_id: str) -> None:
+        with self._handovers_lock:
+            leftovers = [
+                self._handovers.pop(container_id)[0]
+                for container_id, (_, owner) in list(self._handovers.items())
+                if owner == run_id
+            ]
+        for sandbox in leftovers:
+            self.destory(sandbox)
+        self._registry.end(run_id)
+
+    def retain_snapshot(self, tag: str, references: int, run_id: str) -> None:
+        self._snapshot_references.retain(tag, references)
+        self._snapshot_owners[tag] = run_id
+        self._registry.add_snapshot(run_id, tag)
+
+    def release_snapshot(self, tag: str) -> None:
+        if self._snapshot_references.release(tag):
+            self.remove_snapshot(tag)
+
+    def remove_snapshot(self, tag: str) -> None:
+        """Remove the snapshot image, it is fine if it is already gone.
+
+        With background teardown it is removed on the reaper, once the
+        containers destroyed before, such as its last fork, are gone.
+        """
+        if self._reaper:
+            self._reaper.submit_image(tag)
+        else:
+            self._remove_snapshots([tag])
+
+    def _remove_snapshots(self, tags: list[str]) -> None:
+        self._remove_images(tags)
+        for tag in tags:
+            owner = self._snapshot_owners.pop(tag, None)
+            if owner is not None:
+                self._registry.remove_snapshot(owner, tag)
+
+    def keep_snapshot(self, tag: str) -> None:
+        """Take the snapshot out of reference counting and of its river's record.
+
+        Kept snapshots outlive the river, only the job cache removes them, or
+        collect_garbage() by age or size.
+        """
+        self._snapshot_references.forget(tag)
+        owner = self._snapshot_owners.pop(tag, None)
+        if owner is not None:
+            self._registry.remove_snapshot(owner, tag)
+
+    def has_snapshot(self, tag: str) -> bool:
+        return self._image_exists(tag)
+
+    def collect_garbage(
+        self,
+        max_age: Optional[float] = None,
+        max_size: Optional[int] = None,
+        dry_run: bool = False,
+        journal: Optional['RunJournal'] = None,
+    ) -> dict:
+        """Remove snapshot images that no running river can fork from anymore.
+
+        Snapshots recorded by crashed rivers are always removed, and so are
+        the ones the journal kept only for runs that will not be resumed,
+        see RunJournal.abandoned_snapshots(). Other snapshots not held by a
+        running river are removed when they are older than `max_age`
+        seconds, and then oldest first while their total size exceeds
+        `max_size` bytes.
+
+        Returns:
+            A report with the removed tags, the bytes they used, and how many
+            snapshots were kept.
+        """
+        runs = self._registry.runs(self._host)
+        live = {tag for run in runs.values() if run["alive"] for tag in run["snapshots"]}
+        crashed = {tag for run in runs.values() if not run["alive"] for tag in run["snapshots"]}
+        if journal is not None:
+            crashed |= journal.abandoned_snapshots()
+        now = datetime.now(timezone.utc)
+
+        removed, kept = [], []
+        for tag, created, size in sorted(self._list_snapshots(), key=lambda image: image[1]):
+            if tag in live:
+                continue
+            too_old = max_age is not None and (now - created).total_seconds() > max_age
+            (removed if tag in crashed or too_old else kept).append((tag, size))
+
+        if max_size is not None:
+            total = sum(size for _, size in kept)
+            while kept and total > max_size:
+                tag, size = kept.pop(0)
+                removed.append((tag, size))
+                total -= size
+
+        if not dry_run:
+            if removed:
+                self._remove_images([tag for tag, _ in removed])
+                if journal is not None:
+                    journal.release_snapshots(tag for tag, _ in removed)
+            for run_id, run in runs.items():
+                if not run["alive"]:
+                    self._registry.end(run_id)
+
+        return {
+            "removed": [tag for tag, _ in removed],
+            "freed_bytes": sum(size for _, size in removed),
+            "kept": len(kept) + len(live),
+        }
+
+    @abstractmethod
+    def _run_container(self, image: str) -> str:
+        """Start a container from the image and return its id."""
+        pass
+
+    def _image_lineage(self, container_id: str) -> Optional[str]:
+        image_id = self._image_id(container_id)
+        return None if image_id is None else f"image:{image_id}"
+
+    @abstractmethod
+    def _image_id(self, container_id: str) -> Optional[str]:
+        """ID of the image the container was started from, None when docker cannot tell."""
+        pass
+
+    @abstractmethod
+    def _remove_containers(self, container_ids: list[str]) -> None:
+        """Force remove the containers."""
+        pass
+
+    @abstractmethod
+    def _commit(self, container_id: str, tag: str) -> None:
+        """Commit the container to an image with the tag."""
+        pass
+
+    @abstractmethod
+    def _remove_images(self, tags: list[str]) -> None:
+        """Remove the images, the ones already gone or still used by a container are left alone."""
+        pass
+
+    @abstractmethod
+    def _sandbox(self, container_id: str) -> BaseSandbox:
+        """The sandbox running commands in the container."""
+        pass
+
+    @abstractmethod
+    def _destroy_now(self, sandbox: BaseSandbox) -> None:
+        """Stop and remove the sandbox's container before returning."""
+        pass
+
+    @abstractmethod
+    def _image_exists(self, tag: str) -> bool:
+        """Whether an image with the tag exists."""
+        pass
+
+    @abstractmethod
+    def _list_snapshots(self) -> list[tuple[str, datetime, int]]:
+        """Tag, creation time and size of every snapshot image on the host."""
+        pass
+
+
+class DockerSandboxManager(BaseDockerSandboxManager):
+    """Docker sandboxes driven through the docker CLI, locally or over ssh."""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        pool: Optional[PoolConfig] = None,
+        persistent_shell: bool = False,
+        registry: Optional[RunRegistry] = None,
+        background_teardown: bool = True,
+    ):
+        """
+        Args:
+            host: Where the docker daemon runs, "localhost" or an ssh host.
+            pool: Keep warm containers per image for create(), see PoolConfig.
+            persistent_shell: Run sandbox commands through persistent shell
+                sessions, see DockerSandbox. Only supported on localhost.
+            registry: Where running rivers record their snapshots for
+                collect_garbage(), defaults to the river home directory.
+            background_teardown: Remove destroyed containers in batches on a
+                background reaper instead of before destory() returns. Call
+                drain() to wait for them.
+        """
+        if persistent_shell and host != "localhost":
+            raise ValueError(f"Persistent shell sessions need a local docker CLI, got host {host}")
+        self._persistent_shell = persistent_shell
+        self._executor: CommandExecutor = self._create_executor(host)
+        super().__init__(host, pool, registry, background_teardown)
+
+    def _create_executor(self,host: str) -> CommandExecutor:
+        return LocalCommandExecutor() if host == "localhost" else RemoteCommandExecutor(host)
+
+    def _create_async_executor(self, host: str) -> Optional[AsyncCommandExecutor]:
+        # Remote hosts have no asyncio executor yet, their sandboxes fall back to threads.
+        return AsyncLocalCommandExecutor() if host == "localhost" else None
+    
+    def _run_container(self, image: str) -> str:
+        result = self._executor.run(f"docker run -d {image} tail -f /dev/null")
+        if not result.ok:
+            msg = f"Starting docker container from {image} failed, {result.stderr}"
+            raise RuntimeError(msg)
+        return result.stdout.strip()
+
+    def _image_id(self, container_id: str) -> Optional[str]:
+        """ID of the image the container was started from, None when docker cannot tell."""
+        result = self._executor.run(f"docker inspect --format '{{{{.Image}}}}' {container_id}")
+        if not result.ok:
+            return None
+        return result.stdout.strip() or None
+
+    def _remove_containers(self, container_ids: list[str]) -> None:
+        self._executor.run(f"docker rm -f {' '.join(container_ids)}")
+
+    def _commit(self, container_id: str, tag: str) -> None:
+        result = self._executor.run(f"docker commit {container_id} {tag}")
         if not result.ok:
             msg = f"Task snapshot for docker sandbox failed, {result.stderr}"
             raise RuntimeError(msg)
-        sandbox.snapshot = tag
-        return tag
+
+    def _remove_images(self, tags: list[str]) -> None:
+        self._executor.run(f"docker rmi {' '.join(tags)}")
+
+    def _sandbox(self, container_id: str) -> DockerSandbox:
+        return DockerSandbox(
+            id=container_id,
+            # Create new executor instance to isolate manager and sandbox
+            executor=self._create_executor(self._host),
+            async_executor=self._create_async_executor(self._host),
+            persistent_shell=self._persistent_shell,
+        )
+    
+    def _destroy_now(self, sandbox: DockerSandbox) -> None:
+        self._executor.run(f"docker stop -t 0 {sandbox.id}")
+        self._executor.run(f"docker rm {sandbox.id}")
+
+    def _image_exists(self, tag: str) -> bool:
+        return self._executor.run(f"docker image inspect --format '{{{{.Id}}}}' {tag}").ok
+
+    def _list_snapshots(self) -> list[tuple[str, datetime, int]]:
+        """Tag, creation time and size of every snapshot image on the host."""
+        result = self._executor.run(
+            f"docker image ls --filter reference={SNAPSHOT_REPOSITORY} --format '{{{{.Repository}}}}:{{{{.Tag}}}}'"
+        )
+        tags = [line.strip() for line in result.stdout.splitlines() if line.strip()] if result.ok else []
+        if not tags:
+            return []
+        result = self._executor.run(f"docker image inspect {' '.join(tags)}")
+        if not result.ok:
+            msg = f"Inspecting snapshot images failed, {result.stderr}"
+            raise RuntimeError(msg)
+        return [
+            (tag, _parse_docker_time(image["Created"]), int(image["Size"]))
+            for tag, image in zip(tags, json.loads(result.stdout))
+        ]
+
+
+def _parse_docker_time(value: str) -> datetime:
+    """Parse docker's RFC 3339 timestamps, which carry nanoseconds."""
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00")
+    return datetime.fromisoformat(value)
@@ -0,0 +1,144 @@
+import shlex
+import subprocess
+import threading
+import uuid
+from typing import Optional
+from invoke.runners import Result
+from river_sdk.sandbox.output import CommandOutput, OutputBuffer
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class ShellSessionError(Exception):
+    """Raised when a shell session died or broke the framing protocol."""
+    pass
+
+
+class ShellSessionUnavailable(ShellSessionError):
+    """Raised when a command could not be handed to the session, so it never started."""
+    pass
+
+
+class ShellSession:
+    """A long-lived bash inside a container, fed one command at a time over stdin.
+
+    Every command runs in its own subshell with its own cwd and environment,
+    its stdout and stderr go to two scratch files in the container. When it
+    exits the files are opened and removed, so they never reach snapshots or
+    recorded changes, and the session writes one frame to its stdout:
+
+        <token> <exit code> <stdout bytes> <stderr bytes>\\n<stdout><stderr>
+
+    so the caller knows exactly how much to read. Nothing else is ever written
+    to the session's stdout, and user commands read from /dev/null, so they
+    cannot swallow the commands that follow.
+
+    Output is only sent once the command exited, so it cannot be followed
+    line by line while the command runs.
+    """
+
+    shell = "bash"
+
+    def __init__(self, container_id: str):
+        self.container_id = container_id
+        self._token = f"__river_frame_{uuid.uuid4().hex}"
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            ["docker", "exec", "-i", container_id, self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def run(
+        self,
+        command: str,
+        cwd: Optional[str] = None,
+        env: Optional[dict[str, str]] = None,
+        output: Optional[CommandOutput] = None,
+    ) -> Result:
+        """Run the command in the session and return its result.
+
+        With `output`, stdout and stderr are copied into it in chunks once the
+        command finished, rather than read into memory whole.
+        """
+        exports = "".join(f"export {shlex.quote(f'{key}={value}')} && " for key, value in (env or {}).items())
+        script = (
+            "__river_out=$(mktemp) && __river_err=$(mktemp) || exit 1\n"
+            f"( cd -- {shlex.quote(cwd if cwd is not None else '/')} && {exports}"
+            f"exec {self.shell} -c {shlex.quote(command)} ) "
+            '</dev/null >"$__river_out" 2>"$__river_err"\n'
+            "__river_rc=$?\n"
+            '__river_sizes="$(wc -c <"$__river_out") $(wc -c <"$__river_err")"\n'
+            'exec 3<"$__river_out" 4<"$__river_err"\n'
+            'rm -f "$__river_out" "$__river_err"\n'
+            f"printf '%s %d %d %d\\n' {self._token} \"$__river_rc\" $__river_sizes\n"
+            "cat <&3; cat <&4; exec 3<&- 4<&-\n"
+        )
+        with self._lock:
+            if not self.alive:
+                raise ShellSessionUnavailable(f"Shell session of {self.container_id} is gone")
+            self._send(script)
+            if output is not None:
+                exited, stdout_size, stderr_size = self._receive_header()
+                self._copy_exactly(stdout_size, output.stdout)
+                self._copy_exactly(stderr_size, output.stderr)
+                return output.result(command, self.shell, env, exited)
+            exited, stdout, stderr = self._receive()
+        return Result(
+            stdout=stdout,
+            stderr=stderr,
+            command=command,
+            shell=self.shell,
+            env=env or {},
+            exited=exited,
+        )
+
+    def close(self) -> None:
+        if self.alive:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+    def _send(self, script: str) -> None:
+        try:
+            self._process.stdin.write(script.encode())
+            self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise ShellSessionUnavailable(f"Shell session of {self.container_id} is gone: {e}") from e
+
+    def _receive_header(self) -> tuple[int, int, int]:
+        """Exit code, stdout size and stderr size of the next frame."""
+        line = self._process.stdout.readline()
+        if not line:
+            raise ShellSessionError(f"Shell session of {self.container_id} ended before the command finished")
+        header = line.decode(errors="replace").split()
+        if len(header) != 4 or header[0] != self._token:
+            raise ShellSessionError(f"Shell session of {self.container_id} sent an invalid frame: {header}")
+        exited, stdout_size, stderr_size = (int(field) for field in header[1:])
+        return exited, stdout_size, stderr_size
+
+    def _receive(self) -> tuple[int, str, str]:
+        exited, stdout_size, stderr_size = self._receive_header()
+        stdout = self._read_exactly(stdout_size)
+        stderr = self._read_exactly(stderr_size)
+        return exited, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+    def _copy_exactly(self, size: int, buffer: OutputBuffer) -> None:
+        while size > 0:
+            chunk = self._read_exactly(min(size, _CHUNK_SIZE))
+            buffer.write(chunk)
+            size -= len(chunk)
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = self._process.stdout.read(size)
+        if len(data) != size:
+            raise ShellSessionError(f"Shell session of {self.container_id} ended in the middle of a frame")
+        return data
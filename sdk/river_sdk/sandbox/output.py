@@ -0,0 +1,228 @@
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from invoke.runners import Result
+
+# Bytes of each output stream a command keeps in memory.
+DEFAULT_BUFFER_LIMIT = 1 << 20
+
+# Bytes of a spilled stream read back into memory when its spill file is removed.
+DEFAULT_RETAIN_LIMIT = 64 << 20
+
+
+class OutputTruncatedError(RuntimeError):
+    """Raised when reading a stream whose beginning was lost, see OutputBuffer.getvalue()."""
+
+
+class OutputBuffer:
+    """One output stream of a command, with bounded memory.
+
+    The last `limit` bytes are kept in memory. Once the stream outgrows that,
+    all of it goes to `spill_path` instead, so nothing is lost; without a
+    spill path only the last `limit` bytes are kept. Complete lines are handed
+    to `on_line` as they arrive.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_BUFFER_LIMIT,
+        spill_path: Optional[Path] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ):
+        if limit < 1:
+            raise ValueError(f"limit must be positive, got {limit}")
+        self.limit = limit
+        self.spill_path = spill_path
+        self._on_line = on_line
+        self._tail = bytearray()
+        self._partial_line = bytearray()
+        self._file = None
+        self._lock = threading.Lock()
+        self.size = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the beginning of the stream is lost, as it never spilled to disk or the spill file is gone."""
+        return self.size > len(self._tail) and not (self.spilled and self.spill_path.exists())
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        with self._lock:
+            self.size += len(data)
+            if self._file is None and self.spill_path is not None and len(self._tail) + len(data) > self.limit:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.spill_path, "wb")
+                self._file.write(self._tail)
+            if self._file is not None:
+                self._file.write(data)
+            self._tail += data
+            if len(self._tail) > self.limit:
+                del self._tail[:len(self._tail) - self.limit]
+        if self._on_line is not None:
+            self._emit_lines(data)
+
+    def close(self) -> None:
+        """Hand the last unterminated line to `on_line` and finish the spill file."""
+        if self._on_line is not None and self._partial_line:
+            self._on_line(self._partial_line.decode(errors="replace"))
+            self._partial_line.clear()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+    def getvalue(self) -> str:
+        """The whole stream, read back from the spill file if it spilled.
+
+        Without a spill path that is the last `limit` bytes. Raises
+        OutputTruncatedError when the spill file was removed, e.g. by
+        `river gc --max-age`, rather than return only the end.
+        """
+        with self._lock:
+            if self._file is None:
+                return self._tail.decode(errors="replace")
+            if not self._file.closed:
+                self._file.flush()
+        try:
+            return self.spill_path.read_bytes().decode(errors="replace")
+        except FileNotFoundError:
+            raise OutputTruncatedError(
+                f"Only the last {len(self._tail)} of {self.size} bytes of the output were kept,"
+                f" {self.spill_path} is gone"
+            ) from None
+
+    def retain(self, max_bytes: int = DEFAULT_RETAIN_LIMIT) -> bool:
+        """Read a closed stream's spill file back into memory and remove the file.
+
+        Streams larger than `max_bytes` keep their spill file. Returns whether
+        the stream no longer needs one.
+        """
+        with self._lock:
+            if self._file is None:
+                return True
+            if self.size > max_bytes:
+                return False
+            try:
+                data = self.spill_path.read_bytes()
+            except FileNotFoundError:
+                return False
+            self._tail = bytearray(data)
+            self._file = None
+        self.spill_path.unlink(missing_ok=True)
+        return True
+
+    def tail(self, lines: int) -> str:
+        """The last lines of the stream, from memory."""
+        with self._lock:
+            text = self._tail.decode(errors="replace")
+        return "\n".join(text.splitlines()[-lines:])
+
+    def _emit_lines(self, data: bytes) -> None:
+        self._partial_line += data
+        *lines, rest = self._partial_line.split(b"\n")
+        # A line longer than the buffer is handed over in pieces.
+        while len(rest) > self.limit:
+            lines.append(rest[:self.limit])
+            rest = rest[self.limit:]
+        self._partial_line = bytearray(rest)
+        for line in lines:
+            self._on_line(line.decode(errors="replace"))
+
+
+class CommandOutput:
+    """Where an executor streams the stdout and stderr of one command.
+
+    Args:
+        limit: Bytes of each stream kept in memory.
+        spill_dir: Directory for `<name>.stdout` and `<name>.stderr`, written
+            only by streams that outgrow `limit`.
+        name: Base name of the spill files.
+        on_line: Called with the stream name ("stdout" or "stderr") and each
+            line, without its newline, as soon as the line is complete.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_BUFFER_LIMIT,
+        spill_dir: Optional[Path] = None,
+        name: str = "output",
+        on_line: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.stdout = OutputBuffer(
+            limit, spill_dir / f"{name}.stdout" if spill_dir else None, partial(on_line, "stdout") if on_line else None
+        )
+        self.stderr = OutputBuffer(
+            limit, spill_dir / f"{name}.stderr" if spill_dir else None, partial(on_line, "stderr") if on_line else None
+        )
+
+    def close(self) -> None:
+        self.stdout.close()
+        self.stderr.close()
+
+    def retain(self, max_bytes: int = DEFAULT_RETAIN_LIMIT) -> bool:
+        """Read both streams back into memory, see OutputBuffer.retain()."""
+        return all([self.stdout.retain(max_bytes), self.stderr.retain(max_bytes)])
+
+    def result(self, command: str, shell: str, env: Optional[dict[str, str]], exited: int) -> 'StreamingResult':
+        """Close the streams and wrap them in a result."""
+        self.close()
+        return StreamingResult(self, command=command, shell=shell, env=env or {}, exited=exited)
+
+
+def retain_outputs(outputs: Iterable[CommandOutput], max_bytes: int = DEFAULT_RETAIN_LIMIT) -> bool:
+    """Read the streams of the outputs back into memory, `max_bytes` in total, see OutputBuffer.retain().
+
+    Streams are read in order while they fit, the others keep their spill
+    file. Returns whether none of them needs one any more.
+    """
+    retained = True
+    for output in outputs:
+        for buffer in (output.stdout, output.stderr):
+            spilled = buffer.size if buffer.spilled else 0
+            if buffer.retain(max_bytes):
+                max_bytes -= spilled
+            else:
+                retained = False
+    return retained
+
+
+class StreamingResult(Result):
+    """An invoke Result whose stdout and stderr are read from a CommandOutput on access."""
+
+    def __init__(self, output: CommandOutput, **kwargs):
+        self.output = output
+        super().__init__(**kwargs)
+
+    @property
+    def stdout(self) -> str:
+        return self.output.stdout.getvalue()
+
+    @stdout.setter
+    def stdout(self, value: str) -> None:
+        # Result.__init__ assigns the captured output, ours lives in self.output.
+        pass
+
+    @property
+    def stderr(self) -> str:
+        return self.output.stderr.getvalue()
+
+    @stderr.setter
+    def stderr(self, value: str) -> None:
+        pass
+
+    @property
+    def log_files(self) -> list[str]:
+        """The spill files of the streams that outgrew memory."""
+        return [str(buffer.spill_path) for buffer in (self.output.stdout, self.output.stderr) if buffer.spilled]
+
+
+def output_tail(result: Result, stream: str, lines: int) -> str:
+    """The last lines of a result's stdout or stderr, without loading spilled output."""
+    if isinstance(result, StreamingResult):
+        return getattr(result.output, stream).tail(lines)
+    return "\n".join((getattr(result, stream) or "").splitlines()[-lines:])
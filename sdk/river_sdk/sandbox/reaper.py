@@ -0,0 +1,111 @@
+import atexit
+import queue
+import threading
+from typing import Callable, Optional
+
+_CONTAINER = "container"
+_IMAGE = "image"
+
+
+class TeardownReaper:
+    """Remove containers in the background, several at a time.
+
+    Jobs hand their containers over with submit() and move on, a worker thread
+    removes whatever queued up with a single `remove` call per batch. The queue
+    is bounded, submit() blocks while it is full. Whatever is still queued when
+    the interpreter exits, including after Ctrl-C or an uncaught exception, is
+    removed by an atexit hook.
+
+    Images queued with submit_image() are removed after the containers queued
+    before them, which may still run from them.
+
+    Args:
+        remove: Removes the given containers, e.g. with `docker rm -f`.
+        remove_images: Removes the given images, e.g. with `docker rmi`.
+        max_batch: Most containers and images removed by one batch.
+        max_pending: Most containers and images waiting for removal.
+    """
+
+    def __init__(
+        self,
+        remove: Callable[[list[str]], None],
+        remove_images: Optional[Callable[[list[str]], None]] = None,
+        max_batch: int = 32,
+        max_pending: int = 256,
+    ):
+        if max_batch < 1 or max_pending < 1:
+            raise ValueError(f"Invalid reaper size: max_batch={max_batch}, max_pending={max_pending}")
+        self._remove = remove
+        self._remove_images = remove_images
+        self.max_batch = max_batch
+        self._pending: queue.Queue[Optional[tuple[str, str]]] = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        # Held while queueing, so nothing is queued after the worker saw the end.
+        self._state_lock = threading.Lock()
+        self._errors_lock = threading.Lock()
+        self.errors = 0
+        self._worker = threading.Thread(target=self._reap, name="river-reaper", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, container_id: str) -> None:
+        """Queue the container for removal, or remove it right away once closed."""
+        self._submit(_CONTAINER, container_id)
+
+    def submit_image(self, tag: str) -> None:
+        """Queue the image for removal behind the containers, or remove it right away once closed."""
+        if self._remove_images is None:
+            raise ValueError("This reaper does not remove images")
+        self._submit(_IMAGE, tag)
+
+    def drain(self) -> None:
+        """Wait until every container and image submitted so far is removed."""
+        self._pending.join()
+
+    def close(self) -> None:
+        """Remove what is left and stop the worker."""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.put(None)
+        self._worker.join()
+        atexit.unregister(self.close)
+
+    def _submit(self, kind: str, name: str) -> None:
+        with self._state_lock:
+            if not self._closed:
+                self._pending.put((kind, name))
+                return
+        self._remove_quietly([(kind, name)])
+
+    def _reap(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            removals = [removal for removal in batch if removal is not None]
+            if removals:
+                self._remove_quietly(removals)
+            for _ in batch:
+                self._pending.task_done()
+            if None in batch:
+                # The sentinel is queued last, so nothing is left behind it.
+                return
+
+    def _remove_quietly(self, removals: list[tuple[str, str]]) -> None:
+        # Containers go first, the images of the batch were queued behind some of them.
+        container_ids = [name for kind, name in removals if kind == _CONTAINER]
+        tags = [name for kind, name in removals if kind == _IMAGE]
+        for remove, names in ((self._remove, container_ids), (self._remove_images, tags)):
+            if not names:
+                continue
+            # A failed removal must not stop the reaper, it is only counted.
+            try:
+                remove(names)
+            except Exception:
+                with self._errors_lock:
+                    self.errors += 1
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+def river_home() -> Path:
+    """Where river keeps its local state, `$RIVER_HOME` or `~/.river`."""
+    return Path(os.environ.get("RIVER_HOME") or Path.home() / ".river")
+
+
+class SnapshotReferences:
+    """Count how many pending forks still need each snapshot."""
+
+    def __init__(self):
+        self._references: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def retain(self, tag: str, references: int) -> None:
+        with self._lock:
+            self._references[tag] = self._references.get(tag, 0) + references
+
+    def release(self, tag: str) -> bool:
+        """Drop one reference, returns True when the snapshot is no longer needed.
+
+        Snapshots that were never retained are not tracked here and are
+        never reported as unneeded.
+        """
+        with self._lock:
+            if tag not in self._references:
+                return False
+            remaining = self._references[tag] - 1
+            if remaining > 0:
+                self._references[tag] = remaining
+                return False
+            self._references.pop(tag, None)
+            return True
+
+    def forget(self, tag: str) -> None:
+        """Stop tracking the snapshot, releasing it is then a no-op."""
+        with self._lock:
+            self._references.pop(tag, None)
+
+    def __contains__(self, tag: str) -> bool:
+        with self._lock:
+            return tag in self._references
+
+
+class RunRegistry:
+    """On-disk record of the running rivers and the snapshots they made.
+
+    Each flowing river owns `<river home>/runs/<run id>.json` with its
+    process id, the sandbox host and its snapshot tags. The file is removed
+    when the river ends, so a file whose process is gone belongs to a crashed
+    run, and its snapshots are orphans.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = (root or river_home()) / "runs"
+        self._lock = threading.Lock()
+
+    def begin(self, run_id: str, host: str) -> None:
+        with self._lock:
+            self._write(run_id, {"pid": os.getpid(), "host": host, "snapshots": []})
+
+    def add_snapshot(self, run_id: str, tag: str) -> None:
+        with self._lock:
+            run = self._read(self._path(run_id))
+            if run is not None:
+                run["snapshots"].append(tag)
+                self._write(run_id, run)
+
+    def remove_snapshot(self, run_id: str, tag: str) -> None:
+        with self._lock:
+            run = self._read(self._path(run_id))
+            if run is not None and tag in run["snapshots"]:
+                run["snapshots"].remove(tag)
+                self._write(run_id, run)
+
+    def end(self, run_id: str) -> None:
+        with self._lock:
+            self._path(run_id).unlink(missing_ok=True)
+
+    def runs(self, host: str) -> dict[str, dict]:
+        """All recorded runs against the host, by run id, each with an `alive` flag."""
+        runs = {}
+        for path in sorted(self.root.glob("*.json")) if self.root.is_dir() else []:
+            run = self._read(path)
+            if run is not None and run.get("host") == host:
+                run["alive"] = _process_alive(run["pid"])
+                runs[path.stem] = run
+        return runs
+
+    def _path(self, run_id: str) -> Path:
+        return self.root / f"{run_id}.json"
+
+    def _read(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, run_id: str, run: dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(run_id).with_suffix(".tmp")
+        tmp.write_text(json.dumps(run))
+        tmp.replace(self._path(run_id))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,144 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from fabric import Connection
+
+
+class _PooledConnection:
+    def __init__(self):
+        # Set by the thread that opens it, others wait for `ready`.
+        self.connection: Optional[Connection] = None
+        self.error: Optional[BaseException] = None
+        self.ready = threading.Event()
+        self.channels = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        if not self.ready.is_set():
+            return True
+        transport = self.connection.transport if self.error is None else None
+        return transport is not None and transport.is_active()
+
+
+class SSHConnectionPool:
+    """Authenticated SSH connections per host, shared by its command executors.
+
+    Every command runs on a channel of its own, and up to `max_channels`
+    channels share one connection, so concurrent commands to a host mostly
+    reuse a handful of transports instead of doing a TCP connect, an SSH
+    handshake and authentication each. Connections idle for longer than
+    `idle_timeout` seconds, and connections whose transport died, are closed
+    and replaced the next time the host is used.
+
+    Args:
+        max_channels: Concurrent commands per connection.
+        idle_timeout: Seconds an unused connection is kept open.
+        keepalive: Seconds between SSH keepalives on open connections, so
+            firewalls do not drop them while idle. 0 disables them.
+    """
+
+    def __init__(self, max_channels: int = 8, idle_timeout: float = 300.0, keepalive: int = 30):
+        if max_channels < 1:
+            raise ValueError(f"max_channels must be at least 1, got {max_channels}")
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self._connections: dict[tuple, list[_PooledConnection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @contextmanager
+    def connection(self, params: dict[str, Any]) -> Iterator[Connection]:
+        """Borrow an open connection for the given fabric Connection parameters."""
+        pooled = self._acquire(params)
+        try:
+            yield pooled.connection
+        finally:
+            with self._lock:
+                pooled.channels -= 1
+                pooled.last_used = time.monotonic()
+
+    def discard(self, connection: Connection) -> None:
+        """Close a connection that turned out to be broken."""
+        with self._lock:
+            for pooled_connections in self._connections.values():
+                pooled_connections[:] = [p for p in pooled_connections if p.connection is not connection]
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pooled_connections = [p for ps in self._connections.values() for p in ps]
+            self._connections.clear()
+        for pooled in pooled_connections:
+            if pooled.connection is not None:
+                pooled.connection.close()
+
+    def _acquire(self, params: dict[str, Any]) -> _PooledConnection:
+        key = _pool_key(params)
+        stale = []
+        with self._lock:
+            now = time.monotonic()
+            pooled_connections = self._connections.setdefault(key, [])
+            for pooled in list(pooled_connections):
+                idle = pooled.channels == 0 and now - pooled.last_used > self.idle_timeout
+                if idle or not pooled.alive:
+                    pooled_connections.remove(pooled)
+                    stale.append(pooled)
+            available = [pooled for pooled in pooled_connections if pooled.channels < self.max_channels]
+            # Fill the busiest connection first, so idle ones can time out.
+            pooled = max(available, key=lambda p: p.channels, default=None)
+            opening = pooled is None
+            if opening:
+                # Commands coming while it connects take channels on it instead of connecting too.
+                pooled = _PooledConnection()
+                pooled_connections.append(pooled)
+            pooled.channels += 1
+
+        for connection in stale:
+            connection.connection.close()
+        if opening:
+            self._open(key, pooled, params)
+        else:
+            pooled.ready.wait()
+        if pooled.error is not None:
+            with self._lock:
+                pooled.channels -= 1
+            raise pooled.error
+        return pooled
+
+    def _open(self, key: tuple, pooled: _PooledConnection, params: dict[str, Any]) -> None:
+        # Handshakes happen outside the lock, other hosts need not wait for them.
+        try:
+            connection = Connection(**params)
+            connection.open()
+            if self.keepalive:
+                connection.transport.set_keepalive(self.keepalive)
+            pooled.connection = connection
+            with self._lock:
+                self.opened += 1
+        except BaseException as e:
+            pooled.error = e
+            with self._lock:
+                pooled_connections = self._connections.get(key, [])
+                if pooled in pooled_connections:
+                    pooled_connections.remove(pooled)
+        finally:
+            pooled.ready.set()
+
+
+def _pool_key(params: dict[str, Any]) -> tuple:
+    connect_kwargs = params.get("connect_kwargs") or {}
+    return (
+        params["host"],
+        params.get("user"),
+        params.get("port"),
+        tuple(sorted((key, repr(value)) for key, value in connect_kwargs.items())),
+    )
+
+
+# Shared by all remote executors, so sandboxes of one host share its connections.
+default_ssh_pool = SSHConnectionPool()
+atexit.register(default_ssh_pool.close)
@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import heapq
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Mapping, Optional
+from river_sdk.job import Job
+from river_sdk.plan import ExecutionPlan
+
+
+class ReadyQueue:
+    """Track which jobs of a plan can start, given the jobs finished so far.
+
+    Ready jobs are ordered by their position in the plan, so a single worker
+    runs them exactly in plan order. Given priorities, such as
+    `ExecutionPlan.remaining_paths()`, the highest priority goes first and
+    plan order only breaks ties.
+    """
+
+    def __init__(self, plan: ExecutionPlan, priorities: Optional[Mapping[Job, float]] = None):
+        self._plan = plan
+        self._priorities = priorities
+        self._waiting = {job: len(job._upstreams) for job in plan.order}
+        self._ready = [(self._key(job), job) for job in plan.order if self._waiting[job] == 0]
+        heapq.heapify(self._ready)
+        now = time.monotonic()
+        for _, job in self._ready:
+            job._ready_at = now
+
+    def _key(self, job: Job):
+        if self._priorities is None:
+            return self._plan.index(job)
+        return -self._priorities[job], self._plan.index(job)
+
+    def pop(self) -> Job:
+        return heapq.heappop(self._ready)[1]
+
+    def finish(self, job: Job) -> None:
+        """Mark the job as finished, releasing downstreams whose upstreams are all done."""
+        job._outcome()
+        for downstream in self._plan.downstreams(job):
+            self._waiting[downstream] -= 1
+            if self._waiting[downstream] == 0:
+                downstream._ready_at = time.monotonic()
+                heapq.heappush(self._ready, (self._key(downstream), downstream))
+
+    def start(self) -> Optional[Job]:
+        """Pop the next job that actually needs to run.
+
+        Jobs finished in an earlier run are passed over, and jobs whose
+        upstreams failed or were skipped are skipped; both release their
+        downstreams right away. Returns None when nothing is ready.
+        """
+        while self._ready:
+            job = self.pop()
+            if job._run_already_finished():
+                self.finish(job)
+            elif job._upstream_blocked():
+                job._skip()
+                self.finish(job)
+            else:
+                return job
+        return None
+
+    def __bool__(self) -> bool:
+        return bool(self._ready)
+
+
+class Scheduler:
+    """Run an execution plan, up to `max_workers` jobs at a time.
+
+    A job becomes ready once all of its upstreams have finished. Ready jobs
+    whose upstreams failed or were skipped are skipped without being run, the
+    rest are handed to a thread pool. Every job runs in a copy of the caller's
+    context, so `RiverContext` (and `JobContext` inside `Job.run`) keep working
+    on worker threads.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self.max_workers = max_workers
+
+    def run(self, plan: ExecutionPlan, priorities: Optional[Mapping[Job, float]] = None) -> None:
+        ready = ReadyQueue(plan, priorities)
+        running: dict[Future, Job] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="river-job") as pool:
+            while ready or running:
+                while len(running) < self.max_workers and (job := ready.start()):
+                    context = contextvars.copy_context()
+                    forks = len(plan.fork_consumers(job))
+                    running[pool.submit(context.run, job._run_self, forks, plan.hands_over(job))] = job
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    # Job failures are recorded on the job itself, anything raised
+                    # here is a bug in the scheduling machinery and must surface.
+                    future.result()
+                    ready.finish(job)
+
+
+class AsyncScheduler:
+    """Run an execution plan on the running event loop, up to `max_workers` jobs at a time.
+
+    `AsyncJob`s run as tasks of the loop, other jobs run in a worker thread
+    each. Tasks and threads both start from a copy of the current context.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self.max_workers = max_workers
+
+    async def run(self, plan: ExecutionPlan, priorities: Optional[Mapping[Job, float]] = None) -> None:
+        ready = ReadyQueue(plan, priorities)
+        running: dict[asyncio.Task, Job] = {}
+
+        try:
+            while ready or running:
+                while len(running) < self.max_workers and (job := ready.start()):
+                    forks = len(plan.fork_consumers(job))
+                    running[asyncio.create_task(job._arun_self(forks, plan.hands_over(job)))] = job
+
+                if not running:
+                    continue
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job = running.pop(task)
+                    task.result()
+                    ready.finish(job)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.wait(running)
+
+
+def predict_makespan(
+    plan: ExecutionPlan, costs: Mapping[Job, float], priorities: Mapping[Job, float], max_workers: int = 1
+) -> float:
+    """Seconds the plan would take if every job took its cost, ordered like ReadyQueue does.
+
+    Replays the scheduler on a simulated clock: up to `max_workers` ready
+    jobs run at a time, highest priority first, and each one that finishes
+    releases its downstreams.
+    """
+    waiting = {job: len(job._upstreams) for job in plan.order}
+    ready = [(-priorities[job], plan.index(job), job) for job in plan.order if waiting[job] == 0]
+    heapq.heapify(ready)
+    running: list[tuple[float, int, Job]] = []
+    now = 0.0
+    while ready or running:
+        while ready and len(running) < max_workers:
+            _, index, job = heapq.heappop(ready)
+            heapq.heappush(running, (now + costs[job], index, job))
+        now, _, job = heapq.heappop(running)
+        for downstream in plan.downstreams(job):
+            waiting[downstream] -= 1
+            if waiting[downstream] == 0:
+                heapq.heappush(ready, (-priorities[downstream], plan.index(downstream), downstream))
+    return now
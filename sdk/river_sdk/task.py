@@ -1,82 +1,339 @@
-from typing import Dict, Optional
-import uuid
-from river_sdk.job import get_current_job
-from river_sdk.sandbox.command_executor import LocalCommandExecutor
-from river_common.status import TaskStatus
-from river_common.shared import Status
+import asyncio
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Union
+from river_sdk.ids import random_id, task_id as ordinal_task_id
+from river_sdk.job import Job, get_current_job
+from river_sdk.sandbox.command_executor import LocalCommandExecutor, AsyncLocalCommandExecutor
+from river_sdk.sandbox.output import CommandOutput, StreamingResult, output_tail
+from river_sdk.task_cache import CachePolicy, advance_lineage
+from river_sdk.timing import timed
+from river_common.event import StatusEvent
+from river_common.exporter import status_exporter
+from river_common.shared import ModuleTypes, Status
+
+
+# Lines of stdout and stderr a failed task puts in its error.
+ERROR_TAIL_LINES = 20
+
+# A callback for the output lines of a task, called with "stdout" or "stderr" and the line.
+LineCallback = Callable[[str, str], None]
+
+# Set by aparallel() for its tasks, a task that fails sets the event.
+_sibling_failed: ContextVar[Optional[asyncio.Event]] = ContextVar('sibling-failed', default=None)
 
 
 class TaskExecutionError(Exception):
-    """Custom exception raised when a task command execution fails."""
+    """Custom exception raised when a task command execution fails.
+
+    `stdout` and `stderr` hold the tail of the output, `log_files` the files
+    with the whole output of streams too large to keep in memory.
+    """
     
-    def __init__(self, command: str, stdout: str = "", stderr: str = "", exit_code: int = 0):
+    def __init__(
+        self,
+        command: str,
+        stdout: str = "",
+        stderr: str = "",
+        exit_code: int = 0,
+        log_files: Optional[list[str]] = None,
+    ):
         self.command = command
         self.stdout = stdout
         self.stderr = stderr
         self.exit_code = exit_code
+        self.log_files = log_files or []
         
         error_msg = f"Command '{command}' failed with exit code {exit_code}"
         if stderr:
             error_msg += f"\nstderr: {stderr}"
         if stdout:
             error_msg += f"\nstdout: {stdout}"
+        if self.log_files:
+            error_msg += f"\nfull output: {', '.join(self.log_files)}"
             
         super().__init__(error_msg)
 
 
-def _export_task_status(task_id: str, task_name: str, parent_id: str, status: Status, exception: Optional[Exception] = None):
+def _export_task_status(
+    task_id: str,
+    task_name: str,
+    parent_id: str,
+    status: Status,
+    exception: Optional[BaseException] = None,
+    timings: Optional[dict[str, float]] = None,
+    cache_hit: Optional[bool] = None,
+):
     """Export task status if needed"""
-    task_status = TaskStatus(
-        id=task_id,
-        name=task_name,
-        parent_id=parent_id,
-        status=status
+    status_exporter().export(
+        StatusEvent(ModuleTypes.TASK, task_id, task_name, parent_id, status, exception, timings=timings,
+                    cache_hit=cache_hit)
     )
-    
-    if status == Status.FAILED and exception:
-        task_status.set_failed(exception)
-    
-    task_status.export()
 
 
-def bash(command: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None, task_name: Optional[str] = None):
+def _new_task_id(job: Job) -> str:
+    """The job id plus the task's ordinal with deterministic ids, a random id otherwise."""
+    if job._task_ordinal is None:
+        return random_id()
+    ordinal, job._task_ordinal = job._task_ordinal, job._task_ordinal + 1
+    return ordinal_task_id(job.id, ordinal)
+
+
+def _default_task_name(command: str) -> str:
+    return f"bash: {command[:50]}..." if len(command) > 50 else f"bash: {command}"
+
+
+def _check_result(command: str, result) -> None:
+    if not result.ok:
+        raise TaskExecutionError(
+            command=command,
+            stdout=output_tail(result, "stdout", ERROR_TAIL_LINES),
+            stderr=output_tail(result, "stderr", ERROR_TAIL_LINES),
+            exit_code=result.exited,
+            log_files=result.log_files if isinstance(result, StreamingResult) else None,
+        )
+
+
+def _task_output(job: Job, task_id: str, on_line: Optional[LineCallback]) -> CommandOutput:
+    """Output buffers of a task, spilling to `<river home>/logs/<run id>/<job id>/<task id>.*`."""
+    output = CommandOutput(spill_dir=job._task_logs_dir(), name=task_id, on_line=on_line)
+    # Only the results hold on to it, the job must not keep a finished task's output alive.
+    job._task_outputs.append(weakref.ref(output))
+    return output
+
+
+def bash(
+    command: str,
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    task_name: Optional[str] = None,
+    on_line: Optional[LineCallback] = None,
+    cache: Optional[CachePolicy] = None,
+):
+    """Run the command in the current job's sandbox, or locally without one.
+
+    Output is streamed while the command runs: each complete line goes to
+    `on_line` if given, and only the last part of each stream is kept in
+    memory, larger output spills to a log file per task. The returned
+    result's stdout and stderr read it back on access, see
+    Job.keep_task_logs for what happens once the job succeeds. Raises
+    TaskExecutionError with the tail of the output if the command fails.
+
+    With a cache policy, a run recorded earlier is replayed instead, see
+    CachePolicy: its result is returned and the files it changed are
+    unpacked into the sandbox, without calling `on_line`. The task then
+    reports Status.CACHED, and its final status says whether it was a hit.
+    """
     job = get_current_job()
     sandbox = job.sandbox
     
     # Create task identifiers
-    task_id = str(uuid.uuid4())
+    task_id = _new_task_id(job)
     if task_name is None:
-        task_name = f"bash: {command[:50]}..." if len(command) > 50 else f"bash: {command}"
+        task_name = _default_task_name(command)
     
     # Export initial status
     _export_task_status(task_id, task_name, job.id, Status.RUNNING)
+    timings: dict[str, float] = {}
+    # Only a cache reads the lineage, anything else leaves it unresolved.
+    if cache is not None and not cache.applies_to(sandbox):
+        cache = None
+    key = advance_lineage(sandbox, command, cwd, env)
+    if key is None:
+        cache = None
     
     try:
-        if sandbox is None:
-            result = LocalCommandExecutor().run(
-                command=command,
-                cwd=cwd,
-                env=env
-            )
-        else:
-            result = sandbox.execute(
-                command=command,
-                cwd=cwd,
-                env=env
-            )
-
-        if not result.ok:
-            error = TaskExecutionError(
-                command=command,
-                stdout=result.stdout,
-                stderr=result.stderr,
-                exit_code=result.exited
-            )
-            raise error
+        if cache is not None and (entry := cache.lookup(key)) is not None:
+            with timed(timings, "execution"):
+                result = cache.replay(entry, sandbox)
+            _export_task_status(task_id, task_name, job.id, Status.CACHED, timings=timings, cache_hit=True)
+            return result
+
+        marker = cache.mark(sandbox) if cache is not None else None
+        output = _task_output(job, task_id, on_line)
+        with timed(timings, "execution"):
+            if sandbox is None:
+                result = LocalCommandExecutor().run(
+                    command=command,
+                    cwd=cwd,
+                    env=env,
+                    output=output
+                )
+            elif sandbox.streams_output:
+                result = sandbox.execute(
+                    command=command,
+                    cwd=cwd,
+                    env=env,
+                    output=output
+                )
+            else:
+                result = sandbox.execute(
+                    command=command,
+                    cwd=cwd,
+                    env=env
+                )
+
+        _check_result(command, result)
+        if cache is not None:
+            cache.record(key, result, sandbox, marker)
         
-        _export_task_status(task_id, task_name, job.id, Status.SUCCESS)
+        _export_task_status(task_id, task_name, job.id, Status.SUCCESS, timings=timings,
+                            cache_hit=False if cache is not None else None)
         return result
 
     except Exception as e:
-        _export_task_status(task_id, task_name, job.id, Status.FAILED, e)
+        _export_task_status(task_id, task_name, job.id, Status.FAILED, e, timings,
+                            cache_hit=False if cache is not None else None)
         raise
+
+
+async def abash(
+    command: str,
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    task_name: Optional[str] = None,
+    on_line: Optional[LineCallback] = None,
+    cache: Optional[CachePolicy] = None,
+):
+    """Like bash(), but awaitable, for use in `AsyncJob.main()`.
+
+    At most `job.max_parallel_tasks` abash() calls of a job run at once, the
+    others wait before reporting RUNNING, and they start in the order they
+    were called. Under aparallel(), tasks still waiting when a sibling fails
+    report SKIPPED without starting. Parallel commands are folded into the
+    sandbox's lineage in the order they start.
+
+    A task with a cache policy runs alone in the job's sandbox: it starts
+    once the running tasks finished and the tasks called after it wait for
+    it, so the changes it records are its own.
+    """
+    job = get_current_job()
+    sandbox = job.sandbox
+
+    task_id = _new_task_id(job)
+    if task_name is None:
+        task_name = _default_task_name(command)
+
+    waiting_since = time.monotonic()
+    timings: dict[str, float] = {}
+    try:
+        async with job._task_slot(exclusive=cache is not None):
+            timings["queue_wait"] = time.monotonic() - waiting_since
+            failed = _sibling_failed.get()
+            if failed is not None and failed.is_set():
+                # A sibling failed while this task waited for its slot.
+                raise asyncio.CancelledError()
+            _export_task_status(task_id, task_name, job.id, Status.RUNNING)
+            # Only a cache reads the lineage, anything else leaves it unresolved.
+            if cache is not None and not cache.applies_to(sandbox):
+                cache = None
+            key = advance_lineage(sandbox, command, cwd, env)
+            if key is None:
+                cache = None
+
+            try:
+                if cache is not None and (entry := cache.lookup(key)) is not None:
+                    with timed(timings, "execution"):
+                        result = await asyncio.to_thread(cache.replay, entry, sandbox)
+                    _export_task_status(task_id, task_name, job.id, Status.CACHED, timings=timings, cache_hit=True)
+                    return result
+
+                marker = await asyncio.to_thread(cache.mark, sandbox) if cache is not None else None
+                output = _task_output(job, task_id, on_line)
+                with timed(timings, "execution"):
+                    if sandbox is None:
+                        result = await AsyncLocalCommandExecutor().run(
+                            command=command,
+                            cwd=cwd,
+                            env=env,
+                            output=output
+                        )
+                    elif sandbox.streams_output:
+                        result = await sandbox.aexecute(
+                            command=command,
+                            cwd=cwd,
+                            env=env,
+                            output=output
+                        )
+                    else:
+                        result = await sandbox.aexecute(
+                            command=command,
+                            cwd=cwd,
+                            env=env
+                        )
+
+                _check_result(command, result)
+                if cache is not None:
+                    await asyncio.to_thread(cache.record, key, result, sandbox, marker)
+
+                _export_task_status(task_id, task_name, job.id, Status.SUCCESS, timings=timings,
+                                    cache_hit=False if cache is not None else None)
+                return result
+
+            except Exception as e:
+                # Flag the failure before the slot is released, so no waiting sibling starts.
+                if failed is not None:
+                    failed.set()
+                _export_task_status(task_id, task_name, job.id, Status.FAILED, e, timings,
+                                    cache_hit=False if cache is not None else None)
+                raise
+
+    except asyncio.CancelledError:
+        # Stopped before it finished, or before it started, e.g. by a sibling failing in aparallel().
+        _export_task_status(task_id, task_name, job.id, Status.SKIPPED, timings=timings)
+        raise
+
+
+TaskSpec = Union[str, Dict[str, Any]]
+
+
+async def aparallel(tasks: list[TaskSpec]) -> list:
+    """Run several bash tasks of the current job at the same time.
+
+    Each task is a command string, or a dict of abash() keyword arguments.
+    Results are returned in the order of `tasks`. The first task to fail
+    cancels the ones still running or waiting, which report SKIPPED, and its
+    error is raised.
+    """
+    # The tasks copy the context, so they all see the same flag.
+    token = _sibling_failed.set(asyncio.Event())
+    try:
+        running = [
+            asyncio.create_task(abash(task) if isinstance(task, str) else abash(**task))
+            for task in tasks
+        ]
+    finally:
+        _sibling_failed.reset(token)
+    if not running:
+        return []
+    # Errors in the order the tasks failed, several may fail before we wake up.
+    errors: list[BaseException] = []
+
+    def collect(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    for task in running:
+        task.add_done_callback(collect)
+
+    try:
+        await asyncio.wait(running, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        pending = [task for task in running if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    if errors:
+        raise errors[0]
+    return [task.result() for task in running]
+
+
+def parallel(tasks: list[TaskSpec]) -> list:
+    """Blocking variant of aparallel(), for use in `Job.main()`."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(aparallel(tasks))
+    raise RuntimeError("parallel() cannot be called from a running event loop, use 'await aparallel(...)' instead")
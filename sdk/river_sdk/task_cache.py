@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Optional
+from invoke.runners import Result
+from river_sdk.job_cache import DEFAULT_CACHE_SIZE, CacheEntry, JobCache
+from river_sdk.sandbox.base_sandbox import BaseSandbox
+from river_sdk.sandbox.snapshot_refs import river_home
+
+
+class TaskCache(JobCache):
+    """Recorded bash() runs on local disk, by task cache key.
+
+    Entries hold the command's Result and, as their attachment, a tar of
+    the files the command changed. They are stored under
+    `<river home>/cache/tasks` by default and evicted like job cache entries.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_size: int = DEFAULT_CACHE_SIZE):
+        super().__init__(root or river_home() / "cache" / "tasks", max_size)
+
+
+class CachePolicy:
+    """How bash() memoizes a command.
+
+    A recorded run is replayed for the same command, cwd and env in a sandbox
+    with the same lineage: started from the same image or snapshot, with the
+    same commands run in it before. Commands run locally, in sandboxes
+    without a lineage, or that fail are never recorded. Under abash() a
+    cached command runs alone in its sandbox, so no parallel sibling's files
+    end up in its recorded changes.
+
+    Args:
+        cache: Where runs are recorded, a TaskCache under the river home by default.
+        record_changes: Record the files the command creates or modifies and
+            unpack them on a hit. Only sandboxes that record changes memoize
+            such commands. Without it only the result is replayed, for
+            commands whose files later commands do not need.
+        max_age: Seconds after which a recorded run is run again, None keeps
+            it until it is evicted.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[TaskCache] = None,
+        record_changes: bool = True,
+        max_age: Optional[float] = None,
+    ):
+        if max_age is not None and max_age <= 0:
+            raise ValueError(f"max_age must be positive, got {max_age}")
+        self.cache = cache or TaskCache()
+        self.record_changes = record_changes
+        self.max_age = max_age
+
+    def applies_to(self, sandbox: Optional[BaseSandbox]) -> bool:
+        """Whether commands in the sandbox can be memoized under this policy."""
+        if sandbox is None or sandbox.lineage is None:
+            return False
+        return sandbox.records_changes or not self.record_changes
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self.cache.get(key)
+        if entry is not None and self.max_age is not None and time.time() - entry.created > self.max_age:
+            self.cache.invalidate(key)
+            return None
+        return entry
+
+    def mark(self, sandbox: BaseSandbox) -> Optional[str]:
+        """Start tracking the sandbox's files before the command runs, if changes are recorded."""
+        return sandbox.mark() if self.record_changes else None
+
+    def record(self, key: str, result: Result, sandbox: BaseSandbox, marker: Optional[str]) -> None:
+        """Store a successful run, with the files changed since the marker.
+
+        Runs whose changes cannot be read are not recorded, the task itself succeeded.
+        """
+        archive = None
+        if marker is not None:
+            self.cache.root.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(dir=self.cache.root, suffix=".tar.tmp")
+            os.close(fd)
+            archive = Path(name)
+            try:
+                sandbox.changes(marker, archive)
+            except RuntimeError:
+                archive.unlink(missing_ok=True)
+                return
+        self.cache.put(key, _stored_result(result), attachment=archive)
+
+    def replay(self, entry: CacheEntry, sandbox: BaseSandbox) -> Result:
+        """Unpack the recorded changes into the sandbox and return the recorded result."""
+        if entry.attachment is not None:
+            sandbox.apply_changes(entry.attachment)
+        return entry.result
+
+
+def advance_lineage(
+    sandbox: Optional[BaseSandbox], command: str, cwd: Optional[str], env: Optional[dict[str, str]]
+) -> Optional[str]:
+    """Fold the command into the sandbox's lineage and return the command's cache key.
+
+    The key is the new lineage, so every later command's key covers this
+    one. None when the sandbox's lineage is unknown, or was not read yet:
+    the command is then folded in once it is, see BaseSandbox.fold_lineage.
+    """
+    if sandbox is None:
+        return None
+    return sandbox.fold_lineage(partial(_fold_command, [command, cwd, sorted((env or {}).items())]))
+
+
+def _fold_command(command: list, lineage: str) -> str:
+    return hashlib.sha256(json.dumps([lineage, *command]).encode()).hexdigest()
+
+
+def _stored_result(result: Result) -> Result:
+    # Streaming results read their output from buffers that do not outlive the task.
+    return Result(
+        stdout=result.stdout,
+        stderr=result.stderr,
+        command=result.command,
+        shell=result.shell,
+        env=result.env,
+        exited=result.exited,
+    )
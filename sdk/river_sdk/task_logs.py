@@ -0,0 +1,68 @@
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+from river_sdk.sandbox.snapshot_refs import river_home
+
+
+# The run directory of jobs that run outside a river, their ids are always random.
+NO_RUN = "local"
+
+
+def task_logs_dir(run_id: Optional[str], job_id: str) -> Path:
+    """Where the tasks of the job spill output too large to keep in memory.
+
+    Keyed by the flow's run id too, job ids repeat across flows with
+    deterministic ids.
+    """
+    return _logs_root() / (run_id or NO_RUN) / job_id
+
+
+def remove_task_logs(run_id: Optional[str], job_id: str) -> None:
+    directory = task_logs_dir(run_id, job_id)
+    shutil.rmtree(directory, ignore_errors=True)
+    _remove_if_empty(directory.parent)
+
+
+def collect_task_logs(max_age: float, dry_run: bool = False) -> list[Path]:
+    """Remove the task logs of jobs that last wrote them more than `max_age` seconds ago.
+
+    These are the logs of failed jobs and of jobs that keep them, see
+    Job.keep_task_logs. Returns the removed job directories.
+    """
+    root = _logs_root()
+    if not root.is_dir():
+        return []
+    cutoff = time.time() - max_age
+    removed = []
+    for run in sorted(root.iterdir()):
+        if not run.is_dir():
+            continue
+        for directory in _job_dirs(run):
+            written = max((path.stat().st_mtime for path in directory.iterdir()), default=directory.stat().st_mtime)
+            if written < cutoff:
+                removed.append(directory)
+                if not dry_run:
+                    shutil.rmtree(directory, ignore_errors=True)
+        if not dry_run:
+            _remove_if_empty(run)
+    return removed
+
+
+def _job_dirs(run: Path) -> list[Path]:
+    # Logs written before they were keyed by run sit right in <home>/logs/<job id>.
+    if any(path.is_file() for path in run.iterdir()):
+        return [run]
+    return sorted(path for path in run.iterdir() if path.is_dir())
+
+
+def _remove_if_empty(directory: Path) -> None:
+    try:
+        directory.rmdir()
+    except OSError:
+        # Not empty, e.g. the logs of another job of the run, or gone already.
+        pass
+
+
+def _logs_root() -> Path:
+    return river_home() / "logs"
@@ -0,0 +1,66 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class TaskSlots:
+    """The slots a job's tasks run in on one event loop.
+
+    At most `limit` tasks run at once and they start in the order they asked
+    for a slot. An exclusive task runs alone: it waits for the running ones
+    to finish, and the ones asking after it wait for it.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._running = 0
+        self._exclusive = False
+        self._waiting: deque[tuple[asyncio.Future, bool]] = deque()
+
+    @asynccontextmanager
+    async def slot(self, exclusive: bool = False) -> AsyncIterator[None]:
+        await self._acquire(exclusive)
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._exclusive = False
+            self._wake()
+
+    async def _acquire(self, exclusive: bool) -> None:
+        if not self._waiting and self._free(exclusive):
+            self._start(exclusive)
+            return
+        waiter = (asyncio.get_running_loop().create_future(), exclusive)
+        self._waiting.append(waiter)
+        try:
+            await waiter[0]
+        except asyncio.CancelledError:
+            if waiter[0].cancelled():
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+            else:
+                # Given the slot, but cancelled before it resumed.
+                self._running -= 1
+                self._exclusive = False
+            self._wake()
+            raise
+
+    def _free(self, exclusive: bool) -> bool:
+        if self._exclusive or self._running >= self._limit:
+            return False
+        return not exclusive or self._running == 0
+
+    def _start(self, exclusive: bool) -> None:
+        self._running += 1
+        self._exclusive = exclusive
+
+    def _wake(self) -> None:
+        while self._waiting and self._free(self._waiting[0][1]):
+            future, exclusive = self._waiting.popleft()
+            if future.done():
+                # Cancelled while waiting, its task gives up.
+                continue
+            self._start(exclusive)
+            future.set_result(None)
@@ -0,0 +1,26 @@
+"""Rivers on mock sandbox managers, shared by the tests."""
+from unittest.mock import Mock
+from river_sdk.job import Job
+from river_sdk.river import River
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+
+
+def make_manager() -> Mock:
+    """A sandbox manager mock, its sandboxes and snapshots are named after what they come from."""
+    manager = Mock(spec=BaseSandboxManager)
+    manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+    manager.fork.side_effect = lambda job: Mock(name=f"fork-of-{job.name}")
+    manager.take_snapshot.side_effect = lambda sandbox: f"snapshot-of-{sandbox}"
+    manager.hand_over.return_value = True
+    manager.has_snapshot.return_value = True
+    return manager
+
+
+def make_river(outlet: Job, manager=None, name: str = "test-river", **options) -> River:
+    """A river flowing `outlet` as its default outlet, on a mock manager unless one is given.
+
+    Args:
+        options: Further River arguments, e.g. journal or max_parallel_jobs.
+    """
+    options.setdefault("default_sandbox_config", "ubuntu")
+    return River(name, manager or make_manager(), {"default": outlet}, **options)
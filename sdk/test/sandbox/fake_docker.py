@@ -0,0 +1,108 @@
+"""A fake `docker` CLI to put on PATH in tests.
+
+Every call is appended as a JSON list of arguments to the log file. `run`
+prints a new container id, `exec` runs the command on the host instead of in
+a container, `inspect` prints the image id of a container, derived from the
+image it was run from, `rm` forgets containers, `commit`, `image ls`,
+`image inspect` and `rmi` keep a list of images in a JSON file, everything
+else just succeeds. Like docker, `rmi` refuses images a container uses.
+"""
+import json
+import os
+import stat
+import sys
+
+SHIM = '''#!{python}
+import hashlib, json, os, subprocess, sys, time, uuid
+
+args = sys.argv[1:]
+with open({log!r}, "a") as log:
+    log.write(json.dumps(args) + "\\n")
+
+command = args[0] if args else ""
+if command == "run":
+    time.sleep(float(os.environ.get("FAKE_DOCKER_RUN_DELAY", "0")))
+    container_id = uuid.uuid4().hex
+    with open({containers!r}, "a") as containers:
+        containers.write(json.dumps([container_id, args[2]]) + "\\n")
+    print(container_id)
+elif command == "rm":
+    time.sleep(float(os.environ.get("FAKE_DOCKER_RM_DELAY", "0")))
+    removed = [arg for arg in args[1:] if not arg.startswith("-")]
+    with open({containers!r}) as containers:
+        kept = [line for line in containers if json.loads(line)[0] not in removed]
+    with open({containers!r}, "w") as containers:
+        containers.writelines(kept)
+elif command == "inspect":
+    with open({containers!r}) as containers:
+        image_of = dict(json.loads(line) for line in containers)
+    print("sha256:" + hashlib.sha256(image_of[args[-1]].encode()).hexdigest())
+elif command == "exec":
+    rest, env, cwd, interactive = args[1:], dict(os.environ), None, False
+    while rest and rest[0].startswith("-"):
+        flag = rest.pop(0)
+        if flag == "-i":
+            interactive = True
+        elif flag == "-e":
+            key, _, value = rest.pop(0).partition("=")
+            env[key] = value
+        elif flag == "-w":
+            cwd = rest.pop(0)
+    container, command_line = rest[0], rest[1:]
+    if interactive:
+        os.execvpe(command_line[0], command_line, env)
+    sys.exit(subprocess.run(command_line, cwd=cwd, env=env).returncode)
+elif command in ("commit", "image", "rmi"):
+    images = json.load(open({images!r}))
+    if command == "commit":
+        images.append({{"tag": args[-1], "created": time.strftime("%Y-%m-%dT%H:%M:%S.123456789Z", time.gmtime()), "size": 1024}})
+        print("sha256:" + uuid.uuid4().hex)
+    elif command == "rmi":
+        with open({containers!r}) as containers:
+            in_use = {{json.loads(line)[1] for line in containers}}
+        for tag in set(args[1:]) & in_use:
+            print(f"Error response from daemon: conflict: unable to remove repository reference {{tag}}", file=sys.stderr)
+        images = [image for image in images if image["tag"] not in args[1:] or image["tag"] in in_use]
+    elif args[1] == "ls":
+        for image in images:
+            print(image["tag"])
+    elif args[1] == "inspect":
+        by_tag = {{image["tag"]: image for image in images}}
+        print(json.dumps([{{"Created": by_tag[tag]["created"], "Size": by_tag[tag]["size"]}} for tag in args[2:]]))
+    json.dump(images, open({images!r}, "w"))
+    if command == "rmi" and set(args[1:]) & in_use:
+        sys.exit(1)
+'''
+
+
+def install_fake_docker(tmp_path, monkeypatch) -> str:
+    """Put the fake docker on PATH and return the path of its call log."""
+    bin_dir = tmp_path / "fake-docker-bin"
+    bin_dir.mkdir()
+    log = tmp_path / "docker-calls.log"
+    log.touch()
+    images = tmp_path / "docker-images.json"
+    images.write_text("[]")
+    containers = tmp_path / "docker-containers.log"
+    containers.touch()
+    shim = bin_dir / "docker"
+    shim.write_text(SHIM.format(python=sys.executable, log=str(log), images=str(images), containers=str(containers)))
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return str(log)
+
+
+def set_fake_images(log: str, images: list[dict]) -> None:
+    """Replace the fake docker's images, each a dict with tag, created and size."""
+    with open(os.path.join(os.path.dirname(log), "docker-images.json"), "w") as f:
+        json.dump(images, f)
+
+
+def fake_image_tags(log: str) -> list[str]:
+    with open(os.path.join(os.path.dirname(log), "docker-images.json")) as f:
+        return [image["tag"] for image in json.load(f)]
+
+
+def docker_calls(log: str) -> list[list[str]]:
+    with open(log) as f:
+        return [json.loads(line) for line in f if line.strip()]
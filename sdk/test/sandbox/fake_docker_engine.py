@@ -0,0 +1,160 @@
+"""A fake Docker Engine API server on a unix socket, for tests.
+
+It answers the endpoints DockerApiSandboxManager uses. Execs run on the host
+instead of in a container, images a container uses cannot be removed. Every request is recorded as (method, path), and
+the number of accepted connections is counted to check keep-alive reuse.
+"""
+import json
+import os
+import socketserver
+import struct
+import subprocess
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class FakeDockerEngine(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, images: tuple[str, ...] = ("ubuntu:latest",)):
+        self.requests: list[tuple[str, str]] = []
+        # The query of every image pull.
+        self.pulls: list[dict[str, str]] = []
+        self.connections = 0
+        self.containers: set[str] = set()
+        # Image id of every container created.
+        self.container_images: dict[str, str] = {}
+        self.images: dict[str, dict] = {image: _image(0) for image in images}
+        self.execs: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        super().__init__(socket_path, _Handler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def get_request(self):
+        with self.lock:
+            self.connections += 1
+        return super().get_request()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        os.unlink(self.server_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeDockerEngine
+
+    def address_string(self) -> str:
+        return "fake-docker-engine"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        path, query = unquote(url.path), {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        engine = self.server
+        with engine.lock:
+            engine.requests.append((method, path))
+        parts = path.strip("/").split("/")
+
+        if (method, path) == ("POST", "/containers/create"):
+            image = body["Image"]
+            if "@" not in image and ":" not in image.rpartition("/")[2]:
+                image += ":latest"
+            if image not in engine.images:
+                return self._json(404, {"message": f"No such image: {image}"})
+            container_id = uuid.uuid4().hex
+            engine.containers.add(container_id)
+            engine.container_images[container_id] = engine.images[image]["Id"]
+            return self._json(201, {"Id": container_id})
+        if method == "GET" and parts[0] == "containers" and parts[2] == "json":
+            if parts[1] not in engine.containers:
+                return self._json(404, {"message": f"No such container: {parts[1]}"})
+            return self._json(200, {"Id": parts[1], "Image": engine.container_images[parts[1]]})
+        if method == "POST" and parts[0] == "containers" and parts[2] == "start":
+            return self._empty(204)
+        if method == "DELETE" and parts[0] == "containers":
+            found = parts[1] in engine.containers
+            engine.containers.discard(parts[1])
+            return self._empty(204 if found else 404)
+        if method == "POST" and parts[0] == "containers" and parts[2] == "exec":
+            if parts[1] not in engine.containers:
+                return self._json(404, {"message": f"No such container: {parts[1]}"})
+            exec_id = uuid.uuid4().hex
+            engine.execs[exec_id] = dict(body, Running=False, ExitCode=None)
+            return self._json(201, {"Id": exec_id})
+        if method == "POST" and parts[0] == "exec" and parts[2] == "start":
+            return self._start_exec(engine.execs[parts[1]])
+        if method == "GET" and parts[0] == "exec":
+            run = engine.execs[parts[1]]
+            return self._json(200, {"Running": run["Running"], "ExitCode": run["ExitCode"]})
+        if (method, path) == ("POST", "/images/create"):
+            engine.pulls.append(query)
+            reference = f"{query['fromImage']}:{query['tag']}" if "tag" in query else query["fromImage"]
+            engine.images[reference] = _image(0)
+            return self._json(200, {"status": "Downloaded"})
+        if (method, path) == ("POST", "/commit"):
+            image = engine.images[f"{query['repo']}:{query['tag']}"] = _image(1024)
+            return self._json(201, {"Id": image["Id"]})
+        if (method, path) == ("GET", "/images/json"):
+            reference = json.loads(query["filters"])["reference"][0]
+            return self._json(200, [
+                dict(image, RepoTags=[tag]) for tag, image in engine.images.items() if tag.split(":")[0] == reference
+            ])
+        if method == "DELETE" and parts[0] == "images":
+            tag = "/".join(parts[1:])
+            if tag not in engine.images:
+                return self._json(404, {"message": "No such image"})
+            if engine.images[tag].get("Id") in {engine.container_images[c] for c in engine.containers}:
+                return self._json(409, {"message": f"conflict: unable to remove repository reference {tag}"})
+            del engine.images[tag]
+            return self._json(200, [])
+        return self._json(404, {"message": f"Unknown endpoint {method} {path}"})
+
+    def _start_exec(self, run: dict) -> None:
+        env = dict(os.environ, **dict(pair.split("=", 1) for pair in run.get("Env", [])))
+        process = subprocess.run(run["Cmd"], cwd=run.get("WorkingDir"), env=env, capture_output=True)
+        run["ExitCode"] = process.returncode
+        # Like the daemon, stream the output on a connection that is closed afterwards.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.docker.multiplexed-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for stream, data in ((1, process.stdout), (2, process.stderr)):
+            if data:
+                self.wfile.write(struct.pack(">BxxxL", stream, len(data)) + data)
+        self.close_connection = True
+
+    def _json(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def _image(size: int) -> dict:
+    return {"Id": f"sha256:{uuid.uuid4().hex}", "Created": int(time.time()), "Size": size}
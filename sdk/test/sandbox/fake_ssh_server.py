@@ -0,0 +1,109 @@
+"""A paramiko SSH server on localhost, for tests.
+
+It accepts one user and password, runs exec requests on the host with bash
+and counts the connections (transports) and channels it served. Tests can
+drop its connections, at any moment or right after a command ran.
+"""
+import socket
+import subprocess
+import threading
+import paramiko
+
+USER = "river"
+PASSWORD = "river"
+
+_host_key = None
+
+
+def host_key() -> paramiko.RSAKey:
+    # Generating a key takes a moment, share one between servers.
+    global _host_key
+    if _host_key is None:
+        _host_key = paramiko.RSAKey.generate(2048)
+    return _host_key
+
+
+class _Server(paramiko.ServerInterface):
+
+    def __init__(self, ssh_server: 'FakeSSHServer'):
+        self.ssh_server = ssh_server
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        with self.ssh_server.lock:
+            self.ssh_server.channels += 1
+            drop, self.ssh_server.drop_on_exec = self.ssh_server.drop_on_exec, False
+        if drop:
+            # The command runs, but the link drops before the client hears it started.
+            subprocess.run(["bash", "-c", command.decode()], stdin=subprocess.DEVNULL)
+            channel.get_transport().close()
+            return False
+        threading.Thread(target=_run, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+def _run(channel: paramiko.Channel, command: str) -> None:
+    process = subprocess.run(["bash", "-c", command], capture_output=True, stdin=subprocess.DEVNULL)
+    try:
+        channel.sendall(process.stdout)
+        channel.sendall_stderr(process.stderr)
+        channel.send_exit_status(process.returncode)
+    except OSError:
+        # The connection was dropped while the command ran.
+        pass
+    channel.close()
+
+
+class FakeSSHServer:
+    """Serve SSH on a free localhost port until stop()."""
+
+    def __init__(self):
+        self.connections = 0
+        self.channels = 0
+        # Drop the connection of the next exec request once its command ran.
+        self.drop_on_exec = False
+        self.lock = threading.Lock()
+        self._transports: list[paramiko.Transport] = []
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def drop_connections(self) -> None:
+        """Close every open transport, like a dropped link would."""
+        with self.lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def stop(self) -> None:
+        self._socket.close()
+        self.drop_connections()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(client)
+            transport.add_server_key(host_key())
+            transport.start_server(server=_Server(self))
+            with self.lock:
+                self.connections += 1
+                self._transports.append(transport)
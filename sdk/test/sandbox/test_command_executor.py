@@ -1,74 +1,76 @@
 import pytest
 
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
+from paramiko.ssh_exception import SSHException
 from sdk.src.sandbox.command_executor import LocalCommandExecutor, RemoteCommandExecutor
 
 
 class TestLocalCommandExecutor:
-    
-    @pytest.fixture
-    def mock_connection_setup(self):
-        """Setup mock connection for fabric Connection"""
-        with patch('sdk.src.sandbox.command_executor.Connection') as mock_connection:
-            mock_conn_instance = Mock()
-            mock_connection.return_value.__enter__ = Mock(return_value=mock_conn_instance)
-            mock_connection.return_value.__exit__ = Mock(return_value=None)
-            mock_conn_instance.cd.return_value.__enter__ = Mock(return_value=mock_conn_instance)
-            mock_conn_instance.cd.return_value.__exit__ = Mock(return_value=None)
-            
-            yield mock_connection, mock_conn_instance
-    
-    @pytest.fixture
-    def mock_result(self):
-        """Setup mock result for fabric operations"""
-        result = Mock()
-        result.exited = 0
-        result.stdout = "test output"
-        result.stderr = "test error"
-        return result
-    
-    def test_run_calls_fabric_local(self, mock_connection_setup, mock_result):
-        """Test that run correctly creates connection and calls fabric local method"""
-        mock_connection, mock_conn_instance = mock_connection_setup
-        mock_conn_instance.local.return_value = mock_result
-        
-        executor = LocalCommandExecutor()
-        result = executor.run('echo "hello"', cwd='/tmp', env={'KEY': 'value'})
-        
-        # Verify connection was created to localhost
-        mock_connection.assert_called_once_with('localhost')
-        
-        # Verify fabric local was called correctly
-        mock_conn_instance.cd.assert_called_once_with('/tmp')
-        mock_conn_instance.local.assert_called_once_with(
-            'echo "hello"',
-            env={'KEY': 'value'},
-            hide=True,
-            warn=True
-        )
-        
-        assert result == mock_result
-    
-    def test_run_default_cwd(self, mock_connection_setup, mock_result):
-        """Test that run uses '.' as default cwd"""
-        mock_connection, mock_conn_instance = mock_connection_setup
-        mock_conn_instance.local.return_value = mock_result
-        
+
+    def test_run_returns_invoke_result(self):
+        """Test that run returns an invoke Result with output and exit code"""
         executor = LocalCommandExecutor()
-        executor.run('test')
-        
-        mock_conn_instance.cd.assert_called_once_with('.')
-    
-    def test_run_none_result(self, mock_connection_setup):
-        """Test handling when fabric local returns None"""
-        mock_connection, mock_conn_instance = mock_connection_setup
-        mock_conn_instance.local.return_value = None
-        
+        result = executor.run('echo "hello"; echo oops >&2; exit 3')
+
+        assert result.stdout == "hello\n"
+        assert result.stderr == "oops\n"
+        assert result.exited == 3
+        assert not result.ok
+
+    def test_run_cwd_and_env(self, tmp_path):
+        """Test that cwd and env are applied without touching the command"""
         executor = LocalCommandExecutor()
-        result = executor.run('test', cwd='/tmp')
-        
+        result = executor.run('pwd; echo "$KEY"', cwd=str(tmp_path), env={'KEY': 'value; rm -rf /'})
+
+        assert result.ok
+        assert result.stdout == f"{tmp_path}\nvalue; rm -rf /\n"
+        assert result.env == {'KEY': 'value; rm -rf /'}
+
+    def test_run_keeps_current_environment(self, monkeypatch):
+        """Test that env is added to the current environment"""
+        monkeypatch.setenv('RIVER_TEST_OUTER', 'outer')
+        result = LocalCommandExecutor().run('echo "$RIVER_TEST_OUTER $KEY"', env={'KEY': 'inner'})
+
+        assert result.stdout == "outer inner\n"
+
+    def test_run_missing_cwd(self, tmp_path):
+        """Test that a missing cwd fails like a command"""
+        result = LocalCommandExecutor().run('true', cwd=str(tmp_path / "missing"))
+
         assert result.exited == 1
-        assert result.stderr == "Local run returns None, command: test"
+        assert "missing" in result.stderr
+
+
+class FakeChannel:
+    """A paramiko channel whose streams hold the given data and then end."""
+
+    def __init__(self, stdout=b"", stderr=b"", exit_status=0, exec_error=None):
+        self._stdout = [stdout] if stdout else []
+        self._stderr = [stderr] if stderr else []
+        self._exit_status = exit_status
+        self._exec_error = exec_error
+        self.commands = []
+        self.closed = False
+
+    def exec_command(self, command):
+        if self._exec_error is not None:
+            raise self._exec_error
+        self.commands.append(command)
+
+    def shutdown_write(self):
+        pass
+
+    def recv(self, size):
+        return self._stdout.pop(0) if self._stdout else b""
+
+    def recv_stderr(self, size):
+        return self._stderr.pop(0) if self._stderr else b""
+
+    def recv_exit_status(self):
+        return self._exit_status
+
+    def close(self):
+        self.closed = True
 
 
 class TestRemoteCommandExecutor:
@@ -85,15 +87,6 @@ class TestRemoteCommandExecutor:
             
             yield mock_connection, mock_conn_instance
     
-    @pytest.fixture
-    def mock_result(self):
-        """Setup mock result for fabric operations"""
-        result = Mock()
-        result.exited = 0
-        result.stdout = "remote output"
-        result.stderr = "remote error"
-        return result
-    
     def test_init_stores_connection_params(self):
         """Test that RemoteCommandExecutor stores connection parameters"""
         executor = RemoteCommandExecutor('example.com', user='testuser', key_filename='/path/to/key', password='secret', port=2222)
@@ -106,39 +99,95 @@ class TestRemoteCommandExecutor:
             'password': 'secret'
         }
     
-    def test_run_calls_fabric_run(self, mock_connection_setup, mock_result):
-        """Test that run correctly creates connection and calls fabric run method"""
-        mock_connection, mock_conn_instance = mock_connection_setup
-        mock_conn_instance.run.return_value = mock_result
-        
-        executor = RemoteCommandExecutor('example.com', user='testuser', port=2222)
+    def test_run_executes_on_a_pooled_channel(self):
+        """Test that run borrows a pooled connection and runs the command on a new channel"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        channel = FakeChannel(b"remote output", b"remote error", exit_status=0)
+        mock_conn_instance.create_session.return_value = channel
+
+        executor = RemoteCommandExecutor('example.com', user='testuser', port=2222, pool=pool)
         result = executor.run('ls -la', cwd='/home/user', env={'REMOTE_KEY': 'remote_value'})
-        
-        # Verify connection was created with correct parameters
-        mock_connection.assert_called_once_with(
-            host='example.com',
-            user='testuser',
-            port=2222,
-            connect_kwargs={}
-        )
-        
-        # Verify fabric run was called correctly
-        mock_conn_instance.cd.assert_called_once_with('/home/user')
-        mock_conn_instance.run.assert_called_once_with(
-            'ls -la',
-            env={'REMOTE_KEY': 'remote_value'},
-            hide=True,
-            warn=True
-        )
-        
-        assert result == mock_result
-    
-    def test_run_default_cwd(self, mock_connection_setup, mock_result):
-        """Test that run uses '.' as default cwd"""
-        mock_connection, mock_conn_instance = mock_connection_setup
-        mock_conn_instance.run.return_value = mock_result
-        
-        executor = RemoteCommandExecutor('example.com')
-        executor.run('test')
-        
-        mock_conn_instance.cd.assert_called_once_with('.')
\ No newline at end of file
+
+        # Verify the connection was borrowed with correct parameters
+        pool.connection.assert_called_once_with({
+            'host': 'example.com',
+            'user': 'testuser',
+            'port': 2222,
+            'connect_kwargs': {}
+        })
+
+        # Pooled connections are shared so no cd(), cwd and env go into the command
+        mock_conn_instance.cd.assert_not_called()
+        assert channel.commands == ['export REMOTE_KEY=remote_value && cd /home/user && ls -la']
+        assert channel.closed
+        assert (result.stdout, result.stderr, result.exited) == ("remote output", "remote error", 0)
+        assert result.command == 'cd /home/user && ls -la'
+
+    def test_run_default_cwd(self):
+        """Test that run does not change directory without cwd"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        channel = FakeChannel(exit_status=3)
+        mock_conn_instance.create_session.return_value = channel
+
+        executor = RemoteCommandExecutor('example.com', pool=pool)
+        result = executor.run('test')
+
+        assert channel.commands == ['test']
+        assert result.exited == 3
+
+    def test_channel_not_opened_on_dead_transport_is_retried(self):
+        """Test that a pooled connection that died is discarded and the command run on a new one"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        mock_conn_instance.transport.is_active.return_value = False
+        channel = FakeChannel(b"ok")
+        mock_conn_instance.create_session.side_effect = [EOFError(), channel]
+
+        result = RemoteCommandExecutor('example.com', pool=pool).run('true')
+
+        pool.discard.assert_called_once_with(mock_conn_instance)
+        assert pool.connection.call_count == 2
+        assert channel.commands == ['true']
+        assert result.stdout == "ok"
+
+    def test_channel_not_opened_on_live_transport_is_not_retried(self):
+        """Test that a channel refused by a live connection raises, the connection is fine"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        mock_conn_instance.transport.is_active.return_value = True
+        mock_conn_instance.create_session.side_effect = SSHException("administratively prohibited")
+
+        with pytest.raises(SSHException):
+            RemoteCommandExecutor('example.com', pool=pool).run('true')
+
+        pool.discard.assert_not_called()
+        assert mock_conn_instance.create_session.call_count == 1
+
+    def test_channel_is_opened_at_most_twice(self):
+        """Test that a command whose fresh connection fails too raises"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        mock_conn_instance.transport = None
+        mock_conn_instance.create_session.side_effect = [EOFError(), OSError("connection reset")]
+
+        with pytest.raises(OSError, match="connection reset"):
+            RemoteCommandExecutor('example.com', pool=pool).run('true')
+
+        assert mock_conn_instance.create_session.call_count == 2
+
+    def test_started_command_is_not_retried(self):
+        """Test that a connection dropping once the command was sent raises, it may have run"""
+        pool = MagicMock()
+        mock_conn_instance = pool.connection.return_value.__enter__.return_value
+        mock_conn_instance.transport.is_active.return_value = False
+        channel = FakeChannel(exec_error=EOFError())
+        mock_conn_instance.create_session.return_value = channel
+
+        with pytest.raises(EOFError):
+            RemoteCommandExecutor('example.com', pool=pool).run('true')
+
+        pool.discard.assert_not_called()
+        assert mock_conn_instance.create_session.call_count == 1
+        assert channel.closed
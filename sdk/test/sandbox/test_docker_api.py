@@ -0,0 +1,190 @@
+import time
+import pytest
+from river_sdk.journal import RunJournal
+from river_sdk.sandbox.docker_sandbox import BaseDockerSandboxManager, DockerSandboxManager
+from river_sdk.sandbox.docker_api import DockerApiSandboxManager, DockerEngineClient, DockerEngineError
+from river_sdk.sandbox.output import CommandOutput
+from river_sdk.sandbox.snapshot_refs import RunRegistry
+from river_common.shared import Status
+from test.sandbox.fake_docker_engine import FakeDockerEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = FakeDockerEngine(str(tmp_path / "docker.sock"))
+    yield engine
+    engine.stop()
+
+
+@pytest.fixture
+def manager(engine, tmp_path):
+    manager = DockerApiSandboxManager(engine.server_address, registry=RunRegistry(tmp_path))
+    yield manager
+    manager.close()
+
+
+class TestDockerEngineClient:
+
+    def test_connections_are_kept_alive(self, engine):
+        client = DockerEngineClient(engine.server_address)
+
+        for _ in range(5):
+            client.list_images("river-sandbox")
+
+        assert engine.connections == 1
+        client.close()
+
+    def test_error_status_raises(self, engine):
+        client = DockerEngineClient(engine.server_address)
+
+        with pytest.raises(DockerEngineError, match="No such container") as error:
+            client.exec("missing", ["true"], print, print)
+
+        assert error.value.status == 404
+        client.close()
+
+    def test_missing_image_is_pulled(self, engine):
+        client = DockerEngineClient(engine.server_address)
+
+        client.create_container("alpine", ["true"])
+
+        assert ("POST", "/images/create") in engine.requests
+        assert "alpine:latest" in engine.images
+        client.close()
+
+    def test_pulls_split_the_tag_from_registry_ports_and_digests(self, engine):
+        client = DockerEngineClient(engine.server_address)
+
+        for image in ("localhost:5000/app:1.0", "localhost:5000/app", "alpine@sha256:abc"):
+            client.create_container(image, ["true"])
+
+        assert engine.pulls == [
+            {"fromImage": "localhost:5000/app", "tag": "1.0"},
+            {"fromImage": "localhost:5000/app", "tag": "latest"},
+            {"fromImage": "alpine@sha256:abc"},
+        ]
+        client.close()
+
+
+class TestDockerApiSandboxManager:
+
+    def test_manager_has_no_docker_cli_executor(self, manager):
+        assert isinstance(manager, BaseDockerSandboxManager)
+        assert not isinstance(manager, DockerSandboxManager)
+        assert not hasattr(manager, "_executor")
+
+    def test_exec_demultiplexes_output(self, manager):
+        sandbox = manager.create("ubuntu")
+
+        result = sandbox.execute("echo out; echo err >&2; pwd; echo $NAME; exit 3", cwd="/tmp", env={"NAME": "river"})
+
+        assert result.stdout == "out\n/tmp\nriver\n"
+        assert result.stderr == "err\n"
+        assert result.exited == 3
+        assert not result.ok
+
+    def test_container_lifecycle(self, manager, engine):
+        sandbox = manager.create("ubuntu")
+        assert sandbox.id in engine.containers
+
+        manager.destory(sandbox)
+        manager.drain()
+
+        assert sandbox.id not in engine.containers
+        assert ("POST", f"/containers/{sandbox.id}/start") in engine.requests
+
+    def test_lineage_is_the_image_id(self, manager, engine):
+        first = manager.create("ubuntu")
+        engine.images["ubuntu:latest"] = dict(engine.images["ubuntu:latest"], Id="sha256:rebuilt")
+        second = manager.create("ubuntu")
+
+        # Inspected only when read, by a task cache.
+        assert not any(path.endswith("/json") for _, path in engine.requests)
+
+        assert first.lineage == f"image:{engine.container_images[first.id]}"
+        assert second.lineage == "image:sha256:rebuilt"
+
+    def test_snapshot_and_fork(self, manager, engine):
+        class Parent:
+            name = "parent"
+            sandbox = manager.create("ubuntu")
+
+        tag = manager.take_snapshot(Parent.sandbox)
+        forked = manager.fork(Parent)
+
+        assert tag in engine.images
+        assert forked.id in engine.containers and forked.id != Parent.sandbox.id
+        manager.destory(forked)
+        manager.remove_snapshot(tag)
+        manager.drain()
+        assert tag not in engine.images
+
+    def test_snapshot_is_removed_after_its_last_fork(self, manager, engine):
+        class Parent:
+            name = "parent"
+            sandbox = manager.create("ubuntu")
+
+        tag = manager.take_snapshot(Parent.sandbox)
+        manager.retain_snapshot(tag, 1, "river-1")
+        forked = manager.fork(Parent)
+
+        # Its container is still queued for removal when the snapshot is released.
+        manager.destory(forked)
+        manager.release_snapshot(tag)
+        manager.drain()
+
+        assert forked.id not in engine.containers
+        assert tag not in engine.images
+        assert manager._reaper.errors == 0
+
+    def test_image_a_container_uses_is_left_alone(self, manager, engine):
+        class Parent:
+            name = "parent"
+            sandbox = manager.create("ubuntu")
+
+        tag = manager.take_snapshot(Parent.sandbox)
+        manager.fork(Parent)
+
+        manager._client.remove_images([tag])
+
+        assert tag in engine.images
+
+    def test_gc_lists_snapshots_through_the_api(self, manager, engine):
+        engine.images["river-sandbox:old"] = {"Created": 0, "Size": 2048}
+
+        report = manager.collect_garbage(max_age=3600)
+
+        assert report == {"removed": ["river-sandbox:old"], "freed_bytes": 2048, "kept": 0}
+        assert "river-sandbox:old" not in engine.images
+
+    def test_gc_removes_snapshots_only_abandoned_runs_keep(self, manager, engine, tmp_path):
+        now = time.time()
+        engine.images["river-sandbox:abandoned"] = {"Created": now, "Size": 1024}
+        engine.images["river-sandbox:resumable"] = {"Created": now, "Size": 1024}
+        journal = RunJournal(tmp_path / "journal.sqlite")
+        journal.begin("old", "river", "default")
+        journal.end("old", Status.FAILED)
+        journal.keep_snapshot("old", "river-sandbox:abandoned")
+        journal.begin("new", "river", "default")
+        journal.end("new", Status.SUCCESS)
+        journal.begin("other", "other-river", "default")
+        journal.end("other", Status.FAILED)
+        journal.keep_snapshot("other", "river-sandbox:resumable")
+
+        report = manager.collect_garbage(journal=journal)
+
+        assert report["removed"] == ["river-sandbox:abandoned"]
+        assert "river-sandbox:resumable" in engine.images
+        assert journal.kept_snapshots("old") == set()
+        assert journal.kept_snapshots("other") == {"river-sandbox:resumable"}
+        journal.close()
+
+    def test_exec_streams_into_output(self, manager, tmp_path):
+        sandbox = manager.create("ubuntu")
+        output = CommandOutput(limit=64, spill_dir=tmp_path)
+
+        result = sandbox.execute("seq 1 100; echo err >&2", output=output)
+
+        assert result.stdout.splitlines()[-1] == "100"
+        assert result.stderr == "err\n"
+        assert output.stdout.spilled
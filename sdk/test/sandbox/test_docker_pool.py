@@ -0,0 +1,134 @@
+import time
+import pytest
+from unittest.mock import Mock
+from river_sdk.sandbox.docker_pool import ContainerPool, PoolConfig
+from river_sdk.sandbox.docker_sandbox import DockerSandboxManager
+from test.sandbox.fake_docker import install_fake_docker, docker_calls
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class TestPoolConfig:
+
+    @pytest.mark.parametrize("kwargs", [
+        {"min_size": -1},
+        {"max_size": 0},
+        {"min_size": 3, "max_size": 2},
+        {"idle_ttl": 0},
+    ])
+    def test_invalid_config(self, kwargs):
+        with pytest.raises(ValueError):
+            PoolConfig(**kwargs)
+
+
+class TestContainerPool:
+
+    def make_pool(self, **config):
+        counter = iter(range(1000))
+        start = Mock(side_effect=lambda image: f"{image}-{next(counter)}")
+        remove = Mock()
+        pool = ContainerPool(PoolConfig(**config), start=start, remove=remove)
+        return pool, start, remove
+
+    def test_first_take_misses_then_refills(self):
+        pool, start, _ = self.make_pool(min_size=2, max_size=2)
+
+        first = pool.take("ubuntu")
+        wait_for(lambda: pool.stats()["idle"] == 2)
+        second = pool.take("ubuntu")
+
+        stats = pool.stats()
+        assert first != second
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == 0.5
+        pool.close()
+
+    def test_prewarm_makes_first_take_a_hit(self):
+        pool, _, _ = self.make_pool(min_size=1, max_size=1)
+
+        pool.prewarm("ubuntu")
+        wait_for(lambda: pool.stats()["idle"] == 1)
+        pool.take("ubuntu")
+
+        assert pool.stats()["hits"] == 1
+        pool.close()
+
+    def test_refill_respects_max_size(self):
+        pool, start, _ = self.make_pool(min_size=2, max_size=2)
+
+        for _ in range(5):
+            pool.prewarm("ubuntu")
+        wait_for(lambda: pool.stats()["idle"] == 2)
+
+        assert start.call_count == 2
+        pool.close()
+
+    def test_idle_containers_expire(self):
+        pool, _, remove = self.make_pool(min_size=1, max_size=1, idle_ttl=0.05)
+
+        pool.prewarm("ubuntu")
+        wait_for(lambda: pool.stats()["idle"] == 1)
+        wait_for(lambda: pool.stats()["evicted"] == 1)
+
+        remove.assert_called_once_with(["ubuntu-0"])
+        pool.close()
+
+    def test_close_removes_idle_containers(self):
+        pool, _, remove = self.make_pool(min_size=2, max_size=2)
+
+        pool.prewarm("ubuntu")
+        wait_for(lambda: pool.stats()["idle"] == 2)
+        pool.close()
+
+        remove.assert_called_once()
+        assert sorted(remove.call_args.args[0]) == ["ubuntu-0", "ubuntu-1"]
+        assert pool.stats()["idle"] == 0
+
+    def test_failed_refill_is_counted(self):
+        pool = ContainerPool(PoolConfig(min_size=1), start=Mock(side_effect=RuntimeError("no image")), remove=Mock())
+
+        pool.prewarm("missing")
+        wait_for(lambda: pool.stats()["errors"] == 1)
+
+        assert pool.stats()["idle"] == 0
+        pool.close()
+
+
+class TestDockerSandboxManagerPool:
+
+    def test_create_uses_warm_container(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(pool=PoolConfig(min_size=1, max_size=1))
+
+        manager.prewarm("ubuntu")
+        wait_for(lambda: manager.pool_stats()["idle"] == 1)
+        sandbox = manager.create("ubuntu")
+
+        assert manager.pool_stats()["hits"] == 1
+        runs = [call for call in docker_calls(log) if call[0] == "run"]
+        assert runs[0] == ["run", "-d", "ubuntu", "tail", "-f", "/dev/null"]
+        assert sandbox.id
+        manager.close()
+
+    def test_close_removes_warm_containers(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(pool=PoolConfig(min_size=1, max_size=1))
+
+        manager.create("ubuntu")
+        wait_for(lambda: manager.pool_stats()["idle"] == 1)
+        manager.close()
+
+        assert [call[:2] for call in docker_calls(log) if call[0] == "rm"] == [["rm", "-f"]]
+
+    def test_without_pool(self):
+        manager = DockerSandboxManager()
+
+        assert manager.pool_stats() is None
+        manager.close()
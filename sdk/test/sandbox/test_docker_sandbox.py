@@ -82,19 +82,22 @@ class TestDockerSandboxManager:
         mock_executor = Mock()
         manager._executor = mock_executor
 
-        # Mock successful docker run
-        mock_result = Mock()
-        mock_result.stdout = "container_id_123\n"
-        mock_executor.run.return_value = mock_result
+        # Mock successful docker run, then the inspect of the container's image
+        mock_executor.run.side_effect = [
+            Mock(ok=True, stdout="container_id_123\n"),
+            Mock(ok=True, stdout="sha256:abc\n"),
+        ]
 
         result = manager.create(self.image)
 
         mock_executor.run.assert_called_once_with(f"docker run -d {self.image} tail -f /dev/null")
         assert isinstance(result, DockerSandbox)
         assert result.id == "container_id_123"
+        assert result.lineage == "image:sha256:abc"
+        mock_executor.run.assert_called_with("docker inspect --format '{{.Image}}' container_id_123")
 
     def test_destory(self):
-        manager = DockerSandboxManager()
+        manager = DockerSandboxManager(background_teardown=False)
         mock_executor = Mock()
         manager._executor = mock_executor
 
@@ -214,6 +217,6 @@ class TestDockerSandboxManager:
         result = creator_func()
 
         # Verify the creator function calls create with the correct image
-        mock_executor.run.assert_called_once_with(f"docker run -d {image} tail -f /dev/null")
+        mock_executor.run.assert_any_call(f"docker run -d {image} tail -f /dev/null")
         assert isinstance(result, DockerSandbox)
         assert result.id == "created_container_789"
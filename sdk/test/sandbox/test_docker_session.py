@@ -0,0 +1,142 @@
+import threading
+import pytest
+from unittest.mock import Mock
+from river_sdk.sandbox.docker_sandbox import DockerSandbox, DockerSandboxManager
+from river_sdk.sandbox.docker_session import ShellSession, ShellSessionError
+from test.sandbox.fake_docker import install_fake_docker, docker_calls
+
+
+@pytest.fixture
+def fake_docker(tmp_path, monkeypatch):
+    return install_fake_docker(tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def session(fake_docker):
+    session = ShellSession("container_123")
+    yield session
+    session.close()
+
+
+class TestShellSession:
+
+    def test_starts_one_interactive_exec(self, session, fake_docker):
+        session.run("true")
+        session.run("true")
+
+        assert docker_calls(fake_docker) == [["exec", "-i", "container_123", "bash"]]
+
+    def test_run_separates_stdout_and_stderr(self, session):
+        result = session.run("echo out; echo err >&2")
+
+        assert result.ok
+        assert result.stdout == "out\n"
+        assert result.stderr == "err\n"
+
+    def test_run_exit_code(self, session):
+        result = session.run("echo partial; exit 7")
+
+        assert result.exited == 7
+        assert result.stdout == "partial\n"
+
+    def test_cwd_and_env_are_per_command(self, session, tmp_path):
+        first = session.run("pwd; echo $GREETING", cwd=str(tmp_path), env={"GREETING": "hello world"})
+        second = session.run("pwd; echo ${GREETING:-unset}")
+
+        assert first.stdout == f"{tmp_path}\nhello world\n"
+        assert second.stdout == "/\nunset\n"
+
+    def test_state_changes_do_not_leak(self, session):
+        session.run("cd /tmp; export LEAK=1; exit 3")
+
+        assert session.run("pwd; echo ${LEAK:-none}").stdout == "/\nnone\n"
+
+    def test_output_without_trailing_newline_and_large_output(self, session):
+        assert session.run("printf 'no newline'").stdout == "no newline"
+
+        result = session.run("head -c 3000000 /dev/zero | tr '\\\\0' x")
+        assert len(result.stdout) == 3000000
+
+    def test_commands_cannot_read_the_protocol(self, session):
+        result = session.run("cat")
+
+        assert result.ok
+        assert session.run("echo still alive").stdout == "still alive\n"
+
+    def test_scratch_files_are_removed(self, fake_docker, tmp_path, monkeypatch):
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        monkeypatch.setenv("TMPDIR", str(scratch))
+        session = ShellSession("container_123")
+
+        result = session.run("echo out; echo err >&2")
+        session.run("true")
+        session.close()
+
+        assert (result.stdout, result.stderr) == ("out\n", "err\n")
+        assert list(scratch.iterdir()) == []
+
+    def test_dead_session_raises(self, session):
+        session.close()
+
+        with pytest.raises(ShellSessionError):
+            session.run("true")
+
+
+class TestDockerSandboxPersistentShell:
+
+    def test_commands_reuse_one_session(self, fake_docker):
+        sandbox = DockerSandbox("container_123", Mock(), persistent_shell=True)
+
+        results = [sandbox.execute(f"echo {i}", cwd="/tmp") for i in range(5)]
+        sandbox.close_sessions()
+
+        assert [r.stdout for r in results] == [f"{i}\n" for i in range(5)]
+        assert docker_calls(fake_docker) == [["exec", "-i", "container_123", "bash"]]
+
+    def test_concurrent_commands_get_their_own_sessions(self, fake_docker):
+        sandbox = DockerSandbox("container_123", Mock(), persistent_shell=True)
+        barrier = threading.Barrier(2, timeout=5)
+        results = []
+
+        def run():
+            barrier.wait()
+            results.append(sandbox.execute("sleep 0.2; echo done"))
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sandbox.close_sessions()
+
+        assert [r.stdout for r in results] == ["done\n", "done\n"]
+        assert len(docker_calls(fake_docker)) == 2
+
+    def test_broken_session_falls_back_to_docker_exec(self, fake_docker):
+        executor = Mock()
+        sandbox = DockerSandbox("container_123", executor, persistent_shell=True)
+        sandbox.execute("true")
+        sandbox._idle_sessions[0].close()
+
+        sandbox.execute("echo fallback", cwd="/tmp")
+
+        executor.run.assert_called_once_with("docker exec -w /tmp container_123 bash -c 'echo fallback'")
+        assert sandbox._idle_sessions == []
+
+    def test_session_dying_mid_command_fails_without_running_it_again(self, fake_docker, tmp_path):
+        executor = Mock()
+        sandbox = DockerSandbox("container_123", executor, persistent_shell=True)
+        counter = tmp_path / "counter"
+
+        # The command's parent is the session's shell.
+        with pytest.raises(ShellSessionError, match="ended before the command finished"):
+            sandbox.execute(f"echo ran >> {counter}; kill -9 $PPID; sleep 0.2")
+
+        assert counter.read_text() == "ran\n"
+        executor.run.assert_not_called()
+        assert sandbox._idle_sessions == []
+
+    def test_manager_rejects_remote_persistent_shell(self):
+        with pytest.raises(ValueError, match="need a local docker CLI"):
+            DockerSandboxManager("remote.example.com", persistent_shell=True)
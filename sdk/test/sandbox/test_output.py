@@ -0,0 +1,286 @@
+import asyncio
+import os
+import pytest
+from river_sdk.job import Job
+from river_sdk.river import River
+from river_sdk.task import bash, TaskExecutionError
+from river_sdk.task_logs import collect_task_logs
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+from river_sdk.sandbox.command_executor import AsyncLocalCommandExecutor, LocalCommandExecutor
+from river_sdk.sandbox.docker_session import ShellSession
+from river_sdk.sandbox.output import CommandOutput, OutputBuffer, OutputTruncatedError, StreamingResult
+from river_common.shared import Status
+from test.sandbox.fake_docker import install_fake_docker
+from unittest.mock import Mock
+
+
+class TestOutputBuffer:
+
+    def test_keeps_only_the_last_bytes_without_spill_path(self):
+        buffer = OutputBuffer(limit=8)
+
+        buffer.write(b"0123456789")
+        buffer.write(b"abc")
+
+        assert buffer.getvalue() == "56789abc"
+        assert buffer.size == 13
+        assert buffer.truncated and not buffer.spilled
+
+    def test_spills_everything_once_over_the_limit(self, tmp_path):
+        buffer = OutputBuffer(limit=8, spill_path=tmp_path / "task.stdout")
+
+        buffer.write(b"0123")
+        assert not buffer.spilled
+        buffer.write(b"456789")
+        buffer.write(b"abc")
+        buffer.close()
+
+        assert buffer.spilled and not buffer.truncated
+        assert buffer.getvalue() == "0123456789abc"
+        assert (tmp_path / "task.stdout").read_bytes() == b"0123456789abc"
+        assert buffer.tail(1) == "56789abc"
+
+    def test_retain_reads_the_spill_file_back(self, tmp_path):
+        buffer = OutputBuffer(limit=8, spill_path=tmp_path / "task.stdout")
+        buffer.write(b"0123456789abc")
+        buffer.close()
+
+        assert buffer.retain()
+
+        assert not (tmp_path / "task.stdout").exists()
+        assert not buffer.spilled and not buffer.truncated
+        assert buffer.getvalue() == "0123456789abc"
+
+    def test_retain_keeps_large_spill_files(self, tmp_path):
+        buffer = OutputBuffer(limit=8, spill_path=tmp_path / "task.stdout")
+        buffer.write(b"0123456789abc")
+        buffer.close()
+
+        assert not buffer.retain(max_bytes=10)
+
+        assert (tmp_path / "task.stdout").exists()
+        assert buffer.getvalue() == "0123456789abc"
+
+    def test_removed_spill_file_raises(self, tmp_path):
+        buffer = OutputBuffer(limit=8, spill_path=tmp_path / "task.stdout")
+        buffer.write(b"0123456789abc")
+        buffer.close()
+
+        (tmp_path / "task.stdout").unlink()
+
+        assert buffer.truncated
+        with pytest.raises(OutputTruncatedError, match="last 8 of 13 bytes"):
+            buffer.getvalue()
+
+    def test_lines_are_handed_over_as_they_complete(self):
+        lines = []
+        buffer = OutputBuffer(on_line=lines.append)
+
+        buffer.write(b"one\ntw")
+        assert lines == ["one"]
+        buffer.write(b"o\nthree")
+        buffer.close()
+
+        assert lines == ["one", "two", "three"]
+
+    def test_tail_returns_last_lines(self):
+        buffer = OutputBuffer()
+        buffer.write(b"".join(f"line {i}\n".encode() for i in range(100)))
+
+        assert buffer.tail(2) == "line 98\nline 99"
+
+
+class TestStreamingExecutors:
+
+    def test_local_executor_streams_and_spills(self, tmp_path):
+        lines = []
+        output = CommandOutput(limit=1024, spill_dir=tmp_path, name="task", on_line=lambda *line: lines.append(line))
+
+        result = LocalCommandExecutor().run("seq 1 2000; echo done >&2", env={"A": "1"}, output=output)
+
+        assert isinstance(result, StreamingResult)
+        assert result.ok
+        assert result.stdout.splitlines() == [str(i) for i in range(1, 2001)]
+        assert result.stderr == "done\n"
+        assert result.log_files == [str(tmp_path / "task.stdout")]
+        assert len(lines) == 2001 and ("stderr", "done") in lines
+
+    def test_async_executor_streams(self, tmp_path):
+        output = CommandOutput(limit=16, spill_dir=tmp_path)
+
+        result = asyncio.run(AsyncLocalCommandExecutor().run("seq 1 100; exit 2", output=output))
+
+        assert result.exited == 2
+        assert result.stdout.splitlines()[-1] == "100"
+        assert output.stdout.spilled
+
+    def test_shell_session_copies_into_output(self, tmp_path, monkeypatch):
+        install_fake_docker(tmp_path, monkeypatch)
+        session = ShellSession("container_123")
+        output = CommandOutput(limit=64, spill_dir=tmp_path)
+
+        result = session.run("seq 1 100; echo err >&2", output=output)
+        session.close()
+
+        assert result.stdout.splitlines()[-1] == "100"
+        assert result.stderr == "err\n"
+        assert output.stdout.spilled
+
+
+class LogJob(Job):
+    def __init__(self, name: str, command: str, lines: list):
+        super().__init__(name)
+        self.command = command
+        self.lines = lines
+
+    def main(self):
+        return bash(self.command, on_line=lambda stream, line: self.lines.append(line))
+
+
+class ManyLogsJob(Job):
+    """Runs the commands and returns the results at the `kept` positions."""
+
+    def __init__(self, name: str, commands: list[str], kept: list[int]):
+        super().__init__(name)
+        self.commands = commands
+        self.kept = kept
+
+    def main(self):
+        results = [bash(command) for command in self.commands]
+        return [results[i] for i in self.kept]
+
+
+def retained_bytes(results: list[StreamingResult]) -> int:
+    return sum(
+        buffer.size for result in results for buffer in (result.output.stdout, result.output.stderr)
+        if not buffer.spilled
+    )
+
+
+class TestStreamingBash:
+
+    def test_bash_streams_lines(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        lines = []
+        job = LogJob("log", "echo one; echo two", lines)
+
+        River("test-river", Mock(spec=BaseSandboxManager), {"default": job}).flow()
+
+        assert job.status == Status.SUCCESS
+        assert lines == ["one", "two"]
+        assert job.result.stdout == "one\ntwo\n"
+
+    def test_error_has_only_the_tail(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        job = LogJob("log", "seq 1 300000; exit 1", [])
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": job})
+
+        river.flow()
+
+        assert job.status == Status.FAILED
+        assert isinstance(job.error, TaskExecutionError)
+        assert job.error.stdout.splitlines() == [str(i) for i in range(299981, 300001)]
+        assert len(str(job.error)) < 1000
+        log_file, = job.error.log_files
+        assert log_file.startswith(str(tmp_path / "logs" / river.run_id / job.id))
+        with open(log_file) as f:
+            assert sum(1 for _ in f) == 300000
+
+    def test_logs_are_removed_when_the_job_succeeds(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        removed = LogJob("removed", "seq 1 300000", [])
+        kept = LogJob("kept", "seq 1 300000", [])
+        kept.keep_task_logs = True
+
+        rivers = [River("test-river", Mock(spec=BaseSandboxManager), {"default": job}) for job in (removed, kept)]
+        for river in rivers:
+            river.flow()
+
+        assert (removed.status, kept.status) == (Status.SUCCESS, Status.SUCCESS)
+        assert not (tmp_path / "logs" / rivers[0].run_id).exists()
+        assert (tmp_path / "logs" / rivers[1].run_id / kept.id).exists()
+        assert not removed.result.output.stdout.truncated
+        assert removed.result.stdout.count("\n") == 300000
+        assert kept.result.stdout.count("\n") == 300000
+        assert kept.result.log_files
+
+    def test_logs_too_large_to_retain_are_kept(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        job = LogJob("large", "seq 1 300000", [])
+        job.max_retained_output = 1 << 20
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": job})
+
+        river.flow()
+
+        assert job.status == Status.SUCCESS
+        assert (tmp_path / "logs" / river.run_id / job.id).exists()
+        assert job.result.stdout.count("\n") == 300000
+
+    def test_retained_output_is_bounded_for_the_whole_job(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        job = ManyLogsJob("many", ["seq 1 300000"] * 3, kept=[0, 1, 2])
+        job.max_retained_output = 5 << 20
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": job})
+
+        river.flow()
+
+        assert job.status == Status.SUCCESS
+        assert [result.output.stdout.spilled for result in job.result] == [False, False, True]
+        assert retained_bytes(job.result) <= job.max_retained_output
+        assert (tmp_path / "logs" / river.run_id / job.id).exists()
+        assert all(result.stdout.count("\n") == 300000 for result in job.result)
+
+    def test_output_of_dropped_results_is_not_retained(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        job = ManyLogsJob("many", ["seq 1 300000"] * 3, kept=[0, 2])
+        job.max_retained_output = 5 << 20
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": job})
+
+        river.flow()
+
+        assert job.status == Status.SUCCESS
+        assert retained_bytes(job.result) == 2 * len("".join(f"{i}\n" for i in range(1, 300001)))
+        assert not (tmp_path / "logs" / river.run_id).exists()
+
+    def test_flows_with_the_same_job_ids_keep_their_own_logs(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        jobs = [LogJob("failing", "seq 1 300000; exit 1", []) for _ in range(2)]
+        rivers = [
+            River("test-river", Mock(spec=BaseSandboxManager), {"default": job}, deterministic_ids=True)
+            for job in jobs
+        ]
+        for river in rivers:
+            river.flow()
+
+        assert jobs[0].id == jobs[1].id
+        for river, job in zip(rivers, jobs):
+            log_file, = job.error.log_files
+            assert log_file.startswith(str(tmp_path / "logs" / river.run_id / job.id))
+        assert jobs[0].error.log_files != jobs[1].error.log_files
+
+    def test_gc_removes_logs_by_age(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        run = tmp_path / "logs" / "run"
+        old, new = run / "old-job", run / "new-job"
+        # Written before logs were keyed by run.
+        unkeyed = tmp_path / "logs" / "unkeyed-job"
+        for directory in (old, new, unkeyed):
+            directory.mkdir(parents=True)
+            (directory / "task.stdout").write_text("output")
+        os.utime(old / "task.stdout", (1, 1))
+        os.utime(unkeyed / "task.stdout", (1, 1))
+
+        assert collect_task_logs(3600, dry_run=True) == [old, unkeyed]
+        assert old.exists()
+        assert collect_task_logs(3600) == [old, unkeyed]
+        assert not old.exists() and not unkeyed.exists() and new.exists()
+
+    def test_gc_removes_emptied_run_directories(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("RIVER_HOME", str(tmp_path))
+        job = tmp_path / "logs" / "run" / "job"
+        job.mkdir(parents=True)
+        (job / "task.stdout").write_text("output")
+        os.utime(job / "task.stdout", (1, 1))
+
+        assert collect_task_logs(3600) == [job]
+        assert list((tmp_path / "logs").iterdir()) == []
@@ -0,0 +1,148 @@
+import gc
+import threading
+import weakref
+import pytest
+from unittest.mock import Mock
+from river_sdk.river import River
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+from river_sdk.sandbox.docker_sandbox import DockerSandboxManager
+from river_sdk.sandbox.reaper import TeardownReaper
+from river_sdk.sandbox.snapshot_refs import RunRegistry
+from test.sandbox.fake_docker import install_fake_docker, docker_calls
+from test.test_scheduler import CallbackJob
+
+
+class BlockingRemover:
+    """Records removals, the first one blocks until released."""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, container_ids):
+        self.started.set()
+        self.release.wait(5)
+        self.batches.append(container_ids)
+
+
+class TestTeardownReaper:
+
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError, match="Invalid reaper size"):
+            TeardownReaper(Mock(), max_batch=0)
+
+    def test_removals_queued_meanwhile_are_batched(self):
+        remover = BlockingRemover()
+        reaper = TeardownReaper(remover, max_batch=2)
+
+        reaper.submit("a")
+        assert remover.started.wait(5)
+        for container_id in ("b", "c", "d"):
+            reaper.submit(container_id)
+        remover.release.set()
+        reaper.drain()
+
+        assert remover.batches == [["a"], ["b", "c"], ["d"]]
+        reaper.close()
+
+    def test_images_are_removed_after_the_containers_queued_before(self):
+        remover = BlockingRemover()
+        reaper = TeardownReaper(remover, remover)
+
+        reaper.submit("a")
+        assert remover.started.wait(5)
+        reaper.submit_image("snapshot")
+        reaper.submit("b")
+        remover.release.set()
+        reaper.drain()
+
+        assert remover.batches == [["a"], ["b"], ["snapshot"]]
+        reaper.close()
+
+    def test_images_need_an_image_remover(self):
+        reaper = TeardownReaper(Mock())
+        with pytest.raises(ValueError, match="does not remove images"):
+            reaper.submit_image("snapshot")
+        reaper.close()
+
+    def test_failed_removal_does_not_stop_the_reaper(self):
+        remove = Mock(side_effect=[RuntimeError("docker is gone"), None])
+        reaper = TeardownReaper(remove)
+
+        reaper.submit("a")
+        reaper.drain()
+        reaper.submit("b")
+        reaper.drain()
+
+        assert reaper.errors == 1
+        assert remove.call_count == 2
+        reaper.close()
+
+    def test_close_removes_pending_and_later_submits_run_inline(self):
+        remover = BlockingRemover()
+        reaper = TeardownReaper(remover)
+        reaper.submit("a")
+        assert remover.started.wait(5)
+        reaper.submit("b")
+
+        remover.release.set()
+        reaper.close()
+        reaper.submit("c")
+
+        assert [container_id for batch in remover.batches for container_id in batch] == ["a", "b", "c"]
+
+
+class TestBackgroundTeardown:
+
+    def test_destory_batches_docker_rm(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        sandboxes = [manager.create("ubuntu") for _ in range(3)]
+
+        for sandbox in sandboxes:
+            manager.destory(sandbox)
+        manager.drain()
+
+        removals = [call for call in docker_calls(log) if call[0] == "rm"]
+        assert all(call[1] == "-f" for call in removals)
+        assert sorted(id for call in removals for id in call[2:]) == sorted(s.id for s in sandboxes)
+        assert not any(call[0] == "stop" for call in docker_calls(log))
+        manager.close()
+
+    def test_foreground_teardown(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path), background_teardown=False)
+        sandbox = manager.create("ubuntu")
+
+        manager.destory(sandbox)
+
+        assert docker_calls(log)[1:] == [["stop", "-t", "0", sandbox.id], ["rm", sandbox.id]]
+
+    def test_close_releases_the_exit_hook_and_worker(self, tmp_path):
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        reaper, worker = weakref.ref(manager._reaper), manager._reaper._worker
+
+        manager.close()
+        del manager
+        gc.collect()
+
+        # The atexit hook would keep the reaper alive.
+        assert reaper() is None
+        assert not worker.is_alive()
+
+    def test_flow_drains_the_manager(self):
+        manager = Mock(spec=BaseSandboxManager)
+
+        River("test-river", manager, {"default": CallbackJob("a")}).flow()
+
+        manager.drain.assert_called_once_with()
+
+    def test_failed_flow_still_drains(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.begin_river.side_effect = KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            River("test-river", manager, {"default": CallbackJob("a")}).flow()
+
+        manager.drain.assert_called_once_with()
@@ -0,0 +1,187 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import Mock
+from river_sdk.sandbox.docker_sandbox import DockerSandboxManager
+from river_sdk.sandbox.snapshot_refs import RunRegistry, SnapshotReferences
+from test.sandbox.fake_docker import install_fake_docker, docker_calls, set_fake_images, fake_image_tags
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def image(tag: str, age: float, size: int = 1024) -> dict:
+    created = time.strftime("%Y-%m-%dT%H:%M:%S.000000000Z", time.gmtime(time.time() - age))
+    return {"tag": tag, "created": created, "size": size}
+
+
+class TestSnapshotReferences:
+
+    def test_release_reports_last_reference(self):
+        references = SnapshotReferences()
+        references.retain("river-sandbox:a", 2)
+
+        assert references.release("river-sandbox:a") is False
+        assert "river-sandbox:a" in references
+        assert references.release("river-sandbox:a") is True
+        assert "river-sandbox:a" not in references
+
+    def test_unknown_snapshot_is_never_released(self):
+        assert SnapshotReferences().release("river-sandbox:unknown") is False
+
+
+class TestRunRegistry:
+
+    def test_records_snapshots_of_a_run(self, tmp_path):
+        registry = RunRegistry(tmp_path)
+        registry.begin("river-1", "localhost")
+        registry.add_snapshot("river-1", "river-sandbox:a")
+        registry.add_snapshot("river-1", "river-sandbox:b")
+        registry.remove_snapshot("river-1", "river-sandbox:a")
+
+        runs = registry.runs("localhost")
+
+        assert runs["river-1"]["snapshots"] == ["river-sandbox:b"]
+        assert runs["river-1"]["alive"] is True
+        assert registry.runs("other-host") == {}
+
+    def test_end_forgets_the_run(self, tmp_path):
+        registry = RunRegistry(tmp_path)
+        registry.begin("river-1", "localhost")
+        registry.end("river-1")
+
+        assert registry.runs("localhost") == {}
+
+    def test_run_of_a_dead_process_is_not_alive(self, tmp_path):
+        registry = RunRegistry(tmp_path)
+        registry._write("river-1", {"pid": dead_pid(), "host": "localhost", "snapshots": []})
+
+        assert registry.runs("localhost")["river-1"]["alive"] is False
+
+
+class TestDockerSandboxManagerSnapshots:
+
+    def test_snapshot_is_removed_after_last_release(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        manager.begin_river("river-1")
+        sandbox = manager.create("ubuntu")
+        tag = manager.take_snapshot(sandbox)
+        manager.retain_snapshot(tag, 2, "river-1")
+
+        manager.release_snapshot(tag)
+        manager.drain()
+        assert fake_image_tags(log) == [tag]
+        manager.release_snapshot(tag)
+        manager.drain()
+
+        assert fake_image_tags(log) == []
+        assert ["rmi", tag] in docker_calls(log)
+        assert manager._registry.runs("localhost")["river-1"]["snapshots"] == []
+
+    def test_snapshot_is_removed_after_its_last_fork(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        monkeypatch.setenv("FAKE_DOCKER_RM_DELAY", "0.5")
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        manager.begin_river("river-1")
+        parent = Mock(sandbox=manager.create("ubuntu"))
+        tag = manager.take_snapshot(parent.sandbox)
+        manager.retain_snapshot(tag, 1, "river-1")
+        forked = manager.fork(parent)
+
+        # Its container is still queued for removal when the snapshot is released.
+        manager.destory(forked)
+        manager.release_snapshot(tag)
+        manager.drain()
+
+        calls = docker_calls(log)
+        assert fake_image_tags(log) == []
+        assert calls.index(["rmi", tag]) > calls.index(["rm", "-f", forked.id])
+        manager.close()
+
+    def test_image_a_container_uses_is_not_removed(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path), background_teardown=False)
+        parent = Mock(sandbox=manager.create("ubuntu"))
+        tag = manager.take_snapshot(parent.sandbox)
+        forked = manager.fork(parent)
+
+        manager.remove_snapshot(tag)
+        assert fake_image_tags(log) == [tag]
+        manager.destory(forked)
+        manager.remove_snapshot(tag)
+
+        assert fake_image_tags(log) == []
+
+    def test_gc_removes_snapshots_of_crashed_runs(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        registry = RunRegistry(tmp_path)
+        registry._write("crashed", {"pid": dead_pid(), "host": "localhost", "snapshots": ["river-sandbox:old"]})
+        registry.begin("running", "localhost")
+        registry.add_snapshot("running", "river-sandbox:live")
+        set_fake_images(log, [image("river-sandbox:old", 60), image("river-sandbox:live", 60)])
+
+        report = DockerSandboxManager(registry=registry).collect_garbage()
+
+        assert report["removed"] == ["river-sandbox:old"]
+        assert fake_image_tags(log) == ["river-sandbox:live"]
+        assert list(registry.runs("localhost")) == ["running"]
+
+    def test_gc_applies_age_and_size_limits(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        set_fake_images(log, [
+            image("river-sandbox:ancient", 10 * 86400),
+            image("river-sandbox:older", 3600, size=300),
+            image("river-sandbox:newer", 60, size=300),
+        ])
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+
+        report = manager.collect_garbage(max_age=86400, max_size=400)
+
+        assert report["removed"] == ["river-sandbox:ancient", "river-sandbox:older"]
+        assert report["freed_bytes"] == 1024 + 300
+        assert fake_image_tags(log) == ["river-sandbox:newer"]
+
+    def test_gc_dry_run_removes_nothing(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        set_fake_images(log, [image("river-sandbox:ancient", 10 * 86400)])
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+
+        report = manager.collect_garbage(max_age=86400, dry_run=True)
+
+        assert report["removed"] == ["river-sandbox:ancient"]
+        assert fake_image_tags(log) == ["river-sandbox:ancient"]
+
+
+class TestDockerSandboxManagerHandOver:
+
+    def test_fork_takes_over_handed_container(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        job = Mock(sandbox=manager.create("ubuntu"))
+
+        assert manager.hand_over(job.sandbox, "river-1")
+        forked = manager.fork(job)
+
+        assert forked is job.sandbox
+        assert [call[0] for call in docker_calls(log)] == ["run"]
+        manager.end_river("river-1")
+        assert [call[0] for call in docker_calls(log)] == ["run"]
+
+    def test_unclaimed_container_is_removed(self, tmp_path, monkeypatch):
+        log = install_fake_docker(tmp_path, monkeypatch)
+        manager = DockerSandboxManager(registry=RunRegistry(tmp_path))
+        reclaimed, leftover = manager.create("ubuntu"), manager.create("ubuntu")
+        manager.hand_over(reclaimed, "river-1")
+        manager.hand_over(leftover, "river-1")
+
+        manager.reclaim(reclaimed)
+        manager.end_river("river-1")
+        manager.drain()
+
+        removed = [id for call in docker_calls(log) if call[0] == "rm" for id in call[2:]]
+        assert sorted(removed) == sorted([reclaimed.id, leftover.id])
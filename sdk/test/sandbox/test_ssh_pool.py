@@ -0,0 +1,128 @@
+import threading
+import time
+import pytest
+from paramiko.ssh_exception import SSHException
+from river_sdk.sandbox.command_executor import RemoteCommandExecutor
+from river_sdk.sandbox.output import CommandOutput
+from river_sdk.sandbox.ssh_pool import SSHConnectionPool
+from test.sandbox.fake_ssh_server import FakeSSHServer, USER, PASSWORD
+
+
+@pytest.fixture
+def server():
+    server = FakeSSHServer()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def pool():
+    pool = SSHConnectionPool(max_channels=4)
+    yield pool
+    pool.close()
+
+
+def executor(server: FakeSSHServer, pool: SSHConnectionPool) -> RemoteCommandExecutor:
+    return RemoteCommandExecutor("127.0.0.1", user=USER, password=PASSWORD, port=server.port, pool=pool)
+
+
+class TestSSHConnectionPool:
+
+    def test_invalid_max_channels(self):
+        with pytest.raises(ValueError, match="max_channels must be at least 1"):
+            SSHConnectionPool(max_channels=0)
+
+    def test_commands_reuse_one_connection(self, server, pool):
+        remote = executor(server, pool)
+
+        results = [remote.run(f"echo {i}") for i in range(5)]
+
+        assert [result.stdout for result in results] == [f"{i}\n" for i in range(5)]
+        assert server.connections == 1
+        assert server.channels == 5
+
+    def test_cwd_env_and_exit_code(self, server, pool):
+        result = executor(server, pool).run("pwd; echo $NAME >&2; exit 3", cwd="/tmp", env={"NAME": "river"})
+
+        assert result.stdout == "/tmp\n"
+        assert result.stderr == "river\n"
+        assert result.exited == 3
+
+    def test_streaming_run_reads_the_channel(self, server, pool, tmp_path):
+        lines = []
+        output = CommandOutput(limit=64, spill_dir=tmp_path, on_line=lambda stream, line: lines.append(line))
+
+        result = executor(server, pool).run("seq 1 100; exit 4", cwd="/tmp", env={"A": "1"}, output=output)
+
+        assert result.exited == 4
+        assert result.stdout.splitlines()[-1] == "100"
+        assert lines == [str(i) for i in range(1, 101)]
+        assert server.connections == 1
+
+    def test_concurrent_commands_share_connections(self, server, pool):
+        remote = executor(server, pool)
+        results = []
+
+        def run():
+            results.append(remote.run("sleep 0.2; echo done"))
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [result.stdout for result in results] == ["done\n"] * 8
+        # Four channels per connection, commands coming while one connects wait for it.
+        assert server.connections == 2
+        assert pool.opened == server.connections
+
+    def test_reconnects_after_dropped_link(self, server, pool):
+        remote = executor(server, pool)
+        remote.run("true")
+
+        server.drop_connections()
+        time.sleep(0.1)
+        result = remote.run("echo again")
+
+        assert result.stdout == "again\n"
+        assert server.connections == 2
+
+    @pytest.mark.parametrize("streaming", [False, True])
+    def test_commands_are_not_run_again_when_the_link_drops(self, server, pool, tmp_path, streaming):
+        runs = tmp_path / "runs"
+        remote = executor(server, pool)
+        remote.run("true")
+        output = CommandOutput(spill_dir=tmp_path) if streaming else None
+
+        server.drop_on_exec = True
+        with pytest.raises((EOFError, OSError, SSHException)):
+            remote.run(f"echo run >> {runs}", output=output)
+
+        assert runs.read_text() == "run\n"
+        assert server.connections == 1
+
+    def test_a_running_command_ends_when_the_link_drops(self, server, pool, tmp_path):
+        runs = tmp_path / "runs"
+        remote = executor(server, pool)
+        remote.run("true")
+        dropper = threading.Timer(0.2, server.drop_connections)
+        dropper.start()
+
+        result = remote.run(f"echo run >> {runs}; sleep 0.5")
+
+        dropper.join()
+        time.sleep(0.6)
+        assert result.exited == -1
+        assert runs.read_text() == "run\n"
+
+    def test_idle_connections_are_replaced(self, server):
+        pool = SSHConnectionPool(idle_timeout=0.05)
+        remote = executor(server, pool)
+        remote.run("true")
+
+        time.sleep(0.1)
+        remote.run("true")
+
+        assert server.connections == 2
+        pool.close()
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import Mock
+from river_sdk.job import Job, AsyncJob, get_current_job
+from river_sdk.river import River, get_current_river
+from river_sdk.task import abash, aparallel, parallel, TaskExecutionError
+from river_sdk.sandbox.base_sandbox import BaseSandbox, BaseSandboxManager
+from river_sdk.sandbox.command_executor import AsyncLocalCommandExecutor
+from river_common.shared import Status
+from test.helpers import make_river
+
+
+class BashJob(AsyncJob):
+    def __init__(self, name: str, command: str, upstreams=None, sandbox_creator=None):
+        super().__init__(name, sandbox_creator=sandbox_creator, upstreams=upstreams)
+        self.command = command
+
+    async def main(self):
+        result = await abash(self.command)
+        return result.stdout.strip()
+
+
+class SyncJob(Job):
+    def __init__(self, name: str, upstreams=None):
+        super().__init__(name, upstreams=upstreams)
+
+    def main(self):
+        return self.name
+
+
+class TestAsyncLocalCommandExecutor:
+
+    def test_run_success(self):
+        result = asyncio.run(AsyncLocalCommandExecutor().run("echo $GREETING; pwd", cwd="/tmp", env={"GREETING": "hi"}))
+
+        assert result.ok
+        assert result.stdout == "hi\n/tmp\n"
+        assert result.command == "echo $GREETING; pwd"
+
+    def test_run_failure(self):
+        result = asyncio.run(AsyncLocalCommandExecutor().run("echo oops >&2; exit 3"))
+
+        assert not result.ok
+        assert result.exited == 3
+        assert result.stderr == "oops\n"
+
+    def test_cancel_kills_process(self):
+        async def cancel_sleep():
+            task = asyncio.create_task(AsyncLocalCommandExecutor().run("sleep 10"))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        start = time.monotonic()
+        asyncio.run(cancel_sleep())
+        assert time.monotonic() - start < 5
+
+
+class TestAsyncFlow:
+
+    def test_async_jobs_share_the_event_loop(self):
+        branches = [BashJob(f"job-{i}", "sleep 0.5; echo done") for i in range(4)]
+        outlet = SyncJob("outlet", upstreams=branches)
+
+        start = time.monotonic()
+        asyncio.run(make_river(outlet, max_parallel_jobs=4).aflow())
+
+        assert time.monotonic() - start < 1.5
+        assert [job.result for job in branches] == ["done"] * 4
+        assert outlet.status == Status.SUCCESS
+
+    def test_async_job_failure_skips_downstream(self):
+        a = BashJob("a", "exit 1")
+        b = BashJob("b", "echo b", upstreams=[a])
+
+        asyncio.run(make_river(b).aflow())
+
+        assert a.status == Status.FAILED
+        assert isinstance(a.error, TaskExecutionError)
+        assert b.status == Status.SKIPPED
+
+    def test_contexts_in_async_job(self):
+        seen = {}
+
+        class ContextJob(AsyncJob):
+            async def main(self):
+                await asyncio.sleep(0)
+                seen[self.name] = (get_current_job().name, get_current_river().name)
+
+        jobs = [ContextJob("a"), ContextJob("b")]
+        outlet = SyncJob("outlet", upstreams=jobs)
+
+        asyncio.run(make_river(outlet, name="async-river", max_parallel_jobs=2).aflow())
+
+        assert seen == {"a": ("a", "async-river"), "b": ("b", "async-river")}
+
+    def test_async_job_in_blocking_flow(self):
+        a = BashJob("a", "echo from-async")
+
+        make_river(a).flow()
+
+        assert a.status == Status.SUCCESS
+        assert a.result == "from-async"
+
+    def test_async_job_uses_sandbox_aexecute(self):
+        sandbox = Mock(spec=BaseSandbox)
+        sandbox.streams_output = False
+        sandbox.lineage = None
+
+        async def aexecute(command, cwd=None, env=None):
+            return Mock(ok=True, stdout="in sandbox\n")
+        sandbox.aexecute = aexecute
+        manager = Mock(spec=BaseSandboxManager)
+        a = BashJob("a", "echo ignored", sandbox_creator=Mock(return_value=sandbox))
+        river = River("async-river", manager, {"default": a})
+
+        asyncio.run(river.aflow())
+
+        assert a.result == "in sandbox"
+        manager.take_snapshot.assert_not_called()
+        manager.destory.assert_called_once_with(sandbox)
+
+
+class TestParallelTasks:
+
+    def run_job(self, main, max_parallel_tasks=4):
+        class ParallelJob(Job):
+            def main(self):
+                return main()
+
+        job = ParallelJob("parallel")
+        job.max_parallel_tasks = max_parallel_tasks
+        make_river(job).flow()
+        return job
+
+    def test_parallel_returns_results_in_order(self):
+        job = self.run_job(lambda: [r.stdout.strip() for r in parallel([
+            "sleep 0.2; echo a",
+            {"command": "echo $X", "env": {"X": "b"}},
+            "echo c",
+        ])])
+
+        assert job.status == Status.SUCCESS
+        assert job.result == ["a", "b", "c"]
+
+    def test_parallel_runs_tasks_concurrently(self):
+        start = time.monotonic()
+        job = self.run_job(lambda: parallel(["sleep 0.5"] * 4))
+
+        assert job.status == Status.SUCCESS
+        assert time.monotonic() - start < 1.5
+
+    def test_parallel_honors_job_task_limit(self):
+        start = time.monotonic()
+        job = self.run_job(lambda: parallel(["sleep 0.3"] * 4), max_parallel_tasks=1)
+
+        assert job.status == Status.SUCCESS
+        assert time.monotonic() - start >= 1.2
+
+    def test_parallel_fails_fast_and_cancels_siblings(self, capsys):
+        start = time.monotonic()
+        job = self.run_job(lambda: parallel(["sleep 10", "exit 2", {"command": "sleep 10", "task_name": "slow"}]))
+
+        assert time.monotonic() - start < 5
+        assert job.status == Status.FAILED
+        assert isinstance(job.error, TaskExecutionError)
+        assert job.error.exit_code == 2
+
+        events = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        tasks = [event for event in events if event["type"] == "task"]
+        assert {event["parent_id"] for event in tasks} == {job.id}
+        assert [(event["status"], event["error"]) for event in tasks if event["name"] == "slow"] == [
+            ("running", None), ("skipped", None)
+        ]
+
+    def test_parallel_skips_tasks_waiting_for_a_slot(self, capsys):
+        start = time.monotonic()
+        job = self.run_job(lambda: parallel([
+            "exit 2",
+            {"command": "sleep 5", "task_name": "first-waiting"},
+            {"command": "sleep 5", "task_name": "second-waiting"},
+        ]), max_parallel_tasks=1)
+
+        assert time.monotonic() - start < 2.5
+        assert job.status == Status.FAILED
+        assert job.error.exit_code == 2
+
+        events = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        statuses = {}
+        for event in events:
+            if event["type"] == "task":
+                statuses.setdefault(event["name"], []).append(event["status"])
+        assert statuses["first-waiting"] == ["skipped"]
+        assert statuses["second-waiting"] == ["skipped"]
+
+    def test_aparallel_raises_the_error_of_the_first_task_to_fail(self, monkeypatch):
+        async def fail(command):
+            # "late" fails one loop iteration after "early", before aparallel wakes up.
+            if command == "late":
+                await asyncio.sleep(0)
+            raise RuntimeError(command)
+
+        monkeypatch.setattr("river_sdk.task.abash", fail)
+
+        with pytest.raises(RuntimeError, match="early"):
+            asyncio.run(aparallel(["late", "early"]))
+
+    def test_parallel_inside_event_loop_raises(self):
+        class WrongJob(AsyncJob):
+            async def main(self):
+                return parallel(["true"])
+
+        job = WrongJob("wrong")
+        asyncio.run(make_river(job).aflow())
+
+        assert job.status == Status.FAILED
+        assert "use 'await aparallel(...)'" in str(job.error)
+
+    def test_aparallel_in_async_job(self):
+        class GatherJob(AsyncJob):
+            async def main(self):
+                results = await aparallel(["echo 1", "echo 2"])
+                return [r.stdout.strip() for r in results]
+
+        job = GatherJob("gather")
+        asyncio.run(make_river(job).aflow())
+
+        assert job.result == ["1", "2"]
@@ -0,0 +1,138 @@
+import asyncio
+from unittest.mock import Mock
+import pytest
+from river_sdk.durations import UNIFORM_COST, DurationStore, busy_seconds, job_costs, job_key
+from river_sdk.job import Job
+from river_sdk.plan import ExecutionPlan
+from river_sdk.river import River
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+from river_sdk.scheduler import ReadyQueue, predict_makespan
+from river_common.shared import Status
+from test.helpers import make_river
+
+
+class RecordingJob(Job):
+    runs: list[str] = []
+
+    def __init__(self, name: str, upstreams=None):
+        super().__init__(name, upstreams=upstreams)
+
+    def main(self):
+        RecordingJob.runs.append(self.name)
+        return self.name
+
+
+def fork_join():
+    """
+    quick   slow-1
+      |       |
+      |     slow-2
+       \\     /
+        join
+    """
+    quick = RecordingJob("quick")
+    slow_1 = RecordingJob("slow-1")
+    slow_2 = RecordingJob("slow-2", upstreams=[slow_1])
+    return quick, slow_1, slow_2, RecordingJob("join", upstreams=[quick, slow_2])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DurationStore(tmp_path / "durations.sqlite", window=3)
+    yield store
+    store.close()
+
+
+class TestDurationStore:
+
+    def setup_method(self):
+        RecordingJob.runs = []
+
+    def test_estimates_average_the_last_window_of_runs(self, store):
+        job = RecordingJob("a")
+        for seconds in (100.0, 1.0, 2.0, 3.0):
+            store.record("test-river", job, seconds)
+
+        assert store.estimates("test-river") == {job_key(job): 2.0}
+        assert store.estimates("other-river") == {}
+
+    def test_invalid_window(self, tmp_path):
+        with pytest.raises(ValueError, match="window must be at least 1"):
+            DurationStore(tmp_path / "durations.sqlite", window=0)
+
+    def test_busy_seconds_leave_out_the_queue_wait(self):
+        assert busy_seconds({"queue_wait": 5.0, "fork": 1.0, "execution": 2.0}) == 3.0
+
+    def test_new_jobs_cost_the_mean_of_known_ones(self, store):
+        quick, slow_1, slow_2, join = fork_join()
+        plan = ExecutionPlan(join)
+
+        assert set(job_costs(plan, {}).values()) == {UNIFORM_COST}
+
+        store.record("test-river", quick, 1.0)
+        store.record("test-river", slow_1, 5.0)
+        quick.status = Status.SUCCESS
+        costs = job_costs(plan, store.estimates("test-river"))
+        assert costs == {quick: 0.0, slow_1: 5.0, slow_2: 3.0, join: 3.0}
+
+    def test_remaining_paths_and_ready_order(self):
+        quick, slow_1, slow_2, join = fork_join()
+        plan = ExecutionPlan(join)
+        costs = {quick: 1.0, slow_1: 5.0, slow_2: 5.0, join: 1.0}
+
+        paths = plan.remaining_paths(costs)
+
+        assert paths == {quick: 2.0, slow_1: 11.0, slow_2: 6.0, join: 1.0}
+        assert ReadyQueue(plan).pop() is quick
+        assert ReadyQueue(plan, paths).pop() is slow_1
+
+    def test_predicted_makespan(self):
+        quick, slow_1, slow_2, join = fork_join()
+        plan = ExecutionPlan(join)
+        costs = {quick: 1.0, slow_1: 5.0, slow_2: 5.0, join: 1.0}
+        paths = plan.remaining_paths(costs)
+
+        assert predict_makespan(plan, costs, paths, max_workers=1) == 12.0
+        assert predict_makespan(plan, costs, paths, max_workers=2) == 11.0
+
+    def test_flow_records_durations_and_makespans(self, store):
+        jobs = fork_join()
+        river = make_river(jobs[-1], durations=store)
+        river.flow()
+
+        assert set(store.estimates("test-river")) == {job_key(job) for job in jobs}
+        assert river.predicted_makespan == 4 * UNIFORM_COST
+        [makespan] = store.makespans("test-river")
+        assert (makespan.target, makespan.run_id, makespan.predicted) == ("join", river.run_id, 4 * UNIFORM_COST)
+        assert makespan.actual == river.makespan > 0
+
+    def test_flow_starts_the_critical_path_first(self, store):
+        quick, slow_1, slow_2, join = fork_join()
+        store.record("test-river", quick, 1.0)
+        store.record("test-river", slow_1, 5.0)
+        store.record("test-river", slow_2, 5.0)
+        store.record("test-river", join, 1.0)
+
+        river = make_river(join, durations=store)
+        river.flow()
+
+        assert RecordingJob.runs == ["slow-1", "slow-2", "quick", "join"]
+        assert river.predicted_makespan == 12.0
+
+    def test_aflow_uses_the_store_too(self, store):
+        quick, slow_1, slow_2, join = fork_join()
+        store.record("test-river", slow_1, 5.0)
+
+        river = make_river(join, durations=store)
+        asyncio.run(river.aflow())
+
+        assert RecordingJob.runs[0] == "slow-1"
+        assert len(store.makespans()) == 1
+
+    def test_rivers_without_a_store_keep_plan_order(self):
+        *_, join = fork_join()
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": join})
+        river.flow()
+
+        assert RecordingJob.runs == ["quick", "slow-1", "slow-2", "join"]
+        assert river.predicted_makespan is None and river.makespan > 0
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+import pytest
+from river_common.channel import MemoryChannel
+from river_common.event import StatusEvent
+from river_common.exporter import StatusExporter
+from river_common.shared import ModuleTypes, Status, TIMING_PHASES
+from river_common.status import JobStatus, StatusBase, TaskStatus, Timings
+
+
+@pytest.mark.parametrize("updated_at", [
+    datetime(2025, 3, 1, 12, 30, 45, 123456, tzinfo=timezone.utc),
+    datetime(2025, 3, 1, 12, 30, 45, tzinfo=timezone.utc),
+    datetime(2025, 3, 1, 12, 30, 45, 7, tzinfo=timezone.utc),
+])
+@pytest.mark.parametrize("name", ["build", 'echo "ünïcode" \\ tab\there', "line\nbreak \x01  "])
+def test_json_matches_the_pydantic_model(updated_at, name):
+    status = TaskStatus(id="t1", name=name, parent_id="j1", status=Status.RUNNING, updated_at=updated_at)
+    assert StatusEvent.from_status(status).to_json() == status.model_dump_json().encode()
+
+
+def test_failure_json_matches_the_pydantic_model():
+    status = JobStatus(id="j1", name="build", parent_id="r1")
+    status.set_failed(ValueError("bad 'value'"))
+    event = StatusEvent(ModuleTypes.JOB, "j1", "build", "r1", Status.FAILED, ValueError("bad 'value'"),
+                        updated_at_ns=StatusEvent.from_status(status).updated_at_ns)
+    assert event.to_json() == status.model_dump_json().encode()
+
+
+def test_timings_json_matches_the_pydantic_model():
+    status = JobStatus(id="j1", name="build", timings=Timings(queue_wait=0.5, fork=0.012345, execution=61.25))
+    event = StatusEvent.from_status(status)
+    assert event.timings == {"queue_wait": 0.5, "fork": 0.012345, "execution": 61.25}
+    assert event.to_json() == status.model_dump_json().encode()
+    assert event.to_status().timings == status.timings
+
+
+@pytest.mark.parametrize("seconds", [1e-06, 2.5e-05, 1e-05, 1.2e-05, 0.0001, 123456.0, 1e15, 1e16, 1.5e21])
+def test_timings_json_matches_the_pydantic_model_in_exponent_form(seconds):
+    event = StatusEvent.from_status(JobStatus(id="j1", name="build", timings=Timings(fork=seconds)))
+    assert event.timings["fork"] == seconds
+    assert event.to_json() == event.to_status().model_dump_json().encode()
+
+
+@pytest.mark.parametrize("cache_hit", [None, True, False])
+def test_cache_hit_json_matches_the_pydantic_model(cache_hit):
+    status = TaskStatus(id="t1", name="install", status=Status.CACHED, cache_hit=cache_hit)
+    event = StatusEvent.from_status(status)
+    assert event.to_json() == status.model_dump_json().encode()
+    assert event.to_status().cache_hit is cache_hit
+
+
+def test_timing_phases_match_the_model():
+    assert tuple(Timings.model_fields) == TIMING_PHASES
+
+
+def test_errors_are_only_kept_for_failures():
+    event = StatusEvent(ModuleTypes.TASK, "t1", "test", "j1", Status.SUCCESS, RuntimeError("ignored"))
+    assert event.error is None and event.error_type is None
+
+
+def test_to_status_round_trip():
+    event = StatusEvent(ModuleTypes.TASK, "t1", "test", "j1", Status.FAILED, KeyError("x"))
+    status = event.to_status()
+    assert isinstance(status, StatusBase)
+    assert (status.type, status.status, status.error_type) == (ModuleTypes.TASK, Status.FAILED, "KeyError")
+    assert StatusEvent.from_status(status).updated_at_ns == event.updated_at_ns // 1000 * 1000
+
+
+def test_records_have_no_instance_dict():
+    event = StatusEvent(ModuleTypes.TASK, "t1", "test", "j1", Status.RUNNING)
+    with pytest.raises(AttributeError):
+        event.extra = 1
+
+
+def test_exported_models_are_copied():
+    channel = MemoryChannel()
+    exporter = StatusExporter(channel, flush_interval=60)
+    try:
+        status = JobStatus(id="j1", name="build")
+        exporter.export(status)
+        status.set_status(Status.SUCCESS)
+        exporter.export(status)
+        exporter.flush(timeout=5)
+    finally:
+        exporter.close()
+    assert ['"status":"pending"' in line for line in channel.lines()] == [True, False]
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+import pytest
+from river_common.channel import MemoryChannel, StatusChannel
+from river_common.codec import JsonCodec
+from river_common.exporter import Backpressure, StatusExporter
+from river_common.shared import Status
+from river_common.status import TaskStatus
+
+
+class BlockedChannel(MemoryChannel):
+    """A reader that does not read until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, data: bytes) -> None:
+        self.entered.set()
+        self.release.wait(timeout=5)
+        super().write(data)
+
+
+class BrokenChannel(StatusChannel):
+    def write(self, data: bytes) -> None:
+        raise BrokenPipeError()
+
+
+def status(i: int) -> TaskStatus:
+    return TaskStatus(id=f"t{i}", name=f"task {i}", status=Status.RUNNING)
+
+
+def exported_ids(channel: MemoryChannel) -> list[str]:
+    return [json.loads(line)["id"] for line in channel.lines()]
+
+
+@pytest.fixture
+def exporters():
+    created = []
+
+    def create(*args, **kwargs):
+        exporter = StatusExporter(*args, **kwargs)
+        created.append(exporter)
+        return exporter
+
+    yield create
+    for exporter in created:
+        exporter.close()
+
+
+def test_flush_writes_queued_events_in_one_batch(exporters):
+    channel = MemoryChannel()
+    exporter = exporters(channel, flush_interval=60)
+    for i in range(100):
+        exporter.export(status(i))
+
+    assert exporter.flush(timeout=5)
+    assert exported_ids(channel) == [f"t{i}" for i in range(100)]
+    assert channel.writes == 1
+
+
+def test_batch_is_written_once_full(exporters):
+    channel = MemoryChannel()
+    line_size = len(status(0).model_dump_json()) + 1
+    exporter = exporters(channel, max_batch_bytes=line_size * 10, flush_interval=60)
+    for i in range(25):
+        exporter.export(status(i))
+
+    exporter.flush(timeout=5)
+    assert len(channel.lines()) == 25
+    assert channel.writes == 3
+
+
+def test_batch_is_written_after_flush_interval(exporters):
+    channel = MemoryChannel()
+    exporter = exporters(channel, flush_interval=0.01)
+    exporter.export(status(0))
+
+    for _ in range(500):
+        if channel.writes:
+            break
+        time.sleep(0.01)
+    assert exported_ids(channel) == ["t0"]
+
+
+def test_drop_backpressure_never_waits_for_the_reader(exporters):
+    channel = BlockedChannel()
+    exporter = exporters(channel, max_pending=2, flush_interval=0, backpressure=Backpressure.DROP)
+    exporter.export(status(0))
+    assert channel.entered.wait(timeout=5)
+
+    # The writer holds event 0, two fit in the queue, the rest is dropped.
+    for i in range(1, 10):
+        exporter.export(status(i))
+    assert exporter.dropped == 7
+
+    channel.release.set()
+    exporter.flush(timeout=5)
+    assert exported_ids(channel) == ["t0", "t1", "t2"]
+
+
+def test_block_backpressure_waits_for_the_reader(exporters):
+    channel = BlockedChannel()
+    exporter = exporters(channel, max_pending=1, flush_interval=0)
+    exporter.export(status(0))
+    assert channel.entered.wait(timeout=5)
+    exporter.export(status(1))
+
+    blocked = threading.Thread(target=exporter.export, args=(status(2),))
+    blocked.start()
+    blocked.join(timeout=0.1)
+    assert blocked.is_alive()
+
+    channel.release.set()
+    blocked.join(timeout=5)
+    exporter.flush(timeout=5)
+    assert exported_ids(channel) == ["t0", "t1", "t2"]
+    assert exporter.dropped == 0
+
+
+def test_close_writes_what_is_left(exporters):
+    channel = MemoryChannel()
+    exporter = exporters(channel, flush_interval=60)
+    exporter.export(status(0))
+    exporter.close()
+    assert exported_ids(channel) == ["t0"]
+
+    # Once closed, events are written right away.
+    exporter.export(status(1))
+    assert exporter.flush()
+    assert exported_ids(channel) == ["t0", "t1"]
+
+
+def test_write_errors_are_counted(exporters):
+    exporter = exporters(BrokenChannel(), flush_interval=0)
+    exporter.export(status(0))
+    exporter.flush(timeout=5)
+    exporter.export(status(1))
+    exporter.flush(timeout=5)
+    assert exporter.errors == 2
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_flush_returns_once_the_writer_is_gone(exporters):
+    class DyingCodec(JsonCodec):
+        def encode(self, event):
+            raise SystemExit()
+
+    exporter = exporters(MemoryChannel(), flush_interval=0, codec=DyingCodec())
+    exporter.export(status(0))
+    exporter._writer.join(timeout=5)
+
+    assert not exporter.flush()
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        StatusExporter(MemoryChannel(), max_pending=0)
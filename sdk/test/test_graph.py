@@ -0,0 +1,86 @@
+import pytest
+from river_sdk.job import Job
+from river_sdk.graph import TopologicalOrder
+
+
+class SimpleJob(Job):
+    def __init__(self, name: str, upstreams=None):
+        super().__init__(name, upstreams=upstreams)
+
+    def main(self):
+        return self.name
+
+
+def assert_topological(jobs):
+    for job in jobs:
+        for upstream in job._upstreams:
+            assert upstream._topo_index < job._topo_index
+
+
+class TestTopologicalOrder:
+
+    def test_new_jobs_are_ordered_after_existing_ones(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a])
+
+        assert a._topo_index < b._topo_index
+        assert b._upstreams == [a]
+        assert a._downstreams == [b]
+
+    def test_join_against_order_reorders(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a])
+        c = SimpleJob('c')
+        d = SimpleJob('d', upstreams=[c])
+
+        # c and d were created after a and b, but must now run before them.
+        a._join([d])
+
+        assert_topological([a, b, c, d])
+        assert a._upstreams == [d]
+
+    def test_cycle_path(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a])
+        c = SimpleJob('c', upstreams=[b])
+
+        with pytest.raises(ValueError, match="Joining c would create a cycle with a: c -> b -> a -> c"):
+            a._join([c])
+
+        assert a._upstreams == []
+        assert c._downstreams == []
+
+    def test_self_cycle(self):
+        a = SimpleJob('a')
+
+        with pytest.raises(ValueError, match="Joining a would create a cycle with a: a"):
+            a._join([a])
+
+    def test_duplicate_upstreams_are_joined_once(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a, a])
+        b._join([a])
+
+        assert b._upstreams == [a]
+        assert a._downstreams == [b]
+
+    def test_cycle_through_diamond(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a])
+        c = SimpleJob('c', upstreams=[a])
+        d = SimpleJob('d', upstreams=[b, c])
+
+        with pytest.raises(ValueError, match="would create a cycle"):
+            a._join([d])
+
+        assert_topological([a, b, c, d])
+
+    def test_independent_order_instance(self):
+        order = TopologicalOrder()
+        a, b = SimpleJob('a'), SimpleJob('b')
+        order.add(b)
+        order.add(a)
+
+        assert order.add_edge(a, b) is None
+        assert order.add_edge(b, a) == [b, a]
+        assert_topological([a, b])
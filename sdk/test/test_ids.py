@@ -0,0 +1,116 @@
+import json
+import uuid
+import pytest
+from unittest.mock import Mock
+from river_sdk.ids import job_id, river_id, task_id
+from river_sdk.job import Job
+from river_sdk.river import River
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager
+from river_sdk.task import bash
+from river_common.channel import MemoryChannel
+from river_common.exporter import StatusExporter, set_status_exporter, status_exporter
+from test.helpers import make_river
+
+
+class BashJob(Job):
+    def __init__(self, name: str, upstreams=None, commands=("true",)):
+        super().__init__(name, upstreams=upstreams)
+        self.commands = commands
+
+    def main(self):
+        for command in self.commands:
+            bash(command)
+
+
+class OtherJob(BashJob):
+    pass
+
+
+def diamond(cls=BashJob) -> Job:
+    a = cls("a")
+    b = cls("b", upstreams=[a])
+    c = cls("c", upstreams=[a], commands=("true", "true"))
+    return cls("d", upstreams=[b, c])
+
+
+def job_ids(outlet: Job) -> dict[str, str]:
+    river = make_river(outlet, name="ids-river", deterministic_ids=True)
+    river.flow()
+    return {job.name: job.id for job in river.plan("default")}
+
+
+@pytest.fixture
+def channel():
+    channel = MemoryChannel()
+    previous = set_status_exporter(StatusExporter(channel))
+    yield channel
+    set_status_exporter(previous).close()
+
+
+class TestDeterministicIds:
+
+    def test_ids_are_stable_across_rivers(self, channel):
+        first, second = (make_river(diamond(), name="ids-river", deterministic_ids=True) for _ in range(2))
+        assert first.id == second.id == river_id("ids-river")
+
+        assert job_ids(diamond()) == job_ids(diamond())
+
+    def test_ids_follow_river_class_name_and_level(self, channel):
+        ids = job_ids(diamond())
+        river = river_id("ids-river")
+
+        assert ids["a"] == job_id(river, BashJob("a"), 0)
+        assert ids["d"] == job_id(river, BashJob("d"), 2)
+        assert job_ids(diamond(OtherJob))["a"] != ids["a"]
+        assert make_river(diamond(), name="other", deterministic_ids=True).id != river
+        # Behind one more job, "a" sits a level deeper.
+        assert job_ids(BashJob("e", upstreams=[BashJob("a", upstreams=[BashJob("root")])]))["a"] != ids["a"]
+
+    def test_task_ids_are_job_id_and_ordinal(self, channel):
+        outlet = diamond()
+        make_river(outlet, name="ids-river", deterministic_ids=True).flow()
+        status_exporter().flush(timeout=5)
+
+        c = outlet._upstreams[1]
+        task_ids = {
+            event["id"] for event in map(json.loads, channel.lines())
+            if event["type"] == "task" and event["parent_id"] == c.id
+        }
+        assert task_ids == {task_id(c.id, 0), task_id(c.id, 1)}
+
+    def test_task_ids_are_stable_across_rivers(self, channel):
+        for _ in range(2):
+            make_river(BashJob("a", commands=("true", "true")), name="ids-river", deterministic_ids=True).flow()
+        status_exporter().flush(timeout=5)
+
+        task_ids = [event["id"] for event in map(json.loads, channel.lines()) if event["type"] == "task"]
+        a = job_id(river_id("ids-river"), BashJob("a"), 0)
+        assert set(task_ids) == {task_id(a, 0), task_id(a, 1)}
+        assert len(task_ids) == 8
+
+    def test_sandbox_manager_tracks_each_flow_apart(self, channel):
+        manager = Mock(spec=BaseSandboxManager)
+        run_ids = []
+        for _ in range(2):
+            river = River("ids-river", manager, {"default": BashJob("a")}, deterministic_ids=True)
+            river.flow()
+            run_ids.append(river.run_id)
+
+        assert run_ids[0] != run_ids[1]
+        assert [c.args[0] for c in manager.begin_river.call_args_list] == run_ids
+        assert [c.args[0] for c in manager.end_river.call_args_list] == run_ids
+
+    def test_colliding_names_are_rejected(self, channel):
+        outlet = OtherJob("a", upstreams=[BashJob("a")])
+        with pytest.raises(ValueError, match=r"'a' is used by more than one job of river 'ids-river' \(BashJob and OtherJob\)"):
+            make_river(outlet, name="ids-river", deterministic_ids=True).flow()
+
+    def test_ids_are_random_by_default(self, channel):
+        outlet = diamond()
+        river = make_river(outlet, name="ids-river")
+        before = outlet.id
+        river.flow()
+
+        assert outlet.id == before
+        assert river.id != make_river(diamond(), name="ids-river").id
+        assert uuid.UUID(river.id).version == 4
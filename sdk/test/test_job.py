@@ -207,7 +207,8 @@ class TestJobSandbox:
         assert job.sandbox is mock_sandbox
         assert status == Job.Status.SUCCESS
         assert result == 'result'
-        mock_manager.take_snapshot.assert_called_once_with(mock_sandbox)
+        # Nothing forks from this job, so its sandbox is not snapshotted.
+        mock_manager.take_snapshot.assert_not_called()
         mock_manager.destory.assert_called_once_with(mock_sandbox)
 
     @patch('sdk.src.river.get_current_sandbox_manager')
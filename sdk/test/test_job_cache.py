@@ -0,0 +1,204 @@
+import os
+import subprocess
+import sys
+from river_sdk.job import Job
+from river_sdk.job_cache import JobCache, cache_key
+from river_sdk.river import River, default_sandbox_creator, sandbox_forker
+from river_common.shared import Status
+from test.helpers import make_manager, make_river
+
+
+class CountingJob(Job):
+    runs: list[str] = []
+
+    def __init__(self, name: str, value: int = 0, upstreams=None, sandbox_creator=None):
+        super().__init__(name, sandbox_creator=sandbox_creator, upstreams=upstreams)
+        self.value = value
+
+    def main(self):
+        CountingJob.runs.append(self.name)
+        return self.value
+
+
+class OtherJob(CountingJob):
+    pass
+
+
+class UncacheableJob(CountingJob):
+    cacheable = False
+
+
+def flow(outlet: Job, cache: JobCache, manager=None, config="ubuntu") -> River:
+    river = make_river(outlet, manager, default_sandbox_config=config, job_cache=cache)
+    river.flow()
+    return river
+
+
+class TestJobCache:
+
+    def test_get_returns_what_was_put(self, tmp_path):
+        cache = JobCache(tmp_path)
+
+        assert cache.get("abc") is None
+        assert cache.put("abc", {"answer": 42}, "snap") == []
+        entry = cache.get("abc")
+
+        assert (entry.result, entry.snapshot) == ({"answer": 42}, "snap")
+        assert (tmp_path / "ab" / "abc.pickle").exists()
+        assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "entries": 1, "size": entry.size}
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        cache = JobCache(tmp_path)
+        cache.put("aa", "a" * 100, "snap-a")
+        cache.put("bb", "b" * 100, None)
+        size = cache.stats()["size"] // 2
+        os.utime(tmp_path / "aa" / "aa.pickle", (1, 1))
+        os.utime(tmp_path / "bb" / "bb.pickle", (2, 2))
+        cache.max_size = 2 * size
+
+        evicted = cache.put("cc", "c" * 100, None)
+
+        assert [(entry.key, entry.snapshot) for entry in evicted] == [("aa", "snap-a")]
+        assert cache.get("aa") is None and cache.get("bb") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_unreadable_entries_are_misses(self, tmp_path):
+        cache = JobCache(tmp_path)
+        (tmp_path / "ab").mkdir()
+        (tmp_path / "ab" / "abc.pickle").write_bytes(b"not a pickle")
+
+        assert cache.get("abc") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_invalidated_entries_count_as_misses(self, tmp_path):
+        cache = JobCache(tmp_path)
+        cache.put("abc", 1, None)
+        cache.get("abc")
+
+        cache.invalidate("abc")
+
+        assert cache.get("abc") is None
+        assert cache.stats() | {"size": 0} == {"hits": 0, "misses": 2, "evictions": 0, "entries": 0, "size": 0}
+
+
+class TestCacheKey:
+
+    def test_key_covers_class_arguments_and_config(self):
+        key = cache_key(CountingJob("a", 1), "ubuntu")
+
+        assert key == cache_key(CountingJob("a", 1), "ubuntu")
+        assert key != cache_key(CountingJob("a", 2), "ubuntu")
+        assert key != cache_key(CountingJob("a", value=1), "ubuntu")
+        assert key != cache_key(OtherJob("a", 1), "ubuntu")
+        assert key != cache_key(CountingJob("a", 1), "debian")
+
+    def test_jobs_need_keyed_upstreams(self):
+        upstream = CountingJob("up")
+        job = CountingJob("down", upstreams=[upstream])
+
+        assert cache_key(job, None) is None
+        upstream.cache_key = "1" * 64
+        first = cache_key(job, None)
+        upstream.cache_key = "2" * 64
+        assert first is not None and first != cache_key(job, None)
+
+    def test_sandbox_creators_are_keyed_by_code_and_captured_state(self):
+        def make(config):
+            def create():
+                return config
+            return create
+
+        def key(creator):
+            return cache_key(CountingJob("a", sandbox_creator=creator), None)
+
+        assert key(make("ubuntu")) == key(make("ubuntu"))
+        assert key(make("ubuntu")) != key(make("alpine"))
+        assert key(lambda: "ubuntu") != key(lambda: "alpine")
+        assert key(make(object())) is None
+
+    def test_sets_are_keyed_the_same_in_every_process(self):
+        script = "from river_sdk.job_cache import _fingerprint; print(_fingerprint({'a', 'b', 'c', 'd', 'e', 'f'}))"
+
+        def fingerprint(seed):
+            env = {**os.environ, "PYTHONHASHSEED": seed}
+            return subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, check=True).stdout
+
+        assert len({fingerprint(seed) for seed in ("1", "2", "3", "4")}) == 1
+        assert cache_key(CountingJob("a", frozenset({"x", "y"})), None) == cache_key(
+            CountingJob("a", frozenset({"y", "x"})), None
+        )
+        assert cache_key(CountingJob("a", {"x"}), None) != cache_key(CountingJob("a", ["x"]), None)
+
+    def test_identity_only_arguments_and_opted_out_jobs_have_no_key(self):
+        assert cache_key(CountingJob("a", object()), None) is None
+        assert cache_key(UncacheableJob("a"), None) is None
+
+
+class TestCachedFlow:
+
+    def setup_method(self):
+        CountingJob.runs = []
+
+    def test_second_flow_restores_jobs_without_sandboxes(self, tmp_path):
+        cache = JobCache(tmp_path)
+        a = CountingJob("a", 1, sandbox_creator=default_sandbox_creator())
+        flow(CountingJob("b", 2, upstreams=[a]), cache)
+
+        manager = make_manager()
+        a = CountingJob("a", 1, sandbox_creator=default_sandbox_creator())
+        b = CountingJob("b", 2, upstreams=[a])
+        flow(b, cache, manager)
+
+        assert CountingJob.runs == ["a", "b"]
+        assert (a.status, a.result, b.status, b.result) == (Status.CACHED, 1, Status.CACHED, 2)
+        manager.create.assert_not_called()
+        assert cache.stats()["hits"] == 2
+
+    def test_changed_upstream_reruns_downstreams(self, tmp_path):
+        cache = JobCache(tmp_path)
+        flow(CountingJob("b", upstreams=[CountingJob("a", 1)]), cache)
+
+        flow(CountingJob("b", upstreams=[CountingJob("a", 2)]), cache)
+
+        assert CountingJob.runs == ["a", "b", "a", "b"]
+
+    def test_forked_jobs_keep_their_snapshot(self, tmp_path):
+        cache = JobCache(tmp_path)
+        manager = make_manager()
+        a = CountingJob("a", sandbox_creator=default_sandbox_creator())
+        flow(CountingJob("b", upstreams=[a], sandbox_creator=sandbox_forker(a)), cache, manager)
+
+        manager.hand_over.assert_not_called()
+        manager.keep_snapshot.assert_called_once_with(a.snapshot)
+
+        manager = make_manager()
+        a = CountingJob("a", sandbox_creator=default_sandbox_creator())
+        b = CountingJob("b", upstreams=[a], sandbox_creator=sandbox_forker(a))
+        flow(b, cache, manager)
+
+        assert CountingJob.runs == ["a", "b"]
+        assert a.status == Status.CACHED and a.sandbox is None and a.snapshot is not None
+        manager.has_snapshot.assert_called_with(a.snapshot)
+        manager.fork.assert_not_called()
+
+    def test_missing_snapshot_reruns_the_job(self, tmp_path):
+        cache = JobCache(tmp_path)
+        manager = make_manager()
+        a = CountingJob("a", sandbox_creator=default_sandbox_creator())
+        flow(CountingJob("b", upstreams=[a], sandbox_creator=sandbox_forker(a)), cache, manager)
+
+        manager = make_manager()
+        manager.has_snapshot.return_value = False
+        a = CountingJob("a", sandbox_creator=default_sandbox_creator())
+        b = CountingJob("b", 1, upstreams=[a], sandbox_creator=sandbox_forker(a))
+        flow(b, cache, manager)
+
+        assert CountingJob.runs == ["a", "b", "a", "b"]
+        assert a.status == Status.SUCCESS
+        manager.fork.assert_called_once_with(a)
+
+    def test_flows_without_a_cache_do_not_cache(self, tmp_path):
+        make_river(CountingJob("a")).flow()
+        make_river(CountingJob("a")).flow()
+
+        assert CountingJob.runs == ["a", "a"]
@@ -0,0 +1,167 @@
+import threading
+import pytest
+from river_sdk.job import Job
+from river_sdk.journal import RunJournal
+from river_sdk.river import default_sandbox_creator, sandbox_forker
+from river_common.shared import Status
+from test.helpers import make_manager, make_river
+
+
+class FlakyJob(Job):
+    runs: list[str] = []
+    failing: set[str] = set()
+
+    def __init__(self, name: str, upstreams=None, sandbox_creator=None):
+        super().__init__(name, sandbox_creator=sandbox_creator, upstreams=upstreams)
+
+    def main(self):
+        FlakyJob.runs.append(self.name)
+        if self.name in FlakyJob.failing:
+            raise RuntimeError(f"{self.name} failed")
+        return {"made by": self.name}
+
+
+class LockJob(Job):
+    def main(self):
+        return threading.Lock()
+
+
+def chain(sandboxes: bool = False) -> Job:
+    """a -> b -> c, with c forking b when sandboxes are used."""
+    creator = default_sandbox_creator() if sandboxes else None
+    a = FlakyJob("a", sandbox_creator=creator)
+    b = FlakyJob("b", upstreams=[a], sandbox_creator=creator)
+    return FlakyJob("c", upstreams=[b], sandbox_creator=sandbox_forker(b) if sandboxes else None)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RunJournal(tmp_path / "journal.sqlite")
+    yield journal
+    journal.close()
+
+
+class TestRunJournal:
+
+    def setup_method(self):
+        FlakyJob.runs = []
+        FlakyJob.failing = set()
+
+    def test_flow_records_run_and_jobs(self, journal):
+        river = make_river(chain(), journal=journal)
+        river.flow()
+
+        run = journal.run(river.run_id)
+        assert (run.river, run.outlet, run.status, run.resumed_from) == ("test-river", "default", Status.SUCCESS, None)
+        assert run.finished_at >= run.started_at
+        jobs = journal.jobs(river.run_id)
+        assert {name: job.status for name, job in jobs.items()} == {name: Status.SUCCESS for name in "abc"}
+        assert jobs["b"].result == {"made by": "b"} and jobs["b"].restorable
+        assert journal.runs("test-river") == [run]
+
+    def test_failed_run_records_failures_and_skips(self, journal):
+        FlakyJob.failing = {"b"}
+        river = make_river(chain(), journal=journal)
+        river.flow()
+
+        jobs = journal.jobs(river.run_id)
+        assert journal.run(river.run_id).status == Status.FAILED
+        assert [jobs[name].status for name in "abc"] == [Status.SUCCESS, Status.FAILED, Status.SKIPPED]
+        assert jobs["b"].error == "b failed"
+
+    def test_unpicklable_results_are_not_restorable(self, journal):
+        river = make_river(LockJob("lock"), journal=journal)
+        river.flow()
+
+        assert not journal.jobs(river.run_id)["lock"].restorable
+
+    def test_resume_reruns_only_unfinished_jobs(self, journal):
+        FlakyJob.failing = {"b"}
+        first = make_river(chain(), journal=journal)
+        first.flow()
+
+        FlakyJob.failing = set()
+        outlet = chain()
+        resumed = make_river(outlet, journal=journal)
+        resumed.flow(resume=first.run_id)
+
+        assert FlakyJob.runs == ["a", "b", "b", "c"]
+        a = outlet._upstreams[0]._upstreams[0]
+        assert (a.status, a.result) == (Status.SUCCESS, {"made by": "a"})
+        assert journal.run(resumed.run_id).resumed_from == first.run_id
+        assert journal.run(resumed.run_id).status == Status.SUCCESS
+        assert set(journal.jobs(resumed.run_id)) == {"a", "b", "c"}
+
+    def test_resumed_jobs_fork_from_journaled_snapshots(self, journal):
+        FlakyJob.failing = {"c"}
+        manager = make_manager()
+        outlet = chain(sandboxes=True)
+        first = make_river(outlet, manager, journal=journal)
+        first.flow()
+
+        snapshot = outlet._upstreams[0].snapshot
+        manager.hand_over.assert_not_called()
+        manager.keep_snapshot.assert_called_once_with(snapshot)
+        assert journal.jobs(first.run_id)["b"].snapshot == snapshot
+        assert journal.kept_snapshots(first.run_id) == {snapshot}
+
+        FlakyJob.failing = set()
+        manager = make_manager()
+        outlet = chain(sandboxes=True)
+        resumed = make_river(outlet, manager, journal=journal)
+        resumed.flow(resume=first.run_id)
+
+        b = outlet._upstreams[0]
+        assert FlakyJob.runs == ["a", "b", "c", "c"]
+        assert b.sandbox is None and b.snapshot == snapshot
+        manager.fork.assert_called_once_with(b)
+        manager.create.assert_not_called()
+        # Taken over by the resumed run, and released once c forked it.
+        manager.retain_snapshot.assert_called_once_with(snapshot, 1, resumed.run_id)
+        manager.release_snapshot.assert_called_once_with(snapshot)
+        assert journal.kept_snapshots(first.run_id) == set()
+
+    def test_snapshots_of_failed_forks_are_kept_until_the_river_succeeds(self, journal):
+        FlakyJob.failing = {"c"}
+        first = make_river(chain(sandboxes=True), journal=journal)
+        first.flow()
+        again = make_river(chain(sandboxes=True), journal=journal)
+        again.flow()
+        kept = journal.kept_snapshots(first.run_id) | journal.kept_snapshots(again.run_id)
+
+        assert len(kept) == 2
+        assert journal.abandoned_snapshots() == set()
+
+        FlakyJob.failing = set()
+        make_river(chain(sandboxes=True), journal=journal).flow()
+
+        assert journal.abandoned_snapshots() == kept
+        journal.release_snapshots(kept)
+        assert journal.kept_snapshots(first.run_id) == journal.kept_snapshots(again.run_id) == set()
+
+    def test_jobs_whose_snapshot_is_gone_run_again(self, journal):
+        FlakyJob.failing = {"c"}
+        first = make_river(chain(sandboxes=True), journal=journal)
+        first.flow()
+
+        FlakyJob.failing = set()
+        manager = make_manager()
+        manager.has_snapshot.return_value = False
+        make_river(chain(sandboxes=True), manager, journal=journal).flow(resume=first.run_id)
+
+        assert FlakyJob.runs == ["a", "b", "c", "b", "c"]
+
+    def test_resume_needs_a_journaled_run_of_the_river(self, journal):
+        with pytest.raises(ValueError, match="has no journal"):
+            make_river(chain()).flow(resume="run-1")
+        with pytest.raises(ValueError, match="No journaled run run-1"):
+            make_river(chain(), journal=journal).flow(resume="run-1")
+        other = make_river(chain(), name="other-river", journal=journal)
+        other.flow()
+        with pytest.raises(ValueError, match="No journaled run"):
+            make_river(chain(), journal=journal).flow(resume=other.run_id)
+
+    def test_journaled_jobs_need_unique_names(self, journal):
+        outlet = FlakyJob("a", upstreams=[FlakyJob("a")])
+        with pytest.raises(ValueError, match="'a' is used by more than one job"):
+            make_river(outlet, journal=journal).flow()
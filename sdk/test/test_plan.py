@@ -0,0 +1,151 @@
+import sys
+import pytest
+from unittest.mock import Mock
+from river_sdk.job import Job
+from river_sdk.plan import ExecutionPlan
+from river_sdk.river import River, sandbox_forker
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager, SandboxCreator
+from river_common.shared import Status
+
+
+class SimpleJob(Job):
+    def __init__(self, name: str, upstreams=None, sandbox_creator=None):
+        super().__init__(name, sandbox_creator=sandbox_creator, upstreams=upstreams)
+
+    def main(self):
+        return self.name
+
+
+def chain(depth: int) -> list[Job]:
+    jobs = [SimpleJob('job-0')]
+    for i in range(1, depth):
+        jobs.append(SimpleJob(f'job-{i}', upstreams=[jobs[-1]]))
+    return jobs
+
+
+def diamond():
+    """
+      a
+     / \\
+    b   c
+     \\ /
+      d
+    """
+    a = SimpleJob('a')
+    b = SimpleJob('b', upstreams=[a])
+    c = SimpleJob('c', upstreams=[a])
+    d = SimpleJob('d', upstreams=[b, c])
+    return a, b, c, d
+
+
+class TestExecutionPlan:
+
+    def test_order_visits_each_job_once(self):
+        a, b, c, d = diamond()
+
+        plan = ExecutionPlan(d)
+
+        assert plan.order == [a, b, c, d]
+        assert len(plan) == 4
+
+    def test_levels_and_width(self):
+        a, b, c, d = diamond()
+
+        plan = ExecutionPlan(d)
+
+        assert plan.levels == [[a], [b, c], [d]]
+        assert plan.width == 2
+
+    def test_downstreams(self):
+        a, b, c, d = diamond()
+
+        plan = ExecutionPlan(d)
+
+        assert plan.downstreams(a) == [b, c]
+        assert plan.downstreams(d) == []
+
+    def test_only_contains_reachable_jobs(self):
+        a, b, c, d = diamond()
+        other = SimpleJob('other', upstreams=[a])
+
+        plan = ExecutionPlan(b)
+
+        assert plan.order == [a, b]
+        assert other not in plan
+        assert plan.downstreams(a) == [b]
+
+    def test_deep_chain_beyond_recursion_limit(self):
+        depth = sys.getrecursionlimit() * 2
+        job = chain(depth)[-1]
+
+        plan = ExecutionPlan(job)
+
+        assert len(plan) == depth
+        assert plan.width == 1
+        assert plan.order[-1] is job
+
+    def test_river_plan_unknown_outlet(self):
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": SimpleJob('a')})
+
+        with pytest.raises(ValueError, match="Outlet 'missing' not found"):
+            river.plan("missing")
+
+    def test_flow_deep_chain(self):
+        jobs = chain(sys.getrecursionlimit() * 2)
+        first, job = jobs[0], jobs[-1]
+        river = River("test-river", Mock(spec=BaseSandboxManager), {"default": job})
+
+        river.flow()
+
+        assert first.status == Status.SUCCESS
+        assert job.status == Status.SUCCESS
+
+    def test_fork_consumers(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        c = SimpleJob('c', upstreams=[a])
+        d = SimpleJob('d', upstreams=[b, c], sandbox_creator=sandbox_forker(b))
+
+        plan = ExecutionPlan(d)
+
+        assert b.fork_source is a
+        assert c.fork_source is None
+        assert plan.fork_consumers(a) == [b]
+        assert plan.fork_consumers(b) == [d]
+        assert plan.fork_consumers(c) == []
+        assert plan.fork_consumers(d) == []
+
+    def test_opaque_creators_are_fork_consumers_of_every_upstream(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b')
+        c = SimpleJob('c', upstreams=[a, b], sandbox_creator=lambda: None)
+        d = SimpleJob('d', upstreams=[c], sandbox_creator=SandboxCreator(lambda: None))
+
+        plan = ExecutionPlan(d)
+
+        assert c.fork_sources == [a, b]
+        assert d.fork_sources == []
+        assert plan.fork_consumers(a) == [c]
+        assert plan.fork_consumers(b) == [c]
+        assert plan.fork_consumers(c) == []
+
+    def test_fork_consumers_outside_the_plan(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+
+        plan = ExecutionPlan(a)
+
+        assert plan.fork_consumers(a) == [b]
+        assert not plan.hands_over(a)
+
+    def test_hands_over_to_single_consumer_only(self):
+        a = SimpleJob('a')
+        b = SimpleJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        c = SimpleJob('c', upstreams=[b], sandbox_creator=sandbox_forker(b))
+        d = SimpleJob('d', upstreams=[b], sandbox_creator=sandbox_forker(b))
+
+        plan = ExecutionPlan(SimpleJob('outlet', upstreams=[c, d]))
+
+        assert plan.hands_over(a)
+        assert not plan.hands_over(b)
+        assert not plan.hands_over(c)
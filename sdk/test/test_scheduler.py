@@ -0,0 +1,238 @@
+import json
+import threading
+import pytest
+from unittest.mock import Mock
+from river_sdk.job import Job, get_current_job
+from river_sdk.river import River, get_current_river, sandbox_forker
+from river_sdk.scheduler import Scheduler
+from river_sdk.sandbox.base_sandbox import BaseSandboxManager, SandboxCreator
+from river_common.channel import MemoryChannel
+from river_common.exporter import StatusExporter, set_status_exporter
+from river_common.shared import Status, TIMING_PHASES
+from test.helpers import make_river
+
+
+class CallbackJob(Job):
+    def __init__(self, name: str, callback=None, upstreams=None, sandbox_creator=None):
+        super().__init__(name, sandbox_creator=sandbox_creator, upstreams=upstreams)
+        self.callback = callback
+
+    def main(self):
+        return self.callback() if self.callback else self.name
+
+
+class FailingJob(Job):
+    def main(self):
+        raise Exception(f"{self.name} failed")
+
+
+class TestScheduler:
+
+    def test_invalid_max_workers(self):
+        with pytest.raises(ValueError, match="max_workers must be at least 1"):
+            Scheduler(0)
+
+    def test_serial_order_is_upstream_first(self):
+        order = []
+        a = CallbackJob('a', lambda: order.append('a'))
+        b = CallbackJob('b', lambda: order.append('b'), upstreams=[a])
+        c = CallbackJob('c', lambda: order.append('c'), upstreams=[a])
+        d = CallbackJob('d', lambda: order.append('d'), upstreams=[b, c])
+
+        make_river(d).flow()
+
+        assert order == ['a', 'b', 'c', 'd']
+
+    def test_independent_jobs_run_concurrently(self):
+        # Each job blocks until all three are running at the same time.
+        barrier = threading.Barrier(3, timeout=5)
+        branches = [CallbackJob(name, barrier.wait) for name in ('a', 'b', 'c')]
+        outlet = CallbackJob('outlet', upstreams=branches)
+
+        make_river(outlet, max_parallel_jobs=3).flow()
+
+        assert all(job.status == Status.SUCCESS for job in branches)
+        assert outlet.status == Status.SUCCESS
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def track():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            threading.Event().wait(0.05)
+            with lock:
+                active -= 1
+
+        branches = [CallbackJob(f"job-{i}", track) for i in range(6)]
+        outlet = CallbackJob('outlet', upstreams=branches)
+
+        make_river(outlet, max_parallel_jobs=2).flow()
+
+        assert peak == 2
+
+    def test_failed_upstream_skips_downstream(self):
+        a = FailingJob('a')
+        b = CallbackJob('b', upstreams=[a])
+        c = CallbackJob('c')
+        d = CallbackJob('d', upstreams=[b, c])
+
+        make_river(d, max_parallel_jobs=2).flow()
+
+        assert a.status == Status.FAILED
+        assert b.status == Status.SKIPPED
+        assert c.status == Status.SUCCESS
+        assert d.status == Status.SKIPPED
+
+    def test_diamond_runs_shared_upstream_once(self):
+        calls = []
+        a = CallbackJob('a', lambda: calls.append('a'))
+        b = CallbackJob('b', upstreams=[a])
+        c = CallbackJob('c', upstreams=[a])
+        d = CallbackJob('d', upstreams=[b, c])
+
+        make_river(d, max_parallel_jobs=4).flow()
+
+        assert calls == ['a']
+        assert d.status == Status.SUCCESS
+
+    def test_contexts_are_available_on_workers(self):
+        seen = {}
+
+        def record(name):
+            def callback():
+                seen[name] = (get_current_job().name, get_current_river().name)
+            return callback
+
+        a = CallbackJob('a', record('a'))
+        b = CallbackJob('b', record('b'))
+        outlet = CallbackJob('outlet', upstreams=[a, b])
+
+        make_river(outlet, max_parallel_jobs=2).flow()
+
+        assert seen == {'a': ('a', 'test-river'), 'b': ('b', 'test-river')}
+
+    def test_only_forked_sandboxes_are_snapshotted(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.fork.side_effect = lambda job: Mock(name=f"fork-of-{job.name}")
+        creator = SandboxCreator(lambda: manager.create("ubuntu"))
+        a = CallbackJob('a', sandbox_creator=creator)
+        b = CallbackJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        c = CallbackJob('c', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        d = CallbackJob('d', upstreams=[b, c], sandbox_creator=creator)
+        river = River("test-river", manager, {"default": d})
+
+        river.flow()
+
+        manager.take_snapshot.assert_called_once_with(a.sandbox)
+        manager.hand_over.assert_not_called()
+        assert manager.destory.call_count == 4
+
+    def test_other_creators_may_fork_any_upstream(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.take_snapshot.side_effect = lambda sandbox: f"snapshot-of-{sandbox._mock_name}"
+        manager.fork.side_effect = lambda job: Mock(name=f"fork-of-{job.name}")
+        a = CallbackJob('a', sandbox_creator=SandboxCreator(lambda: manager.create("a")))
+        b = CallbackJob('b', sandbox_creator=SandboxCreator(lambda: manager.create("b")))
+        c = CallbackJob('c', upstreams=[a, b], sandbox_creator=lambda: manager.fork(a))
+        d = CallbackJob('d', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        river = River("test-river", manager, {"default": CallbackJob('outlet', upstreams=[c, d])})
+
+        river.flow()
+
+        assert c.status == Status.SUCCESS
+        # a is snapshotted for both of its consumers, b is handed to its only one, which gives it back.
+        manager.take_snapshot.assert_called_once_with(a.sandbox)
+        manager.retain_snapshot.assert_called_once_with("snapshot-of-sandbox-a", 2, river.run_id)
+        assert manager.release_snapshot.call_count == 2
+        manager.hand_over.assert_called_once_with(b.sandbox, river.run_id)
+        manager.reclaim.assert_called_once_with(b.sandbox)
+
+    def test_single_fork_consumer_takes_over_the_sandbox(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.hand_over.return_value = True
+        manager.fork.side_effect = lambda job: job.sandbox
+        a = CallbackJob('a', sandbox_creator=lambda: manager.create("ubuntu"))
+        b = CallbackJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+        river = River("test-river", manager, {"default": b})
+
+        river.flow()
+
+        manager.hand_over.assert_called_once_with(a.sandbox, river.run_id)
+        manager.take_snapshot.assert_not_called()
+        assert b.sandbox is a.sandbox
+        manager.destory.assert_called_once_with(a.sandbox)
+        manager.reclaim.assert_called_once_with(a.sandbox)
+
+    def test_skipped_consumer_reclaims_handed_over_sandbox(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.hand_over.return_value = True
+        a = CallbackJob('a', sandbox_creator=lambda: manager.create("ubuntu"))
+        failing = FailingJob('failing')
+        b = CallbackJob('b', upstreams=[a, failing], sandbox_creator=sandbox_forker(a))
+        river = River("test-river", manager, {"default": b})
+
+        river.flow()
+
+        assert b.status == Status.SKIPPED
+        manager.fork.assert_not_called()
+        manager.destory.assert_not_called()
+        manager.reclaim.assert_called_once_with(a.sandbox)
+
+    def test_manager_without_hand_over_falls_back_to_snapshot(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.hand_over.return_value = False
+        a = CallbackJob('a', sandbox_creator=lambda: manager.create("ubuntu"))
+        b = CallbackJob('b', upstreams=[a], sandbox_creator=sandbox_forker(a))
+
+        River("test-river", manager, {"default": b}).flow()
+
+        manager.take_snapshot.assert_called_once_with(a.sandbox)
+        assert manager.destory.call_count == 2
+
+    def test_final_status_reports_timings(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        manager.hand_over.return_value = False
+        a = CallbackJob('a', sandbox_creator=lambda: manager.create("ubuntu"))
+        b = CallbackJob('b', lambda: threading.Event().wait(0.02), upstreams=[a], sandbox_creator=sandbox_forker(a))
+        channel = MemoryChannel()
+        previous = set_status_exporter(StatusExporter(channel))
+        try:
+            River("test-river", manager, {"default": b}).flow()
+        finally:
+            set_status_exporter(previous).close()
+
+        finals = {
+            event["name"]: event["timings"] for event in map(json.loads, channel.lines())
+            if event["type"] == "job" and event["status"] == "success"
+        }
+        assert set(finals["a"]) == set(TIMING_PHASES)
+        assert [phase for phase, seconds in finals["a"].items() if seconds is not None] == [
+            "queue_wait", "sandbox_create", "execution", "snapshot", "teardown"
+        ]
+        assert finals["b"]["fork"] is not None and finals["b"]["sandbox_create"] is None
+        assert finals["b"]["execution"] >= 0.02
+        assert b.timings["execution"] >= 0.02
+
+    def test_failed_job_reports_status_after_teardown(self):
+        manager = Mock(spec=BaseSandboxManager)
+        manager.create.side_effect = lambda config: Mock(name=f"sandbox-{config}")
+        statuses = []
+        failing = FailingJob('failing', sandbox_creator=lambda: manager.create("ubuntu"))
+        manager.destory.side_effect = lambda sandbox: statuses.append(failing.status)
+
+        River("test-river", manager, {"default": failing}).flow()
+
+        assert statuses == [Status.RUNNING]
+        assert failing.status == Status.FAILED
+        assert "teardown" in failing.timings
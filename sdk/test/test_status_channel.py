@@ -0,0 +1,159 @@
+import json
+import os
+import socket
+import threading
+import pytest
+from river_common.channel import (
+    FileChannel,
+    SocketChannel,
+    StdoutChannel,
+    open_channel,
+    set_status_channel,
+    status_channel,
+    STATUS_CHANNEL_ENV,
+)
+from river_common.codec import STATUS_FORMAT_ENV
+from river_common.exporter import StatusExporter, status_exporter
+from river_common.shared import Status
+from river_common.status import JobStatus
+
+
+@pytest.fixture(autouse=True)
+def reset_channel():
+    previous = set_status_channel(None)
+    yield
+    set_status_channel(previous)
+
+
+def read_lines(fd):
+    with os.fdopen(fd, "r") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_open_channel_without_spec_is_stdout():
+    assert isinstance(open_channel(None), StdoutChannel)
+    assert isinstance(open_channel(""), StdoutChannel)
+
+
+@pytest.mark.parametrize("spec", ["fd:", "fd:x", "unix:", "tcp:localhost", "nonsense"])
+def test_open_channel_rejects_invalid_spec(spec):
+    with pytest.raises(ValueError, match=STATUS_CHANNEL_ENV):
+        open_channel(spec)
+
+
+def test_export_falls_back_to_stdout(monkeypatch, capsys):
+    monkeypatch.delenv(STATUS_CHANNEL_ENV, raising=False)
+    JobStatus(id="j1", name="build", status=Status.RUNNING).export()
+    status_exporter().flush()
+    event = json.loads(capsys.readouterr().out)
+    assert event["id"] == "j1"
+    assert event["status"] == "running"
+
+
+def test_stdout_fallback_is_json_whatever_the_format(monkeypatch, capsys):
+    monkeypatch.delenv(STATUS_CHANNEL_ENV, raising=False)
+    monkeypatch.setenv(STATUS_FORMAT_ENV, "binary")
+    exporter = StatusExporter()
+    try:
+        exporter.export(JobStatus(id="j1", name="build", status=Status.RUNNING))
+        exporter.flush(timeout=5)
+    finally:
+        exporter.close()
+
+    assert exporter.errors == 0
+    assert json.loads(capsys.readouterr().out)["id"] == "j1"
+
+
+def test_export_to_inherited_fd_keeps_stdout_clean(monkeypatch, capsys):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setenv(STATUS_CHANNEL_ENV, f"fd:{write_fd}")
+    print("user output")
+    JobStatus(id="j1", name="build", status=Status.RUNNING).export()
+    JobStatus(id="j1", name="build", status=Status.SUCCESS).export()
+    status_exporter().flush()
+    assert isinstance(status_channel(), FileChannel)
+    status_channel().close()
+
+    events = read_lines(read_fd)
+    assert [event["status"] for event in events] == ["running", "success"]
+    assert capsys.readouterr().out == "user output\n"
+
+
+def test_channel_that_cannot_be_opened_does_not_stop_the_writer(monkeypatch, tmp_path):
+    monkeypatch.setenv(STATUS_CHANNEL_ENV, f"unix:{tmp_path / 'nonexistent.sock'}")
+    exporter = StatusExporter(flush_interval=0)
+    try:
+        exporter.export(JobStatus(id="j1", name="build", status=Status.RUNNING))
+        assert exporter.flush(timeout=5)
+        assert exporter.errors == 1
+
+        # Opened once the reader is there.
+        path = tmp_path / "status.jsonl"
+        monkeypatch.setenv(STATUS_CHANNEL_ENV, f"file:{path}")
+        exporter.export(JobStatus(id="j2", name="build", status=Status.RUNNING))
+        assert exporter.flush(timeout=5)
+    finally:
+        exporter.close()
+        status_channel().close()
+
+    assert [json.loads(line)["id"] for line in path.read_text().splitlines()] == ["j2"]
+
+
+def test_export_appends_to_file(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"id": "earlier"}\n')
+    channel = open_channel(f"file:{path}")
+    set_status_channel(channel)
+    JobStatus(id="j1", name="build", status=Status.RUNNING).export()
+    status_exporter().flush()
+    channel.close()
+
+    assert [json.loads(line)["id"] for line in path.read_text().splitlines()] == ["earlier", "j1"]
+
+
+def test_export_to_unix_socket(tmp_path):
+    path = str(tmp_path / "status.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    received = bytearray()
+
+    def serve():
+        client, _ = server.accept()
+        while data := client.recv(4096):
+            received.extend(data)
+        client.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    channel = open_channel(f"unix:{path}")
+    assert isinstance(channel, SocketChannel)
+    set_status_channel(channel)
+    JobStatus(id="j1", name="build", status=Status.FAILED).export()
+    status_exporter().flush()
+    channel.close()
+    thread.join(timeout=5)
+    server.close()
+
+    assert json.loads(received)["status"] == "failed"
+
+
+def test_export_to_named_pipe(tmp_path):
+    path = tmp_path / "status.fifo"
+    os.mkfifo(path)
+    lines = []
+
+    def read():
+        with open(path) as f:
+            lines.extend(json.loads(line) for line in f)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    channel = open_channel(f"fifo:{path}")
+    set_status_channel(channel)
+    JobStatus(id="j1", name="build", status=Status.SKIPPED).export()
+    status_exporter().flush()
+    channel.close()
+    thread.join(timeout=5)
+
+    assert [line["status"] for line in lines] == ["skipped"]
@@ -0,0 +1,115 @@
+import io
+from datetime import datetime, timezone
+import pytest
+from river_common.channel import MemoryChannel
+from river_common.codec import (
+    BinaryCodec,
+    JsonCodec,
+    codec_from_env,
+    read_events,
+    STATUS_FORMAT_ENV,
+)
+from river_common.event import StatusEvent
+from river_common.exporter import StatusExporter
+from river_common.shared import ModuleTypes, Status
+from river_common.status import JobStatus, RiverStatus, TaskStatus, Timings
+
+
+def events():
+    failed = TaskStatus(
+        id="t1", name="compile ünïcode", parent_id="j1", timings=Timings(execution=1.25), cache_hit=False
+    )
+    failed.set_failed(RuntimeError("exit 2"))
+    return [
+        RiverStatus(id="r1", name="river", status=Status.RUNNING),
+        JobStatus(id="j1", name="build", parent_id="r1", status=Status.SKIPPED),
+        failed,
+        TaskStatus(id="t2", name="install", parent_id="j1", status=Status.CACHED, cache_hit=True),
+    ]
+
+
+@pytest.mark.parametrize("codec", [JsonCodec(), BinaryCodec()])
+def test_round_trip(codec):
+    originals = events()
+    stream = io.BytesIO(b"".join(codec.encode(StatusEvent.from_status(event)) for event in originals))
+    decoded = list(read_events(stream))
+
+    assert [event.model_dump() for event in decoded] == [event.model_dump() for event in originals]
+    assert [(e.id, e.type, e.status) for e in decoded] == [
+        ("r1", ModuleTypes.RIVER, Status.RUNNING),
+        ("j1", ModuleTypes.JOB, Status.SKIPPED),
+        ("t1", ModuleTypes.TASK, Status.FAILED),
+        ("t2", ModuleTypes.TASK, Status.CACHED),
+    ]
+    assert decoded[2].error == "exit 2"
+    assert decoded[2].error_type == "RuntimeError"
+    assert decoded[0].parent_id is None
+    assert decoded[0].timings is None
+    assert decoded[2].timings == Timings(execution=1.25)
+    assert [event.cache_hit for event in decoded] == [None, None, False, True]
+
+
+def test_binary_decodes_the_events_json_validates():
+    originals = [StatusEvent.from_status(event) for event in events()]
+
+    def decode(codec):
+        return list(read_events(io.BytesIO(b"".join(codec.encode(event) for event in originals))))
+
+    decoded, validated = decode(BinaryCodec()), decode(JsonCodec())
+
+    assert decoded == validated
+    assert [e.model_fields_set for e in decoded] == [e.model_fields_set for e in validated]
+    decoded[0].set_status(Status.SUCCESS)
+    assert validated[0].status == Status.RUNNING
+
+
+def test_binary_keeps_timestamps_to_the_microsecond():
+    updated_at = datetime(2024, 2, 29, 23, 59, 59, 123456, tzinfo=timezone.utc)
+    event = JobStatus(id="j1", name="build", updated_at=updated_at)
+    (decoded,) = read_events(io.BytesIO(BinaryCodec().encode(StatusEvent.from_status(event))))
+    assert decoded.updated_at == updated_at
+
+
+def test_binary_is_smaller_than_json():
+    for event in map(StatusEvent.from_status, events()):
+        assert len(BinaryCodec().encode(event)) < len(JsonCodec().encode(event))
+
+
+def test_read_events_mixes_formats_and_skips_other_lines():
+    binary, json = BinaryCodec(), JsonCodec()
+    first, second, third, _ = map(StatusEvent.from_status, events())
+    stream = io.BytesIO(
+        b"user output\n" + binary.encode(first) + b"\n" + json.encode(second) + b'{"not": "an event"}\n'
+        + binary.encode(third)
+    )
+    assert [event.id for event in read_events(stream)] == ["r1", "j1", "t1"]
+
+
+def test_read_events_stops_at_a_truncated_frame():
+    data = BinaryCodec().encode(StatusEvent.from_status(events()[0]))
+    assert list(read_events(io.BytesIO(data[:-1]))) == []
+
+
+def test_codec_from_env(monkeypatch):
+    monkeypatch.delenv(STATUS_FORMAT_ENV, raising=False)
+    assert isinstance(codec_from_env(), JsonCodec)
+    monkeypatch.setenv(STATUS_FORMAT_ENV, "binary")
+    assert isinstance(codec_from_env(), BinaryCodec)
+    # A format this river does not know falls back to JSON, which every reader decodes.
+    monkeypatch.setenv(STATUS_FORMAT_ENV, "protobuf")
+    assert isinstance(codec_from_env(), JsonCodec)
+
+
+def test_exporter_uses_the_negotiated_codec(monkeypatch):
+    monkeypatch.setenv(STATUS_FORMAT_ENV, "binary")
+    channel = MemoryChannel()
+    exporter = StatusExporter(channel)
+    try:
+        for event in events():
+            exporter.export(event)
+        exporter.flush(timeout=5)
+    finally:
+        exporter.close()
+
+    assert channel.data.startswith(b"\xb1")
+    assert [event.id for event in read_events(io.BytesIO(bytes(channel.data)))] == ["r1", "j1", "t1", "t2"]
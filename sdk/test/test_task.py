@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 from sdk.src.task import TaskExecutionError, bash
 from sdk.src.sandbox.base_sandbox import BaseSandbox
 
@@ -68,6 +68,8 @@ class TestBashFunction:
     def mock_job_no_sandbox(self):
         """Fixture for job without sandbox."""
         mock_job = Mock()
+        mock_job.id = "job-1"
+        mock_job._task_ordinal = None
         mock_job.sandbox = None
         return mock_job
 
@@ -75,7 +77,10 @@ class TestBashFunction:
     def mock_job_with_sandbox(self):
         """Fixture for job with sandbox."""
         mock_sandbox = Mock(spec=BaseSandbox)
+        mock_sandbox.lineage = None
         mock_job = Mock()
+        mock_job.id = "job-1"
+        mock_job._task_ordinal = None
         mock_job.sandbox = mock_sandbox
         return mock_job, mock_sandbox
 
@@ -105,7 +110,8 @@ class TestBashFunction:
             mock_executor.run.assert_called_once_with(
                 command="echo test",
                 cwd="/tmp",
-                env={"VAR": "value"}
+                env={"VAR": "value"},
+                output=ANY
             )
 
     @patch('sdk.src.task.get_current_job')
@@ -119,7 +125,8 @@ class TestBashFunction:
         mock_sandbox.execute.assert_called_once_with(
             command="ls",
             cwd="/home",
-            env={"PATH": "/usr/bin"}
+            env={"PATH": "/usr/bin"},
+            output=ANY
         )
 
     @patch('sdk.src.task.get_current_job')
@@ -0,0 +1,209 @@
+import json
+import tarfile
+import time
+from pathlib import Path
+from typing import Optional
+import pytest
+from river_sdk.job import Job, JobContext
+from river_sdk.sandbox.base_sandbox import BaseSandbox
+from river_sdk.sandbox.command_executor import LocalCommandExecutor
+from river_sdk.task import TaskExecutionError, bash, parallel
+from river_sdk.task_cache import CachePolicy, TaskCache
+from river_common.channel import MemoryChannel
+from river_common.exporter import StatusExporter, set_status_exporter, status_exporter
+
+
+class DirectorySandbox(BaseSandbox):
+    """Runs commands locally in a directory, recording changes like a docker sandbox."""
+
+    records_changes = True
+
+    def __init__(self, root: Path, lineage: Optional[str] = "image:test"):
+        super().__init__(str(root))
+        root.mkdir()
+        self.root = root
+        self.lineage = lineage
+        self.commands: list[str] = []
+
+    def execute(self, command, cwd=None, env=None):
+        self.commands.append(command)
+        return LocalCommandExecutor().run(command, cwd=str(self.root), env=env)
+
+    def mark(self) -> str:
+        time.sleep(0.01)
+        return str(time.time_ns())
+
+    def changes(self, marker, archive):
+        with tarfile.open(archive, "w") as tar:
+            for path in self.root.rglob("*"):
+                if path.is_file() and path.stat().st_ctime_ns > int(marker):
+                    tar.add(path, arcname=str(path.relative_to(self.root)))
+
+    def apply_changes(self, archive):
+        with tarfile.open(archive) as tar:
+            tar.extractall(self.root)
+
+
+class IdleJob(Job):
+    def main(self):
+        pass
+
+
+@pytest.fixture
+def channel(monkeypatch, tmp_path):
+    monkeypatch.setenv("RIVER_HOME", str(tmp_path / "home"))
+    channel = MemoryChannel()
+    previous = set_status_exporter(StatusExporter(channel))
+    yield channel
+    set_status_exporter(previous).close()
+
+
+def run(sandbox: BaseSandbox, command: str, **kwargs):
+    job = IdleJob("job")
+    job.sandbox = sandbox
+    with JobContext(job):
+        return bash(command, **kwargs)
+
+
+def run_parallel(sandbox: BaseSandbox, tasks: list):
+    job = IdleJob("job")
+    job.sandbox = sandbox
+    with JobContext(job):
+        return parallel(tasks)
+
+
+class TestTaskCache:
+
+    def test_hit_replays_result_and_files(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        first = DirectorySandbox(tmp_path / "first")
+        run(first, "echo built > out.txt && echo done", cache=policy)
+
+        second = DirectorySandbox(tmp_path / "second")
+        result = run(second, "echo built > out.txt && echo done", cache=policy)
+
+        assert result.stdout == "done\n" and result.ok
+        assert (second.root / "out.txt").read_text() == "built\n"
+        assert second.commands == []
+        assert second.lineage == first.lineage
+        assert policy.cache.stats()["hits"] == 1
+
+    def test_events_report_hits_and_misses(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        run(DirectorySandbox(tmp_path / "first"), "true", cache=policy)
+        run(DirectorySandbox(tmp_path / "second"), "true", cache=policy)
+        run(DirectorySandbox(tmp_path / "third"), "true")
+        status_exporter().flush(timeout=5)
+
+        finals = [
+            (event["status"], event["cache_hit"]) for event in map(json.loads, channel.lines())
+            if event["type"] == "task" and event["status"] != "running"
+        ]
+        assert finals == [("success", False), ("cached", True), ("success", None)]
+
+    def test_earlier_commands_are_part_of_the_key(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        first = DirectorySandbox(tmp_path / "first")
+        run(first, "echo a > a.txt")
+        run(first, "cat a.txt", cache=policy)
+
+        second = DirectorySandbox(tmp_path / "second")
+        run(second, "echo b > a.txt")
+        result = run(second, "cat a.txt", cache=policy)
+
+        assert result.stdout == "b\n"
+        assert second.commands == ["echo b > a.txt", "cat a.txt"]
+
+    def test_deferred_lineage_is_resolved_by_the_first_cached_command(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        eager = DirectorySandbox(tmp_path / "eager")
+        run(eager, "echo a > a.txt")
+        run(eager, "cat a.txt", cache=policy)
+
+        resolved = []
+        deferred = DirectorySandbox(tmp_path / "deferred")
+        deferred.defer_lineage(lambda: resolved.append(True) or "image:test")
+        run(deferred, "echo a > a.txt")
+        assert resolved == []
+        forked = DirectorySandbox(tmp_path / "forked")
+        forked.inherit_lineage(deferred)
+        result = run(forked, "cat a.txt", cache=policy)
+
+        assert result.stdout == "a\n" and forked.commands == []
+        assert resolved == [True]
+        assert forked.lineage == eager.lineage
+
+    def test_parallel_siblings_are_not_recorded_with_a_cached_task(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        tasks = [
+            "sleep 0.2; date +%s%N > sibling.txt",
+            {"command": "sleep 0.4; echo own > own.txt", "cache": policy},
+            "echo late > late.txt",
+        ]
+        first = DirectorySandbox(tmp_path / "first")
+        run_parallel(first, tasks)
+
+        second = DirectorySandbox(tmp_path / "second")
+        run_parallel(second, tasks)
+
+        assert second.commands == ["sleep 0.2; date +%s%N > sibling.txt", "echo late > late.txt"]
+        assert (second.root / "own.txt").read_text() == "own\n"
+        assert (second.root / "sibling.txt").read_text() != (first.root / "sibling.txt").read_text()
+        assert second.lineage == first.lineage
+
+    def test_env_and_cwd_are_part_of_the_key(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        run(DirectorySandbox(tmp_path / "first"), "echo $NAME", env={"NAME": "a"}, cache=policy)
+
+        second = DirectorySandbox(tmp_path / "second")
+        assert run(second, "echo $NAME", env={"NAME": "b"}, cache=policy).stdout == "b\n"
+        third = DirectorySandbox(tmp_path / "third")
+        run(third, "echo $NAME", cwd="/", env={"NAME": "a"}, cache=policy)
+        assert len(third.commands) == 1
+
+    def test_failures_are_not_recorded(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        with pytest.raises(TaskExecutionError):
+            run(DirectorySandbox(tmp_path / "first"), "exit 3", cache=policy)
+
+        second = DirectorySandbox(tmp_path / "second")
+        with pytest.raises(TaskExecutionError):
+            run(second, "exit 3", cache=policy)
+        assert second.commands == ["exit 3"]
+
+    def test_expired_runs_are_run_again(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"), max_age=0.01)
+        run(DirectorySandbox(tmp_path / "first"), "true", cache=policy)
+        time.sleep(0.02)
+
+        second = DirectorySandbox(tmp_path / "second")
+        run(second, "true", cache=policy)
+
+        assert second.commands == ["true"]
+        assert policy.cache.stats()["misses"] == 2
+
+    def test_sandboxes_without_lineage_or_recording_run_every_time(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"))
+        for name in ("first", "second"):
+            sandbox = DirectorySandbox(tmp_path / name, lineage=None)
+            run(sandbox, "true", cache=policy)
+            assert sandbox.commands == ["true"]
+
+        sandbox = DirectorySandbox(tmp_path / "third")
+        sandbox.records_changes = False
+        run(sandbox, "true", cache=policy)
+        assert policy.cache.stats()["entries"] == 0
+
+    def test_results_only_policy_needs_no_recording(self, tmp_path, channel):
+        policy = CachePolicy(TaskCache(tmp_path / "cache"), record_changes=False)
+        for name in ("first", "second"):
+            sandbox = DirectorySandbox(tmp_path / name)
+            sandbox.records_changes = False
+            assert run(sandbox, "echo once > once.txt; echo once", cache=policy).stdout == "once\n"
+
+        assert sandbox.commands == []
+        assert not (sandbox.root / "once.txt").exists()
+
+    def test_invalid_max_age(self):
+        with pytest.raises(ValueError, match="max_age must be positive"):
+            CachePolicy(TaskCache(Path("/nonexistent")), max_age=0)
@@ -0,0 +1,42 @@
+import asyncio
+from river_sdk.task_slots import TaskSlots
+
+
+async def run_tasks(slots: TaskSlots, tasks: list[tuple[str, bool]], events: list[str]) -> None:
+    async def task(name: str, exclusive: bool):
+        async with slots.slot(exclusive):
+            events.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end {name}")
+
+    await asyncio.gather(*(task(name, exclusive) for name, exclusive in tasks))
+
+
+def test_tasks_start_in_order_up_to_the_limit():
+    events: list[str] = []
+    asyncio.run(run_tasks(TaskSlots(2), [("a", False), ("b", False), ("c", False)], events))
+
+    assert [event for event in events if event.startswith("start")] == ["start a", "start b", "start c"]
+    assert events.index("start c") > min(events.index("end a"), events.index("end b"))
+
+
+def test_exclusive_task_runs_alone():
+    events: list[str] = []
+    asyncio.run(run_tasks(TaskSlots(4), [("a", False), ("cached", True), ("c", False)], events))
+
+    assert events == ["start a", "end a", "start cached", "end cached", "start c", "end c"]
+
+
+def test_cancelled_waiter_gives_up_its_turn():
+    async def main():
+        slots = TaskSlots(1)
+        events: list[str] = []
+        async with slots.slot():
+            waiting = asyncio.create_task(run_tasks(slots, [("cancelled", True)], events))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+        await run_tasks(slots, [("next", False)], events)
+        return events
+
+    assert asyncio.run(main()) == ["start next", "end next"]